@@ -0,0 +1,260 @@
+import pandas as pd
+from db_config import get_connection
+from crud_operations import ventes_filter_sql, cached_query
+from instrumentation import instrumented
+
+
+# ==================== UTILITAIRES ====================
+
+# Clé de regroupement SQL (sur une colonne 'YYYY-MM...') de chaque période d'analyse ;
+# la fréquence est aussi celle des pd.Period correspondantes
+PERIODES = {
+    'D': "substr({col}, 1, 10)",
+    'M': "substr({col}, 1, 7)",
+    'Q': "substr({col}, 1, 4) || 'Q' || ((CAST(substr({col}, 6, 2) AS INTEGER) + 2) / 3)",
+    'Y': "substr({col}, 1, 4)",
+}
+
+
+def _from_ventes(categories=None, produits=False):
+    """Clause FROM : la jointure produits n'est ajoutée que si elle sert"""
+    if categories or produits:
+        return "FROM ventes v LEFT JOIN produits p ON v.produit_id = p.id"
+    return "FROM ventes v"
+
+
+def _and(where, condition):
+    """Ajoute une condition à une clause WHERE éventuellement vide"""
+    return f"{where} AND {condition}" if where else f"WHERE {condition}"
+
+
+# ==================== INDICATEURS ====================
+
+@instrumented()
+@cached_query('ventes', 'produits')
+def get_kpis(start=None, end=None, categories=None):
+    """Total, nombre de ventes, panier moyen et produit phare (quantité) de la sélection"""
+    top = get_classement_produits(1, start=start, end=end, categories=categories)
+    with get_connection() as conn:
+        try:
+            where, params = ventes_filter_sql(start, end, categories)
+            total, count, moyenne = conn.execute(f"""
+            SELECT COALESCE(SUM(v.montant), 0), COUNT(*), COALESCE(AVG(v.montant), 0)
+            {_from_ventes(categories)}
+            {where}
+            """, params).fetchone()
+            return {
+                'total': total,
+                'count': count,
+                'moyenne': moyenne,
+                'produit_phare': top['produit'].iloc[0] if not top.empty else "N/A",
+            }
+        except Exception as e:
+            raise ValueError(f"Erreur calcul des indicateurs: {str(e)}")
+
+
+# ==================== RÉPARTITIONS ====================
+
+@instrumented()
+@cached_query('ventes', 'produits')
+def get_ventes_par_categorie(start=None, end=None, categories=None):
+    """Montant et quantité par catégorie (colonnes categorie, montant, quantite, nombre, moyenne)"""
+    with get_connection() as conn:
+        try:
+            where, params = ventes_filter_sql(start, end, categories)
+            query = f"""
+            SELECT
+                p.categorie AS categorie,
+                COALESCE(SUM(v.montant), 0) AS montant,
+                COALESCE(SUM(v.quantite), 0) AS quantite,
+                COUNT(v.montant) AS nombre,
+                AVG(v.montant) AS moyenne
+            {_from_ventes(categories, produits=True)}
+            {_and(where, "p.categorie IS NOT NULL")}
+            GROUP BY p.categorie
+            ORDER BY p.categorie
+            """
+            return pd.read_sql(query, conn, params=params)
+        except Exception as e:
+            raise ValueError(f"Erreur agrégation par catégorie: {str(e)}")
+
+
+@instrumented()
+@cached_query('ventes', 'produits')
+def get_ventes_par_produit(start=None, end=None, categories=None):
+    """Montant et quantité par produit, triés par nom (colonnes produit, montant, quantite, moyenne)"""
+    with get_connection() as conn:
+        try:
+            where, params = ventes_filter_sql(start, end, categories)
+            query = f"""
+            SELECT
+                p.nom AS produit,
+                COALESCE(SUM(v.montant), 0) AS montant,
+                COALESCE(SUM(v.quantite), 0) AS quantite,
+                AVG(v.montant) AS moyenne
+            {_from_ventes(categories, produits=True)}
+            {_and(where, "p.nom IS NOT NULL")}
+            GROUP BY p.nom
+            ORDER BY p.nom
+            """
+            return pd.read_sql(query, conn, params=params)
+        except Exception as e:
+            raise ValueError(f"Erreur agrégation par produit: {str(e)}")
+
+
+@instrumented()
+@cached_query('ventes', 'produits')
+def get_classement_produits(n=5, plus_faibles=False, start=None, end=None, categories=None):
+    """Les n produits les plus (ou les moins) vendus en quantité (colonnes produit, quantite).
+
+    À égalité, l'ordre alphabétique départage, comme nlargest/nsmallest
+    appliqués à un groupby pandas.
+    """
+    with get_connection() as conn:
+        try:
+            where, params = ventes_filter_sql(start, end, categories)
+            sens = "ASC" if plus_faibles else "DESC"
+            query = f"""
+            SELECT p.nom AS produit, COALESCE(SUM(v.quantite), 0) AS quantite
+            {_from_ventes(categories, produits=True)}
+            {_and(where, "p.nom IS NOT NULL")}
+            GROUP BY p.nom
+            ORDER BY quantite {sens}, p.nom
+            LIMIT ?
+            """
+            return pd.read_sql(query, conn, params=params + [int(n)])
+        except Exception as e:
+            raise ValueError(f"Erreur classement des produits: {str(e)}")
+
+
+# ==================== ÉVOLUTIONS ====================
+
+def _synthese_par_periode(conn, freq, start, end, categories):
+    """Agrégats par période lus dans les tables de synthèse.
+
+    Les mois entièrement compris dans [start, end] viennent de ventes_mois ;
+    les jours des mois partiels aux bornes viennent de ventes_jour.
+    """
+    cle_jour = PERIODES[freq].format(col='jour')
+    cle_mois = PERIODES[freq].format(col='mois')
+
+    # Premier et dernier mois complets de l'intervalle (None = non borné)
+    premier = dernier = None
+    if start is not None:
+        start_ts = pd.Timestamp(start).normalize()
+        premier = start_ts.to_period('M') + (0 if start_ts.day == 1 else 1)
+    if end is not None:
+        end_ts = pd.Timestamp(end).normalize()
+        dernier = end_ts.to_period('M') - (0 if end_ts.is_month_end else 1)
+
+    if freq == 'D' or (premier is not None and dernier is not None and premier > dernier):
+        # Aucun mois complet utilisable : tout vient de la synthèse journalière
+        plage_mois, plages_jours = None, [(start, end)]
+    else:
+        plage_mois, plages_jours = (premier, dernier), []
+        if start is not None and start_ts.day != 1:
+            plages_jours.append((start_ts, premier.start_time - pd.Timedelta(days=1)))
+        if end is not None and not end_ts.is_month_end:
+            plages_jours.append((dernier.end_time.normalize() + pd.Timedelta(days=1), end_ts))
+
+    filtre_categories, params_categories = "", []
+    if categories:
+        categories = [str(c) for c in categories]
+        filtre_categories = f"AND categorie IN ({', '.join('?' * len(categories))})"
+        params_categories = categories
+
+    parties, params = [], []
+    if plage_mois is not None:
+        bornes = ""
+        if plage_mois[0] is not None:
+            bornes += " AND mois >= ?"
+            params.append(str(plage_mois[0]))
+        if plage_mois[1] is not None:
+            bornes += " AND mois <= ?"
+            params.append(str(plage_mois[1]))
+        parties.append(f"""
+            SELECT {cle_mois} AS periode, montant, quantite FROM ventes_mois
+            WHERE 1 {bornes} {filtre_categories}""")
+        params += params_categories
+    for debut, fin in plages_jours:
+        bornes = ""
+        if debut is not None:
+            bornes += " AND jour >= ?"
+            params.append(pd.Timestamp(debut).strftime('%Y-%m-%d'))
+        if fin is not None:
+            bornes += " AND jour <= ?"
+            params.append(pd.Timestamp(fin).strftime('%Y-%m-%d'))
+        parties.append(f"""
+            SELECT {cle_jour} AS periode, montant, quantite FROM ventes_jour
+            WHERE 1 {bornes} {filtre_categories}""")
+        params += params_categories
+
+    return pd.read_sql(f"""
+    SELECT periode, SUM(montant) AS montant, SUM(quantite) AS quantite
+    FROM ({' UNION ALL '.join(parties)})
+    GROUP BY periode
+    """, conn, params=params)
+
+
+@instrumented()
+@cached_query('ventes', 'produits')
+def get_ventes_par_periode(freq='M', start=None, end=None, categories=None):
+    """Montant et quantité par période (freq : 'D', 'M', 'Q' ou 'Y').
+
+    Lu dans les tables de synthèse : le coût dépend du nombre de périodes,
+    pas du nombre de ventes. Même résultat que
+    groupby(pd.Grouper(key='date_vente', freq=freq)) : les périodes sans
+    vente sont présentes avec 0, et date_vente porte le premier jour
+    (journalier) ou le dernier jour de la période.
+    """
+    with get_connection() as conn:
+        try:
+            df = _synthese_par_periode(conn, freq, start, end, categories)
+            df = df[df['periode'].notna()]
+            if df.empty:
+                return pd.DataFrame({'date_vente': pd.to_datetime([]), 'montant': [], 'quantite': []})
+
+            df.index = pd.PeriodIndex([pd.Period(p, freq=freq) for p in df['periode']])
+            periodes = pd.period_range(df.index.min(), df.index.max(), freq=freq)
+            df = df[['montant', 'quantite']].reindex(periodes, fill_value=0)
+            if freq == 'D':
+                dates = periodes.to_timestamp(how='start')
+            else:
+                dates = periodes.to_timestamp(how='end').normalize()
+            return pd.DataFrame({
+                'date_vente': dates,
+                'montant': df['montant'].to_numpy(),
+                'quantite': df['quantite'].to_numpy(),
+            })
+        except Exception as e:
+            raise ValueError(f"Erreur agrégation par période: {str(e)}")
+
+
+@instrumented()
+@cached_query('ventes', 'produits')
+def get_evolution_produits(produits, start=None, end=None, categories=None):
+    """Quantité par date et par produit, pour les produits donnés (format long).
+
+    Chaque date présente dans la sélection a une ligne par produit (0 si aucune vente).
+    """
+    produits = list(produits)
+    if not produits:
+        return pd.DataFrame(columns=['date_vente', 'produit', 'quantite'])
+
+    with get_connection() as conn:
+        try:
+            where, params = ventes_filter_sql(start, end, categories)
+            where = _and(where, f"p.nom IN ({', '.join('?' * len(produits))})")
+            df = pd.read_sql(f"""
+            SELECT v.date_vente AS date_vente, p.nom AS produit, SUM(v.quantite) AS quantite
+            {_from_ventes(categories, produits=True)}
+            {where}
+            GROUP BY v.date_vente, p.nom
+            """, conn, params=params + [str(p) for p in produits], parse_dates=['date_vente'])
+            if df.empty:
+                return pd.DataFrame(columns=['date_vente', 'produit', 'quantite'])
+            wide = df.pivot_table(index='date_vente', columns='produit', values='quantite',
+                                  aggfunc='sum', fill_value=0)
+            return wide.reset_index().melt(id_vars='date_vente', value_name='quantite')
+        except Exception as e:
+            raise ValueError(f"Erreur évolution des produits: {str(e)}")
@@ -0,0 +1,168 @@
+"""Backtest des moteurs de prévision par origines glissantes.
+
+Pour chaque série, chaque moteur et chaque jeu de paramètres, le modèle
+est entraîné sur l'historique antérieur à une origine puis évalué sur les
+horizon jours suivants ; l'origine recule de step jours à chaque pli. Aucune
+donnée postérieure à l'origine ne sert à l'entraînement.
+
+Le rapport donne par configuration la précision (MAE, RMSE), la latence
+d'entraînement et de prévision, et le pic mémoire (tracemalloc, mesuré sur
+un pli à part pour ne pas fausser les temps).
+
+Usage : python backtest.py [--niveau total|produit|categorie] [--horizon 28]
+                           [--origines 4] [--moteurs holt_winters ...]
+                           [--workers N] [--sortie rapport.csv|rapport.json]
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import ml_forecasting
+from db_config import init_db
+from forecast_engines import ENGINES, get_engine
+
+# Jeux de paramètres évalués par défaut pour chaque moteur
+BACKTEST_GRID = {
+    'naif_saisonnier': [{'cycles': 1}, {'cycles': 4}],
+    'holt_winters': [{}, {'alpha': 0.1, 'beta': 0.01, 'gamma': 0.05}],
+    'random_forest': [{'n_estimators': 50}, {'n_estimators': 100}],
+}
+
+
+def rolling_origins(n_days, horizon, n_origins, step=None):
+    """Longueurs d'entraînement des plis, de la plus ancienne à la plus récente origine"""
+    step = step or horizon
+    origins = [n_days - horizon - i * step for i in range(n_origins)]
+    return [origin for origin in reversed(origins) if origin > 0]
+
+
+def _evaluate(engine, params, start, y, origins, horizon):
+    """Plis d'une configuration sur une série ; retourne les mesures de chaque pli et le pic mémoire"""
+    folds = []
+    for origin in origins:
+        fit_start = time.perf_counter()
+        model = get_engine(engine, **params).fit(start, y[:origin])
+        fit_time = time.perf_counter() - fit_start
+
+        predict_start = time.perf_counter()
+        predictions = model.forecast(horizon)
+        predict_time = time.perf_counter() - predict_start
+
+        errors = predictions - y[origin:origin + horizon]
+        folds.append({
+            'origine': origin,
+            'mae': float(np.abs(errors).mean()),
+            'rmse': float(np.sqrt((errors ** 2).mean())),
+            'temps_fit': fit_time,
+            'temps_prevision': predict_time,
+        })
+
+    # Pic mémoire sur le pli le plus récent (le plus long historique)
+    tracemalloc.start()
+    get_engine(engine, **params).fit(start, y[:origins[-1]]).forecast(horizon)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return folds, peak
+
+
+def load_series(niveau='total', max_series=None):
+    """{libellé: série journalière} au niveau demandé, et le premier jour commun"""
+    if niveau == 'total':
+        df = ml_forecasting.daily_sales()
+        if df.empty:
+            return None, {}
+        return df['date_vente'].iloc[0], {'total': df['montant'].to_numpy(dtype=np.float64)}
+
+    wide, libelles = ml_forecasting.daily_sales_by(niveau)
+    if wide.empty:
+        return None, {}
+    columns = wide.columns[:max_series] if max_series else wide.columns
+    return wide.index[0], {str(libelles.get(c, c)): wide[c].to_numpy(dtype=np.float64) for c in columns}
+
+
+def run_backtest(start, series, grid=None, horizon=28, n_origins=4, step=None, workers=None):
+    """Exécute le backtest sur tous les cœurs ; retourne (synthèse, détails) en DataFrames"""
+    grid = grid or BACKTEST_GRID
+    tasks = []
+    for label, y in series.items():
+        origins = rolling_origins(len(y), horizon, n_origins, step)
+        if not origins:
+            continue
+        for engine, param_sets in grid.items():
+            for params in param_sets:
+                tasks.append((label, engine, params, y, origins))
+
+    details = []
+    peaks = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = [
+            executor.submit(_evaluate, engine, params, start, y, origins, horizon)
+            for _, engine, params, y, origins in tasks
+        ]
+        for (label, engine, params, _, _), future in zip(tasks, futures):
+            folds, peak = future.result()
+            config = {'moteur': engine, 'parametres': json.dumps(params, sort_keys=True), 'serie': label}
+            details += [{**config, **fold} for fold in folds]
+            peaks.append({**config, 'pic_memoire': peak})
+
+    columns = ['moteur', 'parametres', 'serie', 'origine', 'mae', 'rmse', 'temps_fit', 'temps_prevision']
+    details = pd.DataFrame(details, columns=columns)
+    peaks = pd.DataFrame(peaks, columns=['moteur', 'parametres', 'serie', 'pic_memoire'])
+    if details.empty:
+        return details, details
+
+    synthese = details.groupby(['moteur', 'parametres'], sort=False).agg(
+        mae=('mae', 'mean'),
+        rmse=('rmse', 'mean'),
+        temps_fit_moyen=('temps_fit', 'mean'),
+        temps_fit_p95=('temps_fit', lambda s: s.quantile(0.95)),
+        temps_prevision_moyen=('temps_prevision', 'mean'),
+        plis=('mae', 'size'),
+    )
+    synthese['pic_memoire_max'] = peaks.groupby(['moteur', 'parametres'], sort=False)['pic_memoire'].max()
+    return synthese.reset_index().sort_values('mae', ignore_index=True), details
+
+
+def write_report(path, synthese, details, parametres):
+    """CSV : synthèse seule ; JSON : paramètres, synthèse et détail des plis"""
+    if path.endswith('.json'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'parametres': parametres,
+                'synthese': synthese.to_dict(orient='records'),
+                'details': details.to_dict(orient='records'),
+            }, f, ensure_ascii=False, indent=2, default=str)
+    else:
+        synthese.to_csv(path, index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest par origines glissantes des moteurs de prévision")
+    parser.add_argument("--niveau", choices=['total', 'produit', 'categorie'], default='total')
+    parser.add_argument("--horizon", type=int, default=28, help="jours prévus à chaque pli")
+    parser.add_argument("--origines", type=int, default=4, help="nombre de plis")
+    parser.add_argument("--pas", type=int, default=None, help="jours entre deux origines (défaut : horizon)")
+    parser.add_argument("--moteurs", nargs='+', choices=sorted(ENGINES), default=list(BACKTEST_GRID))
+    parser.add_argument("--max-series", type=int, default=None, help="limite le nombre de séries évaluées")
+    parser.add_argument("--workers", type=int, default=None, help="processus (défaut : tous les cœurs)")
+    parser.add_argument("--sortie", default="backtest_rapport.csv", help="fichier .csv ou .json")
+    args = parser.parse_args()
+
+    init_db()
+    start, series = load_series(args.niveau, args.max_series)
+    if not series:
+        parser.exit(1, "Aucune vente à évaluer.\n")
+
+    grid = {engine: BACKTEST_GRID.get(engine, [{}]) for engine in args.moteurs}
+    synthese, details = run_backtest(start, series, grid, args.horizon, args.origines, args.pas, args.workers)
+    write_report(args.sortie, synthese, details, vars(args))
+
+    with pd.option_context('display.width', 160, 'display.max_columns', None):
+        print(synthese)
+    print(f"Rapport écrit dans {args.sortie} ({len(series)} série(s), {len(details)} pli(s)).")
@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+import db_config
+import crud_operations
+import seed as seed_module
+
+
+@contextmanager
+def temp_database():
+    """Pointe db_config vers une base temporaire initialisée, supprimée à la sortie"""
+    directory = tempfile.mkdtemp(prefix="bench_ventes_")
+    old_path = db_config.DB_PATH
+    db_config.DB_PATH = os.path.join(directory, "ventes.db")
+    try:
+        db_config.init_db()
+        yield db_config.DB_PATH
+    finally:
+        db_config.close_connections()
+        db_config.DB_PATH = old_path
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def insert_synthetic_ventes(n, n_produits=50, n_clients=200, seed=42):
+    """Ajoute n ventes générées par seed.py (et les produits/clients manquants)"""
+    seed_module.seed_data(n_produits, n_clients, n, seed=seed)
+    crud_operations.invalidate_cache()
+
+
+def timeit(fn, repeat=20):
+    """Retourne la médiane (en secondes) de plusieurs appels de fn"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return durations[len(durations) // 2]
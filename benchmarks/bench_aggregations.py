@@ -0,0 +1,105 @@
+"""Agrégations du tableau de bord : pandas sur les ventes brutes vs GROUP BY SQL (module aggregations).
+
+Vérifie aussi que les deux chemins donnent les mêmes résultats.
+
+Usage : python -m benchmarks.bench_aggregations [taille ...]   (défaut : 1 000 000 et 10 000 000)
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import aggregations
+import crud_operations
+from benchmarks._common import temp_database, insert_synthetic_ventes
+
+FREQS = {'D': 'D', 'M': 'ME', 'Q': 'QE', 'Y': 'YE'}
+
+
+def pandas_path(start, end, categories):
+    """Calculs de show_dashboard() avant la délégation à SQL"""
+    df = crud_operations.get_ventes()
+    mask = (df['date_vente'].dt.date >= start) & (df['date_vente'].dt.date <= end)
+    df = df[mask]
+    if categories:
+        df = df[df['categorie'].isin(categories)]
+    par_produit = df.groupby('produit')['quantite'].sum()
+    return {
+        'kpis': (df['montant'].sum(), len(df), df['montant'].mean(), par_produit.idxmax()),
+        'categorie': df.groupby('categorie')['montant'].sum(),
+        'top': par_produit.nlargest(5),
+        'bottom': par_produit.nsmallest(5),
+        'periodes': {freq: df.groupby(pd.Grouper(key='date_vente', freq=_pandas_freq(freq)))['montant'].sum()
+                     for freq in FREQS},
+    }
+
+
+def sql_path(start, end, categories):
+    kpis = aggregations.get_kpis(start, end, categories)
+    return {
+        'kpis': (kpis['total'], kpis['count'], kpis['moyenne'], kpis['produit_phare']),
+        'categorie': aggregations.get_ventes_par_categorie(start, end, categories).set_index('categorie')['montant'],
+        'top': aggregations.get_classement_produits(5, start=start, end=end, categories=categories)
+            .set_index('produit')['quantite'],
+        'bottom': aggregations.get_classement_produits(5, True, start, end, categories)
+            .set_index('produit')['quantite'],
+        'periodes': {freq: aggregations.get_ventes_par_periode(freq, start, end, categories)
+                     .set_index('date_vente')['montant'] for freq in FREQS},
+    }
+
+
+def _pandas_freq(freq):
+    # Alias renommés en pandas 2.2 (M -> ME, ...)
+    try:
+        pd.tseries.frequencies.to_offset(FREQS[freq])
+        return FREQS[freq]
+    except ValueError:
+        return freq
+
+
+def check_same(expected, actual):
+    e_total, e_count, e_mean, e_top = expected['kpis']
+    a_total, a_count, a_mean, a_top = actual['kpis']
+    assert e_count == a_count and e_top == a_top, (expected['kpis'], actual['kpis'])
+    assert np.isclose(e_total, a_total) and np.isclose(e_mean, a_mean), (expected['kpis'], actual['kpis'])
+    for key in ('categorie', 'top', 'bottom'):
+        assert list(expected[key].index) == list(actual[key].index), key
+        assert np.allclose(expected[key].to_numpy(float), actual[key].to_numpy(float)), key
+    for freq, serie in expected['periodes'].items():
+        other = actual['periodes'][freq]
+        assert list(serie.index) == list(other.index), freq
+        assert np.allclose(serie.to_numpy(float), other.to_numpy(float)), freq
+
+
+def timed(fn, *args):
+    # Mesure à froid : pas de résultat servi par le cache de crud_operations
+    crud_operations.clear_cache()
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(sizes):
+    filters = [
+        ("tout l'historique", (pd.Timestamp("2022-01-01").date(), pd.Timestamp("2024-12-31").date(), [])),
+        ("1 mois, 2 catégories", (pd.Timestamp("2024-03-01").date(), pd.Timestamp("2024-03-31").date(),
+                                  ["Bureau", "Papeterie"])),
+        ("mois partiels", (pd.Timestamp("2023-02-15").date(), pd.Timestamp("2024-05-10").date(), ["Bureau"])),
+    ]
+    with temp_database():
+        current = 0
+        print(f"{'ventes':>10} | {'filtre':<22} | {'pandas (s)':>10} | {'SQL (s)':>8} | {'gain':>6}")
+        for size in sizes:
+            insert_synthetic_ventes(size - current, seed=size)
+            current = size
+            for label, args in filters:
+                expected, t_pandas = timed(pandas_path, *args)
+                actual, t_sql = timed(sql_path, *args)
+                check_same(expected, actual)
+                print(f"{size:>10} | {label:<22} | {t_pandas:>10.3f} | {t_sql:>8.3f} | {t_pandas / t_sql:>5.1f}x")
+    print("Résultats identiques entre pandas et SQL.")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000_000, 10_000_000])
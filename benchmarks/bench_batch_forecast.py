@@ -0,0 +1,39 @@
+"""Prévisions par produit : une série après l'autre vs forecast_batch (paquets en parallèle).
+
+Affiche le débit en séries par seconde pour plusieurs nombres de produits.
+
+Usage : python -m benchmarks.bench_batch_forecast [nombre_de_produits ...]
+"""
+import sys
+import time
+
+import ml_forecasting
+from benchmarks._common import temp_database, insert_synthetic_ventes
+
+VENTES_PAR_PRODUIT = 200
+
+
+def sequential():
+    """Une série à la fois dans le processus courant"""
+    return ml_forecasting.forecast_batch('produit', n_jobs=1, series_per_task=1)
+
+
+def batched():
+    return ml_forecasting.forecast_batch('produit', n_jobs=-1)
+
+
+def main(sizes):
+    print(f"{'produits':>8} | {'mode':<10} | {'temps (s)':>9} | {'séries/s':>9}")
+    for n_produits in sizes:
+        with temp_database():
+            insert_synthetic_ventes(n_produits * VENTES_PAR_PRODUIT, n_produits=n_produits, seed=n_produits)
+            for label, fn in (("séquentiel", sequential), ("par lots", batched)):
+                start = time.perf_counter()
+                df = fn()
+                duration = time.perf_counter() - start
+                n_series = df['serie'].nunique()
+                print(f"{n_produits:>8} | {label:<10} | {duration:>9.2f} | {n_series / duration:>9.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 1000])
@@ -0,0 +1,77 @@
+"""Import de ventes : insert_vente ligne à ligne vs bulk_insert_ventes (CSV par lots).
+
+Le fichier importé couvre le mois qui suit un historique de ventes déjà en
+base (cas d'un import quotidien des caisses). Affiche le débit en lignes par seconde. L'import ligne à ligne n'est mesuré
+que sur un échantillon (il serait trop long sur le fichier complet).
+
+Usage : python -m benchmarks.bench_bulk_import [taille ...]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import crud_operations
+from benchmarks._common import temp_database, insert_synthetic_ventes
+
+ECHANTILLON_LIGNE_A_LIGNE = 2_000
+# Ventes déjà en base avant l'import
+HISTORIQUE = 200_000
+
+
+def write_csv(path, n, n_produits=50, n_clients=200, seed=0):
+    """Fichier CSV de n ventes sur le mois suivant l'historique de insert_synthetic_ventes.
+
+    1 % de lignes ont un produit inconnu, pour exercer les rejets.
+    """
+    rng = np.random.default_rng(seed)
+    quantite = rng.integers(1, 11, n)
+    df = pd.DataFrame({
+        'date_vente': (np.datetime64('2025-01-01T00:00:00') + rng.integers(0, 30 * 86400, n)
+                       .astype('timedelta64[s]')).astype(str),
+        'produit_id': rng.integers(1, n_produits + 1, n),
+        'client_id': rng.integers(1, n_clients + 1, n),
+        'quantite': quantite,
+        'montant': (quantite * rng.uniform(1, 50, n)).round(2),
+    })
+    df['date_vente'] = df['date_vente'].str.replace('T', ' ')
+    invalides = rng.random(n) < 0.01
+    df.loc[invalides, 'produit_id'] = n_produits + 1
+    df.to_csv(path, index=False)
+    return df
+
+
+def main(sizes):
+    directory = tempfile.mkdtemp(prefix="bench_import_")
+    try:
+        print(f"{'lignes':>10} | {'import':<14} | {'temps (s)':>9} | {'lignes/s':>10}")
+        for size in sizes:
+            path = os.path.join(directory, f"ventes_{size}.csv")
+            df = write_csv(path, size)
+            with temp_database():
+                insert_synthetic_ventes(HISTORIQUE)
+
+                sample = df.head(ECHANTILLON_LIGNE_A_LIGNE)
+                start = time.perf_counter()
+                for row in sample.itertuples(index=False):
+                    try:
+                        crud_operations.insert_vente(pd.Timestamp(row.date_vente), row.produit_id,
+                                                     row.client_id, row.quantite, row.montant)
+                    except ValueError:
+                        pass
+                duration = time.perf_counter() - start
+                print(f"{size:>10} | {'ligne à ligne':<14} | {duration:>9.2f} | {len(sample) / duration:>10,.0f}")
+
+                stats = crud_operations.bulk_insert_ventes(path, os.path.join(directory, "rejets.csv"))
+                print(f"{size:>10} | {'par lots':<14} | {stats['duree']:>9.2f} | "
+                      f"{size / stats['duree']:>10,.0f}   ({stats['rejetees']} rejets)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000])
@@ -0,0 +1,60 @@
+"""Débit (ops/s) d'une lecture par clé : connexion ouverte à chaque appel vs pool de connexions.
+
+Usage : python -m benchmarks.bench_connections [nb_threads ...]
+"""
+import sys
+import threading
+import time
+
+import db_config
+from benchmarks._common import temp_database, insert_synthetic_ventes
+
+QUERY = "SELECT * FROM produits WHERE id=?"
+DURATION = 2.0
+
+
+def read_with_new_connection(produit_id):
+    """Ancien chemin : connexion + PRAGMA + requête + fermeture"""
+    conn = db_config.connect_db()
+    try:
+        return conn.execute(QUERY, (produit_id,)).fetchone()
+    finally:
+        conn.close()
+
+
+def read_with_pool(produit_id):
+    with db_config.get_connection() as conn:
+        return conn.execute(QUERY, (produit_id,)).fetchone()
+
+
+def ops_per_second(fn, n_threads):
+    counts = [0] * n_threads
+    deadline = time.perf_counter() + DURATION
+
+    def worker(index):
+        n = 0
+        while time.perf_counter() < deadline:
+            fn(n % 50 + 1)
+            n += 1
+        counts[index] = n
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / DURATION
+
+
+def main(thread_counts):
+    with temp_database():
+        print(f"{'threads':>7} | {'connexion/appel':>15} | {'pool':>10} | {'gain':>6}")
+        insert_synthetic_ventes(1_000)
+        for n_threads in thread_counts:
+            before = ops_per_second(read_with_new_connection, n_threads)
+            after = ops_per_second(read_with_pool, n_threads)
+            print(f"{n_threads:>7} | {before:>15,.0f} | {after:>10,.0f} | {after / before:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1, 4, 16])
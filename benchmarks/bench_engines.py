@@ -0,0 +1,43 @@
+"""Moteurs de prévision côte à côte : MAE et temps d'entraînement par série produit.
+
+Chaque série est entraînée sans ses derniers jours (horizon) puis évaluée
+sur ceux-ci. Affiche le détail par série puis la moyenne par moteur et le
+nombre de séries où chaque moteur est le plus précis.
+
+Usage : python -m benchmarks.bench_engines [nombre_de_produits] [horizon]
+"""
+import sys
+
+import pandas as pd
+
+import ml_forecasting
+from forecast_engines import compare_engines
+from benchmarks._common import temp_database, insert_synthetic_ventes
+
+VENTES_PAR_PRODUIT = 200
+
+
+def main(n_produits=20, horizon=28):
+    with temp_database():
+        insert_synthetic_ventes(n_produits * VENTES_PAR_PRODUIT, n_produits=n_produits)
+        wide, libelles = ml_forecasting.daily_sales_by('produit')
+
+        resultats = []
+        for serie in wide.columns:
+            df = compare_engines(wide.index[0], wide[serie].to_numpy(), horizon)
+            df.insert(0, 'serie', libelles[serie])
+            resultats.append(df)
+        resultats = pd.concat(resultats, ignore_index=True)
+
+    pd.set_option('display.width', 160)
+    pd.set_option('display.max_columns', None)
+    print(resultats.pivot(index='serie', columns='moteur', values=['mae', 'temps_fit']).round(4))
+    synthese = resultats.groupby('moteur').agg(mae=('mae', 'mean'), temps_fit=('temps_fit', 'mean'))
+    meilleurs = resultats.loc[resultats.groupby('serie')['mae'].idxmin(), 'moteur'].value_counts()
+    synthese['series_gagnees'] = meilleurs.reindex(synthese.index, fill_value=0)
+    print()
+    print(synthese.round(4))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,58 @@
+"""Export Excel : DataFrame complet + pandas.ExcelWriter vs écriture par lots (module exports).
+
+Usage : python -m benchmarks.bench_exports [taille ...]
+"""
+import io
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+import crud_operations
+import exports
+from benchmarks._common import temp_database, insert_synthetic_ventes
+
+
+def legacy_excel():
+    """Export d'avant : toutes les ventes en mémoire puis to_excel"""
+    df = crud_operations.get_ventes()
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Ventes', index=False)
+        df.groupby('categorie', observed=True).agg({'montant': ['sum', 'mean', 'count'], 'quantite': 'sum'}) \
+            .to_excel(writer, sheet_name='Par catégorie')
+        df.groupby('produit', observed=True).agg({'montant': ['sum', 'mean'], 'quantite': 'sum'}) \
+            .to_excel(writer, sheet_name='Par produit')
+    return buffer.getvalue()
+
+
+def measure(fn):
+    """Temps (exécution seule) puis pic d'allocation (2e exécution sous tracemalloc, plus lente)"""
+    crud_operations.clear_cache()
+    start = time.perf_counter()
+    data = fn()
+    duration = time.perf_counter() - start
+
+    crud_operations.clear_cache()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duration, peak, len(data)
+
+
+def main(sizes):
+    with temp_database():
+        current = 0
+        print(f"{'ventes':>10} | {'export':<8} | {'temps (s)':>9} | {'pic (Mo)':>9} | {'fichier (Mo)':>12}")
+        for size in sizes:
+            insert_synthetic_ventes(size - current, seed=size)
+            current = size
+            for label, fn in (("ancien", legacy_excel), ("par lots", exports.create_sales_excel)):
+                duration, peak, length = measure(fn)
+                print(f"{size:>10} | {label:<8} | {duration:>9.2f} | {peak / 1e6:>9.1f} | {length / 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 50_000])
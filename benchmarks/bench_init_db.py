@@ -0,0 +1,23 @@
+"""Latence de init_db() (appelé à chaque rerun Streamlit) selon la taille de la table ventes.
+
+Usage : python -m benchmarks.bench_init_db [taille ...]
+"""
+import sys
+
+import db_config
+from benchmarks._common import temp_database, insert_synthetic_ventes, timeit
+
+
+def main(sizes):
+    with temp_database():
+        print(f"{'ventes':>10} | {'init_db (ms)':>12}")
+        current = 0
+        for size in sizes:
+            insert_synthetic_ventes(size - current, seed=size)
+            current = size
+            duration = timeit(db_config.init_db)
+            print(f"{size:>10} | {duration * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000, 1_000_000])
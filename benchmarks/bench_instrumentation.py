@@ -0,0 +1,71 @@
+"""Surcoût de l'instrumentation par appel : fonction nue, décorée (mesure désactivée), décorée (activée).
+
+Mesuré sur une fonction vide (surcoût brut du décorateur) et sur une lecture
+par id servie en mémoire (chemin le plus court du tableau de bord), puis
+affichage des mesures collectées et de l'export Prometheus.
+
+Usage : python -m benchmarks.bench_instrumentation [appels]
+"""
+import sys
+import time
+
+import crud_operations
+import instrumentation
+from instrumentation import instrumented
+from benchmarks._common import temp_database, insert_synthetic_ventes
+
+
+def noop():
+    return None
+
+
+def per_call(fn, n):
+    """Durée moyenne d'un appel de fn (en secondes)"""
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+def main(n=200_000):
+    decorated = instrumented('bench.noop')(noop)
+    print(f"{'cas':<28} | {'nue':>9} | {'désactivée':>10} | {'activée':>9}")
+    with temp_database():
+        insert_synthetic_ventes(1_000)
+        cases = {
+            'fonction vide': (noop, decorated, n),
+            'get_produit_by_id': (
+                lambda: crud_operations.get_produit_by_id.__wrapped__(1),
+                lambda: crud_operations.get_produit_by_id(1),
+                n // 10,
+            ),
+        }
+        for name, (bare, wrapped, calls) in cases.items():
+            instrumentation.disable()
+            bare_time = per_call(bare, calls)
+            disabled_time = per_call(wrapped, calls)
+            instrumentation.enable()
+            enabled_time = per_call(wrapped, calls)
+            instrumentation.disable()
+            print(f"{name:<28} | {bare_time * 1e9:>6.0f} ns | {disabled_time * 1e9:>7.0f} ns"
+                  f" | {enabled_time * 1e9:>6.0f} ns")
+
+        # Une lecture non servie par le cache, pour les requêtes capturées
+        instrumentation.enable()
+        crud_operations.clear_cache()
+        crud_operations.get_ventes()
+        instrumentation.disable()
+
+    print()
+    for row in instrumentation.snapshot():
+        print(f"{row['nom']:<36} {row['appels']:>8} appels  p95 {row['p95'] * 1000:>8.3f} ms"
+              f"  lignes {row['lignes']:>9}")
+        for sql in row['requetes']:
+            print(f"    {' '.join(sql.split())[:100]}")
+    print()
+    print(instrumentation.prometheus_text(
+        {f"cache_{k}": v for k, v in crud_operations.cache_stats().items()})[:1500])
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
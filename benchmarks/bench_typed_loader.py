@@ -0,0 +1,73 @@
+"""Chargement des ventes : ancienne conversion colonne par colonne vs types déclarés (TABLE_DTYPES).
+
+Mesure le temps, la taille du DataFrame (memory_usage deep) et le pic d'allocation
+(tracemalloc, sur une exécution séparée : il ralentit la création d'objets Python).
+
+Usage : python -m benchmarks.bench_typed_loader [taille ...]
+"""
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+import db_config
+import crud_operations
+from benchmarks._common import temp_database, insert_synthetic_ventes
+
+LEGACY_QUERY = """
+SELECT v.id, v.date_vente, v.produit_id, v.client_id, p.nom as produit, p.categorie,
+       c.nom as client, v.quantite, v.montant
+FROM ventes v
+LEFT JOIN produits p ON v.produit_id = p.id
+LEFT JOIN clients c ON v.client_id = c.id
+ORDER BY v.date_vente DESC
+"""
+
+
+def legacy_load():
+    """Chargement d'avant : read_sql puis conversion de chaque colonne (objets -> str)"""
+    with db_config.get_connection() as conn:
+        df = pd.read_sql(LEGACY_QUERY, conn, parse_dates=['date_vente'])
+    for col in df.columns:
+        if pd.api.types.is_integer_dtype(df[col]):
+            df[col] = df[col].astype(int)
+        elif pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype(float)
+        elif pd.api.types.is_object_dtype(df[col]):
+            df[col] = df[col].astype(str)
+    return df
+
+
+def typed_load():
+    crud_operations.clear_cache()
+    return crud_operations.get_ventes()
+
+
+def measure(fn):
+    start = time.perf_counter()
+    df = fn()
+    duration = time.perf_counter() - start
+    size_bytes = df.memory_usage(deep=True).sum()
+    del df
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duration, size_bytes, peak
+
+
+def main(sizes):
+    with temp_database():
+        current = 0
+        print(f"{'ventes':>10} | {'chargement':<10} | {'temps (s)':>9} | {'DataFrame (Mo)':>14} | {'pic (Mo)':>9}")
+        for size in sizes:
+            insert_synthetic_ventes(size - current, seed=size)
+            current = size
+            for label, fn in (("ancien", legacy_load), ("typé", typed_load)):
+                duration, size_bytes, peak = measure(fn)
+                print(f"{size:>10} | {label:<10} | {duration:>9.3f} | {size_bytes / 1e6:>14.1f} | {peak / 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000])
@@ -0,0 +1,136 @@
+"""Vérifie le plan d'exécution (EXPLAIN QUERY PLAN) de chaque requête de crud_operations.
+
+Chaque fonction publique est appelée sur une base temporaire ; les requêtes
+réellement exécutées sont capturées puis analysées. Le script échoue (code 1)
+si l'une d'elles parcourt une table entière ou trie via un B-tree temporaire
+(hors exceptions de ALLOWED_PROBLEMS). Les INSERT ... SELECT sont vérifiés,
+les INSERT ... VALUES ignorés.
+
+Usage : python -m benchmarks.check_query_plans
+"""
+import contextlib
+import io
+import re
+import sys
+from datetime import datetime
+
+import db_config
+import crud_operations
+from benchmarks._common import temp_database, insert_synthetic_ventes
+
+def iter_ventes(*args):
+    """Parcours complet du générateur crud_operations.iter_ventes"""
+    return [len(lot) for lot in crud_operations.iter_ventes(*args)]
+
+
+# Appels représentatifs de chaque fonction de lecture et d'écriture
+CALLS = [
+    (crud_operations.get_ventes, ()),
+    (crud_operations.get_ventes, ("2023-01-01", "2023-03-31")),
+    (crud_operations.get_ventes, ("2023-01-01", "2023-03-31", ["Bureau"], ["date_vente", "montant"])),
+    (crud_operations.get_ventes_bornes, ()),
+    (crud_operations.get_ventes_page, ()),
+    (crud_operations.get_ventes_page, (50, ("2023-06-01 00:00:00", 5000), "date_vente", False)),
+    (crud_operations.get_ventes_page, (50, (5000,), "id", True, None, None, ["Bureau"])),
+    (crud_operations.get_ventes_page, (50, None, "date_vente", True, None, None, ["Bureau"])),
+    (crud_operations.get_ventes_page, (50, None, "date_vente", True, None, None, None, 3)),
+    (crud_operations.count_ventes, ()),
+    (crud_operations.count_ventes, ("2023-01-01", "2023-03-31", ["Bureau"])),
+    (crud_operations.search_ventes, ("",)),
+    (crud_operations.search_ventes, ("123",)),
+    (crud_operations.search_ventes, ("2023-05",)),
+    (crud_operations.search_ventes, ("Agrafeuse",)),
+    (crud_operations.get_vente_by_id, (3,)),
+    (iter_ventes, (None, 5000, 2000)),
+    (iter_ventes, (None, 5000, 2000, "2023-01-01", None, ["Bureau"])),
+    (crud_operations.get_categories, ()),
+    (crud_operations.get_produits, ()),
+    (crud_operations.get_clients, ()),
+    (crud_operations.search_produits, ("",)),
+    (crud_operations.search_produits, ("agraf bur",)),
+    (crud_operations.search_clients, ("alice",)),
+    (crud_operations.get_produit_by_id, (1,)),
+    (crud_operations.get_client_by_id, (1,)),
+    (crud_operations.insert_vente, (datetime(2025, 1, 1), 1, 1, 2, 3.0)),
+    (crud_operations.update_vente, (1, datetime(2025, 1, 2), 2, 2, 1, 1.5)),
+    (crud_operations.delete_vente, (2,)),
+    (crud_operations.insert_produit, ("Produit test", "Bureau", 4.0)),
+    (crud_operations.update_produit, (1, "Produit 1", "Bureau", 5.0)),
+    (crud_operations.insert_client, ("Client test", "test@example.com", "Lyon")),
+    (crud_operations.update_client, (1, "Client 1", "c1@example.com", "Paris")),
+]
+
+# "--" : corps des déclencheurs, tracés en commentaire par SQLite
+IGNORED_PREFIXES = ("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE", "--")
+# Lectures du schéma et des tables internes de FTS5 (quelques lignes, hors de notre contrôle)
+IGNORED_PATTERN = re.compile(r"\bsqlite_master\b|'\w+_fts_\w+'")
+# Exceptions examinées, par fonction : le delta des synthèses d'un changement
+# de catégorie regroupe par jour les seules ventes du produit (lues sur
+# idx_ventes_produit) ; le tri est borné par ces ventes, et un index sur
+# substr(date_vente, ...) coûterait à chaque insertion
+ALLOWED_PROBLEMS = {
+    'update_produit': {"USE TEMP B-TREE FOR GROUP BY"},
+}
+# INSERT ... VALUES n'a pas de plan ; INSERT ... SELECT (deltas des synthèses) est vérifié
+INSERT_VALUES = re.compile(r"\s*INSERT\b(?!.*\bSELECT\b)", re.IGNORECASE | re.DOTALL)
+
+
+def capture_queries():
+    """Exécute CALLS et retourne [(fonction, requête SQL)]"""
+    statements = []
+    with db_config.get_connection() as conn:
+        conn.set_trace_callback(statements.append)
+    # Un seul thread : le pool rendra cette même connexion à chaque appel
+    captured = []
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for fn, args in CALLS:
+                statements.clear()
+                fn(*args)
+                captured += [(fn.__name__, sql) for sql in statements]
+    finally:
+        conn.set_trace_callback(None)
+    return captured
+
+
+def plan_problems(conn, sql):
+    """Retourne les lignes du plan qui trahissent un scan complet ou un tri temporaire"""
+    problems = []
+    for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+        detail = row[-1]
+        if detail.startswith("SCAN") and "INDEX" not in detail:
+            problems.append(detail)
+        elif "USE TEMP B-TREE" in detail:
+            problems.append(detail)
+    return problems
+
+
+def main():
+    failures = 0
+    with temp_database():
+        insert_synthetic_ventes(10_000)
+        with db_config.get_connection() as conn:
+            conn.execute("ANALYZE")
+        captured = capture_queries()
+        with db_config.get_connection() as conn:
+            for name, sql in captured:
+                if (sql.lstrip().upper().startswith(IGNORED_PREFIXES) or IGNORED_PATTERN.search(sql)
+                        or INSERT_VALUES.match(sql)):
+                    continue
+                problems = plan_problems(conn, sql)
+                allowed = [p for p in problems if p in ALLOWED_PROBLEMS.get(name, ())]
+                problems = [p for p in problems if p not in allowed]
+                status = "ÉCHEC" if problems else "ok"
+                print(f"[{status}] {name}: {' '.join(sql.split())[:90]}")
+                for detail in problems:
+                    print(f"        -> {detail}")
+                for detail in allowed:
+                    print(f"        -> {detail} (toléré)")
+                failures += bool(problems)
+
+    print(f"{failures} requête(s) en échec")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Stress test : N threads lecteurs (get_ventes) et M threads écrivains (insert_vente/update_vente).
+
+Rapporte le débit de chaque population et le nombre d'erreurs "database is locked".
+
+Usage : python -m benchmarks.stress_concurrency [--readers N] [--writers M]
+                                                [--duration S] [--profile default|performance]
+"""
+import argparse
+import threading
+import time
+from datetime import datetime
+
+import db_config
+import crud_operations
+from benchmarks._common import temp_database, insert_synthetic_ventes
+
+
+def run(n_readers, n_writers, duration):
+    stats = {"lectures": 0, "écritures": 0, "verrous": 0, "autres erreurs": 0}
+    stats_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def record(kind, error=None):
+        with stats_lock:
+            if error is None:
+                stats[kind] += 1
+            elif "locked" in str(error):
+                stats["verrous"] += 1
+            else:
+                stats["autres erreurs"] += 1
+
+    def reader():
+        while time.perf_counter() < deadline:
+            try:
+                crud_operations.get_ventes()
+                record("lectures")
+            except ValueError as e:
+                record("lectures", e)
+
+    def writer():
+        n = 0
+        while time.perf_counter() < deadline:
+            try:
+                vente_id = crud_operations.insert_vente(datetime(2024, 1, 1 + n % 28), 1, 1, 1, 9.99)
+                crud_operations.update_vente(vente_id, datetime(2024, 2, 1), 2, 1, 2, 19.98)
+                record("écritures")
+            except ValueError as e:
+                record("écritures", e)
+            n += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(n_readers)]
+    threads += [threading.Thread(target=writer) for _ in range(n_writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--rows", type=int, default=5_000, help="ventes initiales")
+    parser.add_argument("--profile", choices=["default", "performance"], default="default")
+    args = parser.parse_args()
+
+    old_profile = db_config.DB_PROFILE
+    db_config.DB_PROFILE = args.profile
+    try:
+        with temp_database():
+            insert_synthetic_ventes(args.rows)
+            stats = run(args.readers, args.writers, args.duration)
+    finally:
+        db_config.DB_PROFILE = old_profile
+
+    print(f"profil={args.profile} lecteurs={args.readers} écrivains={args.writers} durée={args.duration}s")
+    print(f"lectures/s   : {stats['lectures'] / args.duration:,.1f}")
+    print(f"écritures/s  : {stats['écritures'] / args.duration:,.1f}")
+    print(f"erreurs verrou : {stats['verrous']}")
+    print(f"autres erreurs : {stats['autres erreurs']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Suite de benchmarks de bout en bout des chemins de données du tableau de bord.
+
+Sans Streamlit : les fonctions appelées par les pages (lecture des ventes,
+agrégations, exports, prévisions, CRUD unitaire) sont mesurées sur des bases
+générées à plusieurs tailles. Pour chaque cas : temps médian (cache des
+requêtes vidé avant chaque appel) et pic d'allocation (tracemalloc, sur une
+exécution séparée).
+
+Les résultats sont comparés à une référence JSON (benchmarks/baselines.json,
+enregistrée avec les tailles par défaut) ; le script sort en erreur si un cas
+dépasse sa référence de plus du seuil (en temps ou en mémoire). Avec --strict
+(intégration continue), une référence absente, ou un cas qu'elle ne couvre
+pas, est aussi une erreur.
+
+Usage : python -m benchmarks.suite [--tailles 10000 100000] [--repetitions 5]
+                                   [--reference benchmarks/baselines.json]
+                                   [--enregistrer] [--seuil 0.25] [--cas motif]
+                                   [--sortie resultats.json] [--strict]
+"""
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+import aggregations
+import crud_operations
+import exports
+import ml_forecasting
+from benchmarks._common import temp_database, insert_synthetic_ventes
+
+REFERENCE = os.path.join(os.path.dirname(__file__), "baselines.json")
+SEUIL = 0.25
+# Écarts absolus en deçà desquels une hausse relative est du bruit de mesure
+ECART_MIN_TEMPS = 0.005  # s
+ECART_MIN_MEMOIRE = 1024 * 1024  # octets
+
+
+def build_cases():
+    """{nom: (fonction, lourd)} ; les cas lourds ne sont exécutés qu'une fois par mesure"""
+    debut, fin = crud_operations.get_ventes_bornes()
+    mois = (fin - pd.Timedelta(days=30), fin)
+    categories = crud_operations.get_categories()[:2]
+    produit_id = int(crud_operations.get_produits()['id'].iloc[0])
+    client_id = int(crud_operations.get_clients()['id'].iloc[0])
+    vente = crud_operations.get_ventes(mois[0], mois[1]).iloc[0]
+    produits_phares = aggregations.get_ventes_par_produit()['produit'].head(3).tolist()
+    # Ventes que crud.delete_vente peut supprimer (complétées par crud.insert_vente),
+    # datées du dernier jour pour ne pas déplacer les bornes
+    inserees = [crud_operations.insert_vente(fin, produit_id, client_id, 1, 9.99) for _ in range(20)]
+
+    def insert_vente():
+        inserees.append(crud_operations.insert_vente(fin, produit_id, client_id, 1, 9.99))
+
+    def delete_vente():
+        crud_operations.delete_vente(inserees.pop())
+
+    def update_vente():
+        crud_operations.update_vente(int(vente['id']), vente['date_vente'], int(vente['produit_id']),
+                                     int(vente['client_id']), int(vente['quantite']), float(vente['montant']))
+
+    return {
+        'ventes.get_ventes': (lambda: crud_operations.get_ventes(), False),
+        'ventes.get_ventes_mois': (lambda: crud_operations.get_ventes(*mois, categories), False),
+        'ventes.page_premiere': (lambda: crud_operations.get_ventes_page(), False),
+        # Page lointaine : reprise après la clé de la plus ancienne vente du dernier mois
+        'ventes.page_profonde': (lambda: crud_operations.get_ventes_page(after=(str(mois[0]), 0)), False),
+        'ventes.count_ventes': (lambda: crud_operations.count_ventes(), False),
+        'tableau_de_bord.kpis': (lambda: aggregations.get_kpis(debut, fin), False),
+        'tableau_de_bord.par_periode_M': (lambda: aggregations.get_ventes_par_periode('M', debut, fin), False),
+        'tableau_de_bord.par_periode_D_mois': (lambda: aggregations.get_ventes_par_periode('D', *mois), False),
+        'tableau_de_bord.par_categorie': (lambda: aggregations.get_ventes_par_categorie(debut, fin), False),
+        'tableau_de_bord.par_produit': (lambda: aggregations.get_ventes_par_produit(debut, fin), False),
+        'tableau_de_bord.classement': (lambda: aggregations.get_classement_produits(5, False, debut, fin), False),
+        'tableau_de_bord.evolution': (
+            lambda: aggregations.get_evolution_produits(produits_phares, debut, fin), False),
+        'export.excel': (lambda: exports.create_sales_excel(debut, fin), True),
+        'export.csv': (lambda: exports.create_sales_csv(debut, fin), True),
+        'export.pdf_mois': (lambda: exports.create_sales_pdf(*mois), True),
+        'prevision.forecast_sales': (
+            lambda: ml_forecasting.forecast_sales(crud_operations.iter_ventes(columns=['date_vente', 'montant'])),
+            True),
+        'prevision.holt_winters': (lambda: ml_forecasting.get_engine_forecast('holt_winters'), False),
+        'crud.insert_vente': (insert_vente, False),
+        'crud.update_vente': (update_vente, False),
+        'crud.delete_vente': (delete_vente, False),
+        'crud.get_produit_by_id': (lambda: crud_operations.get_produit_by_id(produit_id), False),
+        'crud.get_produits': (lambda: crud_operations.get_produits(), False),
+        'crud.search_produits': (lambda: crud_operations.search_produits(str(vente['produit'])[:4]), False),
+        'crud.search_clients': (lambda: crud_operations.search_clients(str(vente['client'])), False),
+        'crud.get_vente_by_id': (lambda: crud_operations.get_vente_by_id(int(vente['id'])), False),
+        'crud.search_ventes_nom': (lambda: crud_operations.search_ventes(str(vente['client'])), False),
+        'crud.search_ventes_date': (lambda: crud_operations.search_ventes(str(mois[0])[:7]), False),
+    }
+
+
+def measure(fn, repeat):
+    """(temps médian en s, pic d'allocation en octets) de fn, cache vidé avant chaque appel"""
+    durations = []
+    for _ in range(repeat):
+        crud_operations.clear_cache()
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+
+    crud_operations.clear_cache()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return durations[len(durations) // 2], peak
+
+
+def run(sizes, repeat=5, pattern=None):
+    """Exécute les cas à chaque taille ; retourne {taille: {cas: {'temps', 'pic_memoire'}}}"""
+    resultats = {}
+    with temp_database():
+        current = 0
+        for size in sizes:
+            insert_synthetic_ventes(size - current, seed=size)
+            current = size
+            resultats[str(size)] = {}
+            for name, (fn, lourd) in build_cases().items():
+                if pattern and not fnmatch.fnmatch(name, pattern):
+                    continue
+                duration, peak = measure(fn, 1 if lourd else repeat)
+                resultats[str(size)][name] = {'temps': duration, 'pic_memoire': peak}
+                print(f"{size:>10} | {name:<36} | {duration * 1000:>10.1f} ms | {peak / 1e6:>8.1f} Mo",
+                      flush=True)
+    return resultats
+
+
+def compare(resultats, reference, seuil=SEUIL):
+    """Liste des régressions (taille, cas, mesure, valeur, référence) au-delà du seuil"""
+    regressions = []
+    for size, cases in resultats.items():
+        for name, mesures in cases.items():
+            base = reference.get(size, {}).get(name)
+            if base is None:
+                continue
+            for mesure, ecart_min in (('temps', ECART_MIN_TEMPS), ('pic_memoire', ECART_MIN_MEMOIRE)):
+                valeur, ref = mesures[mesure], base[mesure]
+                if valeur > ref * (1 + seuil) and valeur - ref > ecart_min:
+                    regressions.append((size, name, mesure, valeur, ref))
+    return regressions
+
+
+def missing_cases(resultats, reference):
+    """Liste des (taille, cas) mesurés sans valeur de référence"""
+    return [(size, name) for size, cases in resultats.items() for name in cases
+            if name not in reference.get(size, {})]
+
+
+def load_reference(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)['resultats']
+    except FileNotFoundError:
+        return None
+
+
+def save_results(path, resultats):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'meta': {
+                'date': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'machine': platform.platform(),
+            },
+            'resultats': resultats,
+        }, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de bout en bout (sans Streamlit)")
+    parser.add_argument("--tailles", type=int, nargs='+', default=[10_000, 100_000], help="nombres de ventes")
+    parser.add_argument("--repetitions", type=int, default=5, help="appels par mesure (cas légers)")
+    parser.add_argument("--reference", default=REFERENCE, help="fichier JSON de référence")
+    parser.add_argument("--enregistrer", action="store_true", help="remplace la référence par ces résultats")
+    parser.add_argument("--seuil", type=float, default=SEUIL, help="hausse relative tolérée (0.25 = +25 %%)")
+    parser.add_argument("--cas", default=None, help="motif des cas à exécuter (ex. 'export.*')")
+    parser.add_argument("--sortie", default=None, help="écrit aussi les résultats dans ce fichier JSON")
+    parser.add_argument("--strict", action="store_true",
+                        help="référence absente ou incomplète = erreur (intégration continue)")
+    args = parser.parse_args(argv)
+
+    resultats = run(sorted(args.tailles), args.repetitions, args.cas)
+    if args.sortie:
+        save_results(args.sortie, resultats)
+    if args.enregistrer:
+        save_results(args.reference, resultats)
+        print(f"Référence enregistrée dans {args.reference}.")
+        return 0
+
+    reference = load_reference(args.reference)
+    if reference is None:
+        print(f"Pas de référence ({args.reference}) : relancer avec --enregistrer pour en créer une.")
+        return 1 if args.strict else 0
+
+    manquants = missing_cases(resultats, reference)
+    for size, name in manquants:
+        print(f"SANS RÉFÉRENCE {size} {name}")
+    regressions = compare(resultats, reference, args.seuil)
+    for size, name, mesure, valeur, ref in regressions:
+        print(f"RÉGRESSION {size} {name} {mesure}: {valeur:.4g} (référence {ref:.4g}, +{valeur / ref - 1:.0%})")
+    print(f"{len(regressions)} régression(s) au-delà de +{args.seuil:.0%}.")
+    return 1 if regressions or (args.strict and manquants) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
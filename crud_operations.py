@@ -1,293 +1,1176 @@
+import csv
+import itertools
+import os
+import re
+import sqlite3
+import time
 import pandas as pd
-from db_config import connect_db
+import db_config
+from db_config import get_connection, write_transaction
+import rollups
+import dimensions
+import instrumentation
+from instrumentation import instrumented, one_row
 from datetime import datetime
 import numpy as np
+import functools
+import threading
+from collections import OrderedDict
 
 
 # ==================== UTILITAIRES ====================
 
-def _convert_types(df):
-    """Convertit les types numpy en types Python natifs"""
-    for col in df.columns:
-        if pd.api.types.is_integer_dtype(df[col]):
-            df[col] = df[col].astype(int)
-        elif pd.api.types.is_float_dtype(df[col]):
-            df[col] = df[col].astype(float)
-        elif pd.api.types.is_object_dtype(df[col]):
-            df[col] = df[col].astype(str)
-    return df
+# Types pandas des colonnes lues, déclarés une fois par table : entiers et
+# réels nullables (NULL -> <NA>), catégories pour les libellés répétés.
+# Les colonnes absentes (textes libres) gardent le type produit par read_sql.
+TABLE_DTYPES = {
+    'ventes': {
+        'id': 'Int64',
+        'produit_id': 'Int64',
+        'client_id': 'Int64',
+        'produit': 'category',
+        'categorie': 'category',
+        'client': 'category',
+        'quantite': 'Int64',
+        'montant': 'Float64',
+    },
+    'produits': {
+        'id': 'Int64',
+        'categorie': 'category',
+        'prix_unitaire': 'Float64',
+    },
+    'clients': {
+        'id': 'Int64',
+    },
+}
 
 
-# ==================== FONCTIONS VENTES ====================
+# Lignes lues par fetchmany et converties à la fois par _read_typed
+READ_BATCH_SIZE = 10_000
+
+
+class _TypedColumn:
+    """Colonne d'un résultat construite lot par lot dans son type final.
+
+    Entiers et réels : valeurs NumPy + masque des NULL ; catégories : codes
+    entiers et dictionnaire des libellés ; dates : datetime64. Aucun objet
+    Python n'est gardé au-delà du lot en cours (sauf pour les textes libres).
+    """
+
+    def __init__(self, dtype):
+        self.dtype = dtype
+        self.parts = []
+        self.labels = {}
+
+    def add(self, values):
+        if self.dtype == 'Int64':
+            try:
+                data = np.array(values, dtype=np.int64)
+                mask = np.zeros(len(data), dtype=bool)
+            except TypeError:
+                # NULL présents : passage par les réels (None -> nan)
+                floats = np.array(values, dtype=np.float64)
+                mask = np.isnan(floats)
+                data = np.where(mask, 0, floats).astype(np.int64)
+            self.parts.append((data, mask))
+        elif self.dtype == 'Float64':
+            data = np.array(values, dtype=np.float64)
+            self.parts.append((data, np.isnan(data)))
+        elif self.dtype == 'category':
+            codes, uniques = pd.factorize(np.array(values, dtype=object))
+            # Codes du lot -> codes globaux ; le -1 final garde les NULL à -1
+            remap = np.array([self.labels.setdefault(u, len(self.labels)) for u in uniques] + [-1],
+                             dtype=np.int32)
+            self.parts.append(remap[codes])
+        elif self.dtype == 'datetime':
+            self.parts.append(pd.to_datetime(np.array(values, dtype=object), format='ISO8601').to_numpy())
+        else:
+            self.parts.append(np.array(values, dtype=object))
+
+    def build(self):
+        if self.dtype in ('Int64', 'Float64'):
+            data = np.concatenate([d for d, _ in self.parts] or [np.array([], dtype=np.int64)])
+            mask = np.concatenate([m for _, m in self.parts] or [np.array([], dtype=bool)])
+            if self.dtype == 'Int64':
+                return pd.arrays.IntegerArray(data.astype(np.int64), mask)
+            return pd.arrays.FloatingArray(data.astype(np.float64), mask)
+        if self.dtype == 'category':
+            codes = np.concatenate(self.parts or [np.array([], dtype=np.int32)])
+            # Catégories triées, comme astype('category')
+            labels = pd.Index(list(self.labels))
+            order = labels.argsort()
+            rank = np.empty(len(order) + 1, dtype=np.int32)
+            rank[order] = np.arange(len(order))
+            rank[-1] = -1
+            return pd.Categorical.from_codes(rank[codes], categories=labels[order])
+        if self.dtype == 'datetime':
+            if not self.parts:
+                return pd.to_datetime(np.array([], dtype=object), format='ISO8601')
+            return pd.to_datetime(np.concatenate(self.parts))
+        return pd.Series(np.concatenate(self.parts or [np.array([], dtype=object)])).infer_objects()
+
 
-def get_ventes():
-    """Récupère toutes les ventes avec jointures"""
-    conn = connect_db()
+@instrumented('crud_operations.read_sql')
+def _read_typed(query, conn, table, params=None, parse_dates=None):
+    """Exécute query et type directement le résultat selon TABLE_DTYPES[table].
+
+    Les lignes sont lues par lots de READ_BATCH_SIZE et chaque lot est converti
+    aussitôt : ni la liste complète des lignes ni les colonnes d'objets
+    intermédiaires de read_sql ne sont construites.
+    """
+    dtypes = TABLE_DTYPES[table]
+    cursor = conn.execute(query, params or ())
     try:
-        query = """
-        SELECT 
-            v.id,
-            v.date_vente,
-            v.produit_id,
-            v.client_id,
-            p.nom as produit, 
-            p.categorie,
-            c.nom as client,
-            v.quantite,
-            v.montant
-        FROM ventes v
-        LEFT JOIN produits p ON v.produit_id = p.id
-        LEFT JOIN clients c ON v.client_id = c.id
-        ORDER BY v.date_vente DESC
-        """
-        df = pd.read_sql(query, conn, parse_dates=['date_vente'])
-        return _convert_types(df)
-    except Exception as e:
-        raise ValueError(f"Erreur lors de la récupération des ventes: {str(e)}")
+        names = [d[0] for d in cursor.description]
+        typed = [_TypedColumn('datetime' if name in (parse_dates or ()) else dtypes.get(name))
+                 for name in names]
+        while True:
+            rows = cursor.fetchmany(READ_BATCH_SIZE)
+            if not rows:
+                break
+            for column, values in zip(typed, zip(*rows)):
+                column.add(values)
+            del rows
     finally:
-        conn.close()
+        cursor.close()
+    return pd.DataFrame({name: column.build() for name, column in zip(names, typed)})
+
+
+# ==================== CACHE DES REQUÊTES ====================
+
+# Nombre maximal de résultats gardés en mémoire (éviction LRU au-delà)
+CACHE_MAXSIZE = 64
+
+
+class _QueryCache:
+    """Cache LRU des résultats de lecture, partagé par tout le processus.
+
+    Chaque table a un compteur de génération, incrémenté par les écritures ;
+    il fait partie de la clé, donc une écriture rend les anciens résultats
+    inaccessibles (ils sortent ensuite par l'éviction LRU). Les écritures des
+    autres processus sont vues par les versions de db_config.table_versions,
+    elles aussi dans la clé.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def generations(self, tables):
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in tables)
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None, False
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value, True
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tables):
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+_cache = _QueryCache(CACHE_MAXSIZE)
+
+
+def _freeze(value):
+    """Rend un argument hachable pour la clé de cache (listes de catégories, ...)"""
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = sorted(value, key=str) if isinstance(value, (set, frozenset)) else value
+        return tuple(_freeze(item) for item in items)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _copy(value):
+    """Copie remise à l'appelant, pour qu'il ne modifie pas la valeur en cache"""
+    if isinstance(value, (tuple, list)):
+        # (page, curseur) de get_ventes_page, listes de catégories...
+        return type(value)(_copy(item) for item in value)
+    return value.copy() if hasattr(value, 'copy') else value
+
+
+def cached_query(*tables):
+    """Décorateur : met en cache le résultat d'une lecture portant sur tables"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            # Générations (écritures du processus) et versions des tables (écritures
+            # de tout processus) lues avant la requête : un résultat calculé
+            # pendant une écriture concurrente est rangé sous l'ancienne clé
+            key = (fn.__module__, fn.__qualname__, db_config.DB_PATH, _cache.generations(tables),
+                   db_config.table_versions(*tables), _freeze(args), _freeze(kwargs))
+            value, found = _cache.get(key)
+            if not found:
+                value = fn(*args, **kwargs)
+                _cache.put(key, value)
+            return _copy(value)
+        return wrapper
+    return decorator
+
+
+def invalidates(*tables):
+    """Décorateur : une écriture réussie invalide les résultats en cache de tables"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            result = fn(*args, **kwargs)
+            _cache.invalidate(tables)
+            return result
+        return wrapper
+    return decorator
+
+
+def invalidate_cache(*tables):
+    """Invalide le cache après une écriture non détectée par db_config.table_versions
+    (insertion avec un id explicite inférieur au dernier attribué)"""
+    _cache.invalidate(tables or ('ventes', 'produits', 'clients'))
+
+
+def table_generations(*tables):
+    """Compteurs de génération de tables (changent à chaque écriture invalidant le cache)"""
+    return _cache.generations(tables)
+
+
+def cache_stats():
+    """Compteurs du cache (hits, misses, evictions, size, maxsize, hit_rate)"""
+    return _cache.stats()
+
+
+def clear_cache():
+    """Vide le cache (et les dimensions chargées) et remet ses compteurs à zéro"""
+    _cache.clear()
+    dimensions.clear()
+
+
+# ==================== FONCTIONS VENTES ====================
+
+# Colonnes exposées par get_ventes et leur expression SQL
+VENTES_COLUMNS = {
+    'id': 'v.id',
+    'date_vente': 'v.date_vente',
+    'produit_id': 'v.produit_id',
+    'client_id': 'v.client_id',
+    'produit': 'p.nom',
+    'categorie': 'p.categorie',
+    'client': 'c.nom',
+    'quantite': 'v.quantite',
+    'montant': 'v.montant',
+}
+
+
+def _format_jour(date):
+    """Date (date, datetime, Timestamp ou texte) -> 'YYYY-MM-DD'"""
+    return pd.Timestamp(date).strftime('%Y-%m-%d')
+
+
+def ventes_filter_sql(start=None, end=None, categories=None):
+    """Construit la clause WHERE paramétrée des filtres du tableau de bord.
+
+    Les bornes sont des jours inclus ; la comparaison se fait sur le texte de
+    date_vente pour rester utilisable par l'index idx_ventes_date.
+    Retourne (clause, paramètres) ; la clause est vide sans filtre.
+    """
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("v.date_vente >= ?")
+        params.append(_format_jour(start))
+    if end is not None:
+        conditions.append("v.date_vente < ?")
+        params.append(_format_jour(pd.Timestamp(end).normalize() + pd.Timedelta(days=1)))
+    if categories:
+        categories = list(categories)
+        # Le "+" empêche l'usage de idx_produits_categorie : le plan reste
+        # piloté par l'intervalle de dates, sans tri temporaire
+        conditions.append(f"+p.categorie IN ({', '.join('?' * len(categories))})")
+        params.extend(str(c) for c in categories)
+    clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return clause, params
+
+
+@instrumented()
+@cached_query('ventes', 'produits', 'clients')
+def get_ventes(start=None, end=None, categories=None, columns=None):
+    """Récupère les ventes avec jointures, filtrées côté SQL.
+
+    start/end : jours inclus (None = pas de borne)
+    categories : liste de catégories de produits (vide ou None = toutes)
+    columns : sous-ensemble de VENTES_COLUMNS (None = toutes)
+    """
+    with get_connection() as conn:
+        try:
+            columns = list(columns) if columns else list(VENTES_COLUMNS)
+            unknown = [col for col in columns if col not in VENTES_COLUMNS]
+            if unknown:
+                raise ValueError(f"Colonnes inconnues: {unknown}")
+
+            # Jointures uniquement si une colonne ou un filtre en a besoin
+            joins = ""
+            if categories or {'produit', 'categorie'} & set(columns):
+                joins += "LEFT JOIN produits p ON v.produit_id = p.id\n"
+            if 'client' in columns:
+                joins += "LEFT JOIN clients c ON v.client_id = c.id\n"
+
+            where, params = ventes_filter_sql(start, end, categories)
+            select = ",\n                ".join(f"{VENTES_COLUMNS[col]} AS {col}" for col in columns)
+            query = f"""
+            SELECT 
+                {select}
+            FROM ventes v
+            {joins}
+            {where}
+            ORDER BY v.date_vente DESC
+            """
+            parse_dates = ['date_vente'] if 'date_vente' in columns else None
+            return _read_typed(query, conn, 'ventes', params, parse_dates)
+        except Exception as e:
+            raise ValueError(f"Erreur lors de la récupération des ventes: {str(e)}")
+
+
+@instrumented()
+@cached_query('ventes')
+def get_ventes_bornes():
+    """Retourne (première date, dernière date) des ventes, ou (None, None)"""
+    with get_connection() as conn:
+        try:
+            # MIN/MAX résolus directement sur l'index idx_ventes_date
+            first = conn.execute("SELECT MIN(date_vente) FROM ventes").fetchone()[0]
+            last = conn.execute("SELECT MAX(date_vente) FROM ventes").fetchone()[0]
+            if first is None:
+                return None, None
+            return pd.Timestamp(first).to_pydatetime(), pd.Timestamp(last).to_pydatetime()
+        except Exception as e:
+            raise ValueError(f"Erreur lors de la récupération des dates de ventes: {str(e)}")
+
+
+# Tris proposés par la pagination, servis par un index ; l'id (rowid, présent
+# dans chaque index) départage les égalités et complète la clé de reprise
+VENTES_PAGE_SORTS = {
+    'date_vente': ['v.date_vente', 'v.id'],
+    'id': ['v.id'],
+}
+PAGE_SIZE = 50
+ITER_CHUNK_SIZE = 10_000
+
+
+def _sort_keys(sort):
+    """Colonnes (de VENTES_COLUMNS) de la clé du tri sort"""
+    if sort not in VENTES_PAGE_SORTS:
+        raise ValueError(f"Tri inconnu: {sort}")
+    return [key.split('.')[1] for key in VENTES_PAGE_SORTS[sort]]
+
+
+def _last_key(df, keys):
+    """Clé de reprise après la dernière ligne de df (date telle que stockée, id entier)"""
+    return tuple(int(df[key].iloc[-1]) if key == 'id' else df[key].iloc[-1] for key in keys)
+
+
+def _ventes_keyset_sql(columns, sort='date_vente', descending=True, after=None, start=None, end=None,
+                       categories=None, produit_id=None, client_id=None, count=False):
+    """Requête des ventes triées par VENTES_PAGE_SORTS[sort], reprenant après la clé after.
+
+    after : valeurs de la clé de tri de la dernière ligne déjà lue (date
+    telle que stockée, id), ou None pour commencer au début.
+    count : compte les lignes au lieu de les sélectionner.
+    Retourne (requête sans LIMIT, paramètres).
+    """
+    _sort_keys(sort)
+    keys = VENTES_PAGE_SORTS[sort]
+
+    where, params = ventes_filter_sql(start, end, categories)
+    conditions = [where[len("WHERE "):]] if where else []
+    if produit_id is not None:
+        conditions.append("v.produit_id = ?")
+        params.append(int(produit_id))
+    if client_id is not None:
+        conditions.append("v.client_id = ?")
+        params.append(int(client_id))
+    if after is not None:
+        if len(after) != len(keys):
+            raise ValueError(f"Clé de reprise invalide pour le tri {sort}: {after}")
+        # Comparaison de valeurs de ligne : résolue par l'index, sans OFFSET
+        placeholders = ", ".join("?" * len(keys))
+        conditions.append(f"({', '.join(keys)}) {'<' if descending else '>'} ({placeholders})")
+        params.extend(after)
+
+    joins = ""
+    if categories or {'produit', 'categorie'} & set(columns):
+        # Filtre de catégorie : le "+" garde le parcours dans l'ordre de l'index
+        # de tri (arrêt à la fin de la page) au lieu de partir des produits
+        # et de trier toutes leurs ventes
+        produit = "+v.produit_id" if categories and produit_id is None else "v.produit_id"
+        joins += f"LEFT JOIN produits p ON p.id = {produit}\n"
+    if 'client' in columns:
+        joins += "LEFT JOIN clients c ON v.client_id = c.id\n"
+    clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    if count:
+        return f"SELECT COUNT(*)\nFROM ventes v\n{joins}{clause}", params
+    select = ", ".join(f"{VENTES_COLUMNS[col]} AS {col}" for col in columns)
+    order = ", ".join(f"{key} {'DESC' if descending else 'ASC'}" for key in keys)
+    return f"SELECT {select}\nFROM ventes v\n{joins}{clause}\nORDER BY {order}", params
+
+
+@instrumented()
+@cached_query('ventes', 'produits', 'clients')
+def get_ventes_page(limit=PAGE_SIZE, after=None, sort='date_vente', descending=True, start=None, end=None,
+                    categories=None, produit_id=None, client_id=None):
+    """Une page de ventes (toutes les colonnes de VENTES_COLUMNS) par pagination par clé.
+
+    Le coût d'une page ne dépend pas de sa position : la requête reprend
+    après la clé de la page précédente au lieu de sauter des lignes.
+    Retourne (page, clé de la page suivante ou None s'il n'y en a pas).
+    """
+    with get_connection() as conn:
+        try:
+            columns = list(VENTES_COLUMNS)
+            query, params = _ventes_keyset_sql(columns, sort, descending, after, start, end,
+                                               categories, produit_id, client_id)
+            # Une ligne de plus pour savoir si une page suit
+            df = _read_typed(f"{query}\nLIMIT ?", conn, 'ventes', params + [int(limit) + 1])
+            has_next = len(df) > limit
+            df = df.iloc[:limit]
+            # Clé lue avant conversion : date comparée telle qu'elle est stockée
+            cursor = _last_key(df, _sort_keys(sort)) if has_next else None
+            df['date_vente'] = pd.to_datetime(df['date_vente'], format='ISO8601')
+            return df, cursor
+        except Exception as e:
+            raise ValueError(f"Erreur lors de la récupération d'une page de ventes: {str(e)}")
+
+
+@instrumented()
+@cached_query('ventes', 'produits')
+def count_ventes(start=None, end=None, categories=None, produit_id=None, client_id=None):
+    """Nombre de ventes correspondant aux filtres de get_ventes_page"""
+    with get_connection() as conn:
+        try:
+            query, params = _ventes_keyset_sql([], start=start, end=end, categories=categories,
+                                               produit_id=produit_id, client_id=client_id, count=True)
+            return conn.execute(query, params).fetchone()[0]
+        except Exception as e:
+            raise ValueError(f"Erreur lors du comptage des ventes: {str(e)}")
+
+
+def iter_ventes(after=None, limit=None, chunk_size=ITER_CHUNK_SIZE, start=None, end=None, categories=None,
+                produit_id=None, client_id=None, columns=None, sort='date_vente', descending=True,
+                as_frame=True):
+    """Génère les ventes filtrées par lots, sans charger tout le résultat en mémoire.
+
+    Chaque lot est une requête indépendante (LIMIT chunk_size) qui reprend
+    après la clé du lot précédent : aucune connexion ni lecture n'est gardée
+    ouverte entre deux lots, et un parcours interrompu peut reprendre avec
+    after (clé de la dernière ligne lue, comme pour get_ventes_page). Les
+    ventes écrites pendant le parcours y figurent si leur clé n'a pas
+    encore été dépassée.
+
+    limit : nombre maximal de lignes au total (None = toutes)
+    columns : sous-ensemble de VENTES_COLUMNS (None = toutes)
+    as_frame : lots en DataFrame typés (dates converties), sinon listes de
+    tuples dans l'ordre de columns (dates en texte)
+    """
+    columns = list(columns) if columns else list(VENTES_COLUMNS)
+    unknown = [col for col in columns if col not in VENTES_COLUMNS]
+    if unknown:
+        raise ValueError(f"Colonnes inconnues: {unknown}")
+    keys = _sort_keys(sort)
+    # Colonnes de la clé lues en plus si l'appelant ne les demande pas
+    selected = columns + [key for key in keys if key not in columns]
+    positions = [selected.index(key) for key in keys]
+    after = tuple(after) if after is not None else None
+
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        query, params = _ventes_keyset_sql(selected, sort, descending, after, start, end,
+                                           categories, produit_id, client_id)
+        with instrumentation.timed('crud_operations.iter_ventes') as mesure, get_connection() as conn:
+            try:
+                if as_frame:
+                    batch = _read_typed(f"{query}\nLIMIT ?", conn, 'ventes', params + [size])
+                    if len(batch):
+                        after = _last_key(batch, keys)
+                else:
+                    batch = conn.execute(f"{query}\nLIMIT ?", params + [size]).fetchall()
+                    if batch:
+                        after = tuple(batch[-1][i] for i in positions)
+            except Exception as e:
+                raise ValueError(f"Erreur lors de la lecture des ventes par lots: {str(e)}")
+            mesure.rows = len(batch)
+        if not len(batch):
+            return
 
+        count = len(batch)
+        if as_frame:
+            if len(selected) > len(columns):
+                batch = batch.drop(columns=selected[len(columns):])
+            if 'date_vente' in columns:
+                batch['date_vente'] = pd.to_datetime(batch['date_vente'], format='ISO8601')
+        elif len(selected) > len(columns):
+            batch = [row[:len(columns)] for row in batch]
+        yield batch
 
+        if count < size:
+            return
+        if remaining is not None:
+            remaining -= count
+
+
+SEARCH_LIMIT = 20
+# Produits et clients retenus au plus pour une recherche de ventes par nom
+SEARCH_MAX_NAMES = 20
+
+
+def _read_ventes_by_ids(conn, ids):
+    """Ventes (toutes les colonnes de VENTES_COLUMNS) des ids donnés, les plus récentes d'abord"""
+    select = ", ".join(f"{VENTES_COLUMNS[col]} AS {col}" for col in VENTES_COLUMNS)
+    # Aucun id : IN (NULL) reste une recherche par clé (IN () parcourt toute la table)
+    placeholders = ', '.join('?' * len(ids)) or 'NULL'
+    df = _read_typed(f"""
+    SELECT {select}
+    FROM ventes v
+    LEFT JOIN produits p ON v.produit_id = p.id
+    LEFT JOIN clients c ON v.client_id = c.id
+    WHERE v.id IN ({placeholders})
+    """, conn, 'ventes', [int(i) for i in ids])
+    df['date_vente'] = pd.to_datetime(df['date_vente'], format='ISO8601')
+    # Quelques lignes au plus : triées ici plutôt que par un tri temporaire SQLite
+    return df.sort_values(['date_vente', 'id'], ascending=False, ignore_index=True)
+
+
+@instrumented()
+@cached_query('ventes', 'produits', 'clients')
+def search_ventes(q='', limit=SEARCH_LIMIT):
+    """Ventes correspondant à une recherche, les plus récentes d'abord (au plus limit).
+
+    q : numéro de vente, début de date ('2024-03', '2024-03-15') ou partie
+    du nom d'un produit ou d'un client ; vide = dernières ventes.
+    Chaque critère est résolu par des lectures d'index bornées par limit :
+    le coût ne dépend pas du nombre de ventes.
+    """
+    q = (q or '').strip()
+    limit = int(limit)
+    order = "ORDER BY date_vente DESC, id DESC LIMIT ?"
+    with get_connection() as conn:
+        try:
+            # Clés (date, id) candidates de chaque critère
+            keys = set()
+            if not q:
+                keys.update(conn.execute(f"SELECT date_vente, id FROM ventes {order}", (limit,)))
+            if q.isdigit():
+                keys.update(conn.execute("SELECT date_vente, id FROM ventes WHERE id = ?", (int(q),)))
+            if re.fullmatch(r"\d{4}[-\d: ]*", q):
+                # Préfixe de date : intervalle [q, q suivant) sur idx_ventes_date
+                upper = q[:-1] + chr(ord(q[-1]) + 1)
+                keys.update(conn.execute(
+                    f"SELECT date_vente, id FROM ventes WHERE date_vente >= ? AND date_vente < ? {order}",
+                    (q, upper, limit)
+                ))
+            if q:
+                pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                for table, column in (('produits', 'produit_id'), ('clients', 'client_id')):
+                    ids = [row[0] for row in conn.execute(
+                        f"SELECT id FROM {table} WHERE nom LIKE ? ESCAPE '\\' ORDER BY nom LIMIT ?",
+                        (pattern, SEARCH_MAX_NAMES)
+                    )]
+                    # Dernières ventes de chaque produit/client : idx_ventes_produit
+                    # et idx_ventes_client sont déjà triés par date
+                    for id_ in ids:
+                        keys.update(conn.execute(
+                            f"SELECT date_vente, id FROM ventes WHERE {column} = ? {order}", (id_, limit)
+                        ))
+
+            return _read_ventes_by_ids(conn, [id_ for _, id_ in sorted(keys, reverse=True)[:limit]])
+        except Exception as e:
+            raise ValueError(f"Erreur lors de la recherche de ventes: {str(e)}")
+
+
+@instrumented(rows=one_row)
+@cached_query('ventes', 'produits', 'clients')
+def get_vente_by_id(vente_id):
+    """Récupère une vente (avec produit, catégorie et client) par son ID"""
+    with get_connection() as conn:
+        try:
+            df = _read_ventes_by_ids(conn, [vente_id])
+            return df.iloc[0] if not df.empty else None
+        except Exception as e:
+            raise ValueError(f"Erreur récupération vente: {str(e)}")
+
+
+@instrumented()
+@invalidates('ventes')
 def insert_vente(date, produit_id, client_id, quantite, montant):
     """Insère une nouvelle vente avec validation"""
-    conn = connect_db()
     try:
-        # Si la date a une heure, on la convertit au format 'YYYY-MM-DD HH:MM:SS'
-        if date:
-            # Assurer que la date est au format correct 'YYYY-MM-DD HH:MM:SS'
-            date_str = date.strftime('%Y-%m-%d %H:%M:%S')  # Format complet avec l'heure
-        else:
-            date_str = None
+        # Références vérifiées en mémoire, avant de prendre le verrou d'écriture
+        if not dimensions.produit_exists(produit_id):
+            raise ValueError(f"produit inconnu ({produit_id})")
+        if not dimensions.client_exists(client_id):
+            raise ValueError(f"client inconnu ({client_id})")
 
-        print(f"Insertion de la vente avec la date : {date_str}")  # Debug print
+        with write_transaction() as conn:
+            # Si la date a une heure, on la convertit au format 'YYYY-MM-DD HH:MM:SS'
+            if date:
+                # Assurer que la date est au format correct 'YYYY-MM-DD HH:MM:SS'
+                date_str = date.strftime('%Y-%m-%d %H:%M:%S')  # Format complet avec l'heure
+            else:
+                date_str = None
 
-        # Paramètres pour l'insertion
-        params = (
-            date_str,
-            int(produit_id),
-            int(client_id),
-            int(quantite),
-            float(montant)
-        )
+            # Paramètres pour l'insertion
+            params = (
+                date_str,
+                int(produit_id),
+                int(client_id),
+                int(quantite),
+                float(montant)
+            )
 
-        cursor = conn.cursor()
-        cursor.execute("""
-        INSERT INTO ventes 
-        (date_vente, produit_id, client_id, quantite, montant) 
-        VALUES (?, ?, ?, ?, ?)
-        """, params)
-        conn.commit()
-        return cursor.lastrowid
+            cursor = conn.cursor()
+            cursor.execute("""
+            INSERT INTO ventes 
+            (date_vente, produit_id, client_id, quantite, montant) 
+            VALUES (?, ?, ?, ?, ?)
+            """, params)
+            rollups.apply_delta(conn, "v.id = ?", [cursor.lastrowid])
+            return cursor.lastrowid
     except Exception as e:
-        conn.rollback()
         raise ValueError(f"Erreur insertion vente: {str(e)}")
-    finally:
-        conn.close()
 
+@instrumented()
+@invalidates('ventes')
 def update_vente(vente_id, date, produit_id, client_id, quantite, montant):
     """Met à jour une vente existante"""
-    conn = connect_db()
     try:
-        date_str = date.strftime('%Y-%m-%d %H:%M:%S') if date else None
-        params = (
-            date_str,
-            int(produit_id),
-            int(client_id),
-            int(quantite),
-            float(montant),
-            int(vente_id)
-        )
+        if not dimensions.produit_exists(produit_id):
+            raise ValueError(f"produit inconnu ({produit_id})")
+        if not dimensions.client_exists(client_id):
+            raise ValueError(f"client inconnu ({client_id})")
+
+        with write_transaction() as conn:
+            date_str = date.strftime('%Y-%m-%d %H:%M:%S') if date else None
+            params = (
+                date_str,
+                int(produit_id),
+                int(client_id),
+                int(quantite),
+                float(montant),
+                int(vente_id)
+            )
 
-        cursor = conn.cursor()
-        cursor.execute("""
-        UPDATE ventes SET 
-            date_vente=?, 
-            produit_id=?, 
-            client_id=?, 
-            quantite=?, 
-            montant=? 
-        WHERE id=?
-        """, params)
-        conn.commit()
-        return cursor.rowcount
+            # Synthèses : retrait de l'ancienne valeur, ajout de la nouvelle
+            rollups.apply_delta(conn, "v.id = ?", [int(vente_id)], -1)
+            cursor = conn.cursor()
+            cursor.execute("""
+            UPDATE ventes SET 
+                date_vente=?, 
+                produit_id=?, 
+                client_id=?, 
+                quantite=?, 
+                montant=? 
+            WHERE id=?
+            """, params)
+            rollups.apply_delta(conn, "v.id = ?", [int(vente_id)])
+            return cursor.rowcount
     except Exception as e:
-        conn.rollback()
         raise ValueError(f"Erreur mise à jour vente: {str(e)}")
-    finally:
-        conn.close()
 
+@instrumented()
+@invalidates('ventes')
 def delete_vente(vente_id):
     """Supprime une vente"""
-    conn = connect_db()
     try:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM ventes WHERE id=?", (int(vente_id),))
-        conn.commit()
-        return cursor.rowcount
+        with write_transaction() as conn:
+            rollups.apply_delta(conn, "v.id = ?", [int(vente_id)], -1)
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM ventes WHERE id=?", (int(vente_id),))
+            return cursor.rowcount
     except Exception as e:
-        conn.rollback()
         raise ValueError(f"Erreur suppression vente: {str(e)}")
-    finally:
-        conn.close()
+
+
+# ==================== RECHERCHE PLEIN TEXTE ====================
+
+def _search_table(table, columns, q, limit):
+    """Lignes de table dont les champs texte contiennent chaque mot de q (en début de mot).
+
+    Index FTS5 {table}_fts (migration 6), classé par bm25 ; à défaut (SQLite
+    sans FTS5), filtre LIKE trié par nom. q vide : premières lignes par nom.
+    """
+    mots = re.findall(r"\w+", q or '')
+    select = ", ".join(f"t.{col}" for col in columns)
+    with get_connection() as conn:
+        if not mots:
+            return _read_typed(f"SELECT {select} FROM {table} t ORDER BY t.nom LIMIT ?",
+                               conn, table, [int(limit)])
+
+        fts = f"{table}_fts"
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).fetchone():
+            # Chaque mot entre guillemets (aucun opérateur FTS5 interprété), en préfixe
+            match = " ".join('"' + mot + '"*' for mot in mots)
+            return _read_typed(f"""
+            SELECT {select}
+            FROM {fts}
+            JOIN {table} t ON t.id = {fts}.rowid
+            WHERE {fts} MATCH ?
+            ORDER BY {fts}.rank
+            LIMIT ?
+            """, conn, table, [match, int(limit)])
+
+        texts = [col for col in columns if TABLE_DTYPES[table].get(col) not in ('Int64', 'Float64')]
+        condition = " AND ".join(
+            "(" + " OR ".join(f"t.{col} LIKE ? ESCAPE '\\'" for col in texts) + ")" for _ in mots
+        )
+        params = ["%" + mot.replace("_", "\\_") + "%" for mot in mots for _ in texts]
+        return _read_typed(f"SELECT {select} FROM {table} t WHERE {condition} ORDER BY t.nom LIMIT ?",
+                           conn, table, params + [int(limit)])
 
 
 # ==================== FONCTIONS PRODUITS ====================
 
+PRODUITS_COLUMNS = ['id', 'nom', 'categorie', 'prix_unitaire']
+
+@instrumented()
+@cached_query('produits')
 def get_produits():
     """Récupère tous les produits"""
-    conn = connect_db()
+    with get_connection() as conn:
+        try:
+            return _read_typed(f"SELECT {', '.join(PRODUITS_COLUMNS)} FROM produits ORDER BY nom",
+                               conn, 'produits')
+        except Exception as e:
+            raise ValueError(f"Erreur récupération produits: {str(e)}")
+
+
+@instrumented()
+@cached_query('produits')
+def search_produits(q='', limit=SEARCH_LIMIT):
+    """Produits dont le nom ou la catégorie contient chaque mot de q, les plus pertinents d'abord.
+
+    Recherche par début de mot, sans tenir compte des accents ni de la casse
+    ('agraf bur' trouve 'Agrafeuse' de la catégorie 'Bureau') ; au plus limit
+    produits, q vide = premiers produits par nom.
+    """
     try:
-        df = pd.read_sql("SELECT * FROM produits ORDER BY nom", conn)
-        return _convert_types(df)
+        return _search_table('produits', PRODUITS_COLUMNS, q, limit)
     except Exception as e:
-        raise ValueError(f"Erreur récupération produits: {str(e)}")
-    finally:
-        conn.close()
+        raise ValueError(f"Erreur recherche produits: {str(e)}")
+
+
+@instrumented()
+@cached_query('produits')
+def get_categories():
+    """Récupère la liste triée des catégories de produits"""
+    with get_connection() as conn:
+        try:
+            rows = conn.execute("""
+            SELECT DISTINCT categorie FROM produits
+            WHERE categorie IS NOT NULL
+            ORDER BY categorie
+            """).fetchall()
+            return [row[0] for row in rows]
+        except Exception as e:
+            raise ValueError(f"Erreur récupération catégories: {str(e)}")
 
 
+@instrumented()
+@invalidates('produits')
 def insert_produit(nom, categorie, prix_unitaire):
     """Ajoute un nouveau produit"""
-    conn = connect_db()
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-        INSERT INTO produits (nom, categorie, prix_unitaire)
-        VALUES (?, ?, ?)
-        """, (str(nom), str(categorie), float(prix_unitaire)))
-        conn.commit()
-        return cursor.lastrowid
+        with write_transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+            INSERT INTO produits (nom, categorie, prix_unitaire)
+            VALUES (?, ?, ?)
+            """, (str(nom), str(categorie), float(prix_unitaire)))
+            return cursor.lastrowid
     except Exception as e:
-        conn.rollback()
         raise ValueError(f"Erreur insertion produit: {str(e)}")
-    finally:
-        conn.close()
 
 
+@instrumented()
+@invalidates('produits')
 def update_produit(produit_id, nom, categorie, prix_unitaire):
     """Met à jour un produit"""
-    conn = connect_db()
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-        UPDATE produits SET 
-            nom=?, 
-            categorie=?, 
-            prix_unitaire=? 
-        WHERE id=?
-        """, (str(nom), str(categorie), float(prix_unitaire), int(produit_id)))
-        conn.commit()
-        return cursor.rowcount
+        with write_transaction() as conn:
+            # Un changement de catégorie déplace les ventes du produit dans les synthèses
+            row = conn.execute("SELECT categorie FROM produits WHERE id=?", (int(produit_id),)).fetchone()
+            change_categorie = row is not None and row[0] != str(categorie)
+            if change_categorie:
+                rollups.apply_delta(conn, "v.produit_id = ?", [int(produit_id)], -1)
+
+            cursor = conn.cursor()
+            cursor.execute("""
+            UPDATE produits SET 
+                nom=?, 
+                categorie=?, 
+                prix_unitaire=? 
+            WHERE id=?
+            """, (str(nom), str(categorie), float(prix_unitaire), int(produit_id)))
+            if change_categorie:
+                rollups.apply_delta(conn, "v.produit_id = ?", [int(produit_id)])
+            return cursor.rowcount
     except Exception as e:
-        conn.rollback()
         raise ValueError(f"Erreur mise à jour produit: {str(e)}")
-    finally:
-        conn.close()
 
 
+@instrumented()
+@invalidates('produits')
 def delete_produit(produit_id):
     """Supprime un produit"""
-    conn = connect_db()
     try:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM produits WHERE id=?", (int(produit_id),))
-        conn.commit()
-        return cursor.rowcount
+        with write_transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM produits WHERE id=?", (int(produit_id),))
+            return cursor.rowcount
     except Exception as e:
-        conn.rollback()
         raise ValueError(f"Erreur suppression produit: {str(e)}")
-    finally:
-        conn.close()
 
 
 # ==================== FONCTIONS CLIENTS ====================
 
+CLIENTS_COLUMNS = ['id', 'nom', 'email', 'ville']
+
+@instrumented()
+@cached_query('clients')
 def get_clients():
     """Récupère tous les clients"""
-    conn = connect_db()
+    with get_connection() as conn:
+        try:
+            return _read_typed(f"SELECT {', '.join(CLIENTS_COLUMNS)} FROM clients ORDER BY nom",
+                               conn, 'clients')
+        except Exception as e:
+            raise ValueError(f"Erreur récupération clients: {str(e)}")
+
+
+@instrumented()
+@cached_query('clients')
+def search_clients(q='', limit=SEARCH_LIMIT):
+    """Clients dont le nom, l'email ou la ville contient chaque mot de q, les plus pertinents d'abord.
+
+    Même recherche que search_produits ; au plus limit clients.
+    """
     try:
-        df = pd.read_sql("SELECT * FROM clients ORDER BY nom", conn)
-        return _convert_types(df)
+        return _search_table('clients', CLIENTS_COLUMNS, q, limit)
     except Exception as e:
-        raise ValueError(f"Erreur récupération clients: {str(e)}")
-    finally:
-        conn.close()
+        raise ValueError(f"Erreur recherche clients: {str(e)}")
 
 
+@instrumented()
+@invalidates('clients')
 def insert_client(nom, email, ville):
     """Ajoute un nouveau client"""
-    conn = connect_db()
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-        INSERT INTO clients (nom, email, ville)
-        VALUES (?, ?, ?)
-        """, (str(nom), str(email), str(ville)))
-        conn.commit()
-        return cursor.lastrowid
+        with write_transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+            INSERT INTO clients (nom, email, ville)
+            VALUES (?, ?, ?)
+            """, (str(nom), str(email), str(ville)))
+            return cursor.lastrowid
     except Exception as e:
-        conn.rollback()
         raise ValueError(f"Erreur insertion client: {str(e)}")
-    finally:
-        conn.close()
 
 
+@instrumented()
+@invalidates('clients')
 def update_client(client_id, nom, email, ville):
     """Met à jour un client"""
-    conn = connect_db()
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-        UPDATE clients SET 
-            nom=?, 
-            email=?, 
-            ville=? 
-        WHERE id=?
-        """, (str(nom), str(email), str(ville), int(client_id)))
-        conn.commit()
-        return cursor.rowcount
+        with write_transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+            UPDATE clients SET 
+                nom=?, 
+                email=?, 
+                ville=? 
+            WHERE id=?
+            """, (str(nom), str(email), str(ville), int(client_id)))
+            return cursor.rowcount
     except Exception as e:
-        conn.rollback()
         raise ValueError(f"Erreur mise à jour client: {str(e)}")
-    finally:
-        conn.close()
 
 
+@instrumented()
+@invalidates('clients')
 def delete_client(client_id):
     """Supprime un client"""
-    conn = connect_db()
     try:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM clients WHERE id=?", (int(client_id),))
-        conn.commit()
-        return cursor.rowcount
+        with write_transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM clients WHERE id=?", (int(client_id),))
+            return cursor.rowcount
     except Exception as e:
-        conn.rollback()
         raise ValueError(f"Erreur suppression client: {str(e)}")
-    finally:
-        conn.close()
 
 
 # ==================== FONCTIONS UTILITAIRES ====================
 
+@instrumented(rows=one_row)
 def get_produit_by_id(produit_id):
-    """Récupère un produit par son ID"""
-    conn = connect_db()
+    """Récupère un produit par son ID (lu dans la dimension produits)"""
     try:
-        df = pd.read_sql("SELECT * FROM produits WHERE id=?", conn, params=(int(produit_id),))
-        return _convert_types(df).iloc[0] if not df.empty else None
+        row = dimensions.produits().row(produit_id)
+        return pd.Series(row) if row is not None else None
     except Exception as e:
         raise ValueError(f"Erreur récupération produit: {str(e)}")
-    finally:
-        conn.close()
 
 
+@instrumented(rows=one_row)
 def get_client_by_id(client_id):
-    """Récupère un client par son ID"""
-    conn = connect_db()
+    """Récupère un client par son ID (lu dans la dimension clients)"""
     try:
-        df = pd.read_sql("SELECT * FROM clients WHERE id=?", conn, params=(int(client_id),))
-        return _convert_types(df).iloc[0] if not df.empty else None
+        row = dimensions.clients().row(client_id)
+        return pd.Series(row) if row is not None else None
     except Exception as e:
         raise ValueError(f"Erreur récupération client: {str(e)}")
+
+
+@instrumented()
+@cached_query('produits')
+def get_produit_ids():
+    """Ensemble des identifiants de produits (validation des imports)"""
+    with get_connection() as conn:
+        return frozenset(row[0] for row in conn.execute("SELECT id FROM produits"))
+
+
+@instrumented()
+@cached_query('clients')
+def get_client_ids():
+    """Ensemble des identifiants de clients (validation des imports)"""
+    with get_connection() as conn:
+        return frozenset(row[0] for row in conn.execute("SELECT id FROM clients"))
+
+
+# ==================== IMPORT EN MASSE ====================
+
+# Colonnes attendues dans un fichier (ou un itérable) de ventes à importer
+IMPORT_COLUMNS = ['date_vente', 'produit_id', 'client_id', 'quantite', 'montant']
+# Lignes lues, validées et insérées par transaction
+BULK_CHUNK_SIZE = 100_000
+# Cache de pages SQLite pendant un lot (en Kio, négatif comme PRAGMA cache_size)
+BULK_CACHE_SIZE = -128 * 1024
+# Ventes par instruction INSERT : 5 paramètres chacune, sous la limite de
+# 999 paramètres des anciennes versions de SQLite
+BULK_ROWS_PER_INSERT = 199
+
+
+def _import_chunks(source, chunk_size, sep=None):
+    """Découpe la source en DataFrames de chunk_size lignes (colonnes IMPORT_COLUMNS).
+
+    source : chemin d'un fichier .csv ou .parquet, DataFrame, ou itérable de
+    dicts / tuples dans l'ordre d'IMPORT_COLUMNS.
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_size):
+            yield source.iloc[start:start + chunk_size]
+    elif isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        if path.endswith('.parquet'):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ValueError("L'import Parquet nécessite le paquet pyarrow")
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=IMPORT_COLUMNS):
+                yield batch.to_pandas()
+        else:
+            if sep is None:
+                # Séparateur des exports (';') ou CSV standard (',')
+                with open(path, encoding='utf-8-sig') as f:
+                    sep = ';' if ';' in f.readline() else ','
+            # Colonnes numériques analysées par le lecteur C ; une valeur
+            # invalide laisse la colonne en texte et la ligne est rejetée ensuite
+            yield from pd.read_csv(path, sep=sep, chunksize=chunk_size, dtype={'date_vente': str},
+                                   encoding='utf-8-sig')
+    else:
+        rows = iter(source)
+        while True:
+            batch = list(itertools.islice(rows, chunk_size))
+            if not batch:
+                break
+            if isinstance(batch[0], dict):
+                yield pd.DataFrame.from_records(batch, columns=IMPORT_COLUMNS)
+            else:
+                yield pd.DataFrame(batch, columns=IMPORT_COLUMNS)
+
+
+def _validate_chunk(df, produit_ids, client_ids):
+    """Valide un lot en colonnes.
+
+    Retourne (lignes à insérer, index de ces lignes dans df, motif de rejet
+    de chaque ligne de df ou None).
+    """
+    dates = pd.to_datetime(df['date_vente'], errors='coerce', format='ISO8601')
+    produit_id = pd.to_numeric(df['produit_id'], errors='coerce')
+    client_id = pd.to_numeric(df['client_id'], errors='coerce')
+    quantite = pd.to_numeric(df['quantite'], errors='coerce')
+    montant = pd.to_numeric(df['montant'], errors='coerce')
+
+    motifs = pd.Series(None, index=df.index, dtype=object)
+    # Du moins au plus prioritaire : le dernier motif applicable reste
+    checks = [
+        (montant.isna(), "montant invalide"),
+        (quantite.isna() | (quantite % 1 != 0) | (quantite <= 0), "quantité invalide"),
+        (~client_id.isin(client_ids), "client inconnu"),
+        (~produit_id.isin(produit_ids), "produit inconnu"),
+        (dates.isna(), "date invalide"),
+    ]
+    for mask, motif in checks:
+        motifs[mask.to_numpy()] = motif
+
+    # Lignes valides triées par date : les insertions dans les index sur
+    # date_vente se font en séquence plutôt qu'à des pages aléatoires
+    valid = np.flatnonzero(motifs.isna().to_numpy())
+    valid = valid[np.argsort(dates.to_numpy()[valid], kind='stable')]
+    rows = list(zip(
+        dates.iloc[valid].dt.strftime('%Y-%m-%d %H:%M:%S').tolist(),
+        produit_id.iloc[valid].astype('int64').tolist(),
+        client_id.iloc[valid].astype('int64').tolist(),
+        quantite.iloc[valid].astype('int64').tolist(),
+        montant.iloc[valid].astype('float64').tolist(),
+    ))
+    return rows, df.index[valid], motifs
+
+
+def _insert_rows(conn, rows):
+    """Insère les lignes d'un lot ; retourne les (index, erreur) des lignes refusées par SQLite"""
+    query = "INSERT INTO ventes (date_vente, produit_id, client_id, quantite, montant) VALUES (?, ?, ?, ?, ?)"
+    conn.execute("SAVEPOINT lot_ventes")
+    try:
+        # Plusieurs lignes par instruction : moins d'appels SQLite par vente
+        multi = query + ", (?, ?, ?, ?, ?)" * (BULK_ROWS_PER_INSERT - 1)
+        complete = len(rows) // BULK_ROWS_PER_INSERT * BULK_ROWS_PER_INSERT
+        conn.executemany(multi, (
+            list(itertools.chain.from_iterable(rows[i:i + BULK_ROWS_PER_INSERT]))
+            for i in range(0, complete, BULK_ROWS_PER_INSERT)
+        ))
+        conn.executemany(query, rows[complete:])
+        conn.execute("RELEASE lot_ventes")
+        return []
+    except sqlite3.IntegrityError:
+        # Une ligne refusée (base modifiée depuis la validation) : reprise ligne à ligne
+        conn.execute("ROLLBACK TO lot_ventes")
+        conn.execute("RELEASE lot_ventes")
+    erreurs = []
+    for i, row in enumerate(rows):
+        try:
+            conn.execute(query, row)
+        except sqlite3.IntegrityError as e:
+            erreurs.append((i, str(e)))
+    return erreurs
+
+
+def _rows_frame(conn, rows, erreurs):
+    """Lignes insérées d'un lot (hors erreurs) avec la catégorie de leur produit.
+
+    Catégories lues par la connexion d'écriture : une autre connexion serait
+    bloquée par la transaction en cours hors mode WAL.
+    """
+    df = pd.DataFrame(rows, columns=IMPORT_COLUMNS)
+    if erreurs:
+        df = df.drop(index=[i for i, _ in erreurs])
+    categories = dict(conn.execute("SELECT id, categorie FROM produits").fetchall())
+    df['categorie'] = df['produit_id'].map(categories)
+    return df
+
+
+@instrumented()
+def bulk_insert_ventes(source, rejects=None, chunk_size=BULK_CHUNK_SIZE, sep=None):
+    """Importe des ventes en masse, par lots validés et insérés dans une transaction chacun.
+
+    source : chemin .csv / .parquet, DataFrame ou itérable de lignes
+    (colonnes IMPORT_COLUMNS). Les produits et clients sont vérifiés contre
+    les ensembles d'identifiants en cache ; les lignes invalides sont écrites
+    dans rejects (chemin ou fichier texte, CSV avec numéro de ligne et motif)
+    au lieu d'interrompre l'import. Les synthèses sont mises à jour par lot.
+
+    Retourne {'inserees', 'rejetees', 'duree'}.
+    """
+    started = time.perf_counter()
+    inserted = rejected = 0
+    reject_file = rejects
+    if isinstance(rejects, (str, os.PathLike)):
+        reject_file = open(rejects, 'w', newline='', encoding='utf-8')
+    writer = None
+    try:
+        offset = 0
+        for df in _import_chunks(source, chunk_size, sep):
+            missing = [col for col in IMPORT_COLUMNS if col not in df.columns]
+            if missing:
+                raise ValueError(f"Colonnes manquantes: {missing}")
+            df = df[IMPORT_COLUMNS].reset_index(drop=True)
+
+            rows, rows_index, motifs = _validate_chunk(df, get_produit_ids(), get_client_ids())
+            with write_transaction() as conn:
+                # Cache de pages agrandi le temps du lot (pages d'index modifiées)
+                previous_cache = conn.execute("PRAGMA cache_size").fetchone()[0]
+                conn.execute(f"PRAGMA cache_size = {BULK_CACHE_SIZE}")
+                try:
+                    erreurs = _insert_rows(conn, rows)
+                    # Synthèses : agrégats du lot calculés en mémoire et appliqués
+                    # une fois par transaction
+                    rollups.add_aggregates(conn, *rollups.aggregates(_rows_frame(conn, rows, erreurs)))
+                finally:
+                    conn.execute(f"PRAGMA cache_size = {previous_cache}")
+
+            for i, erreur in erreurs:
+                motifs[rows_index[i]] = erreur
+            n_rejects = int(motifs.notna().sum())
+            inserted += len(rows) - len(erreurs)
+            rejected += n_rejects
+
+            if n_rejects and reject_file is not None:
+                if writer is None:
+                    writer = csv.writer(reject_file)
+                    writer.writerow(['ligne'] + IMPORT_COLUMNS + ['motif'])
+                refus = df[motifs.notna().to_numpy()]
+                writer.writerows(
+                    [offset + i + 1] + list(values) + [motifs[i]]
+                    for i, values in zip(refus.index, refus.itertuples(index=False, name=None))
+                )
+            offset += len(df)
+
+        return {'inserees': inserted, 'rejetees': rejected,
+                'duree': time.perf_counter() - started}
+    except Exception as e:
+        raise ValueError(f"Erreur import des ventes: {str(e)}")
     finally:
-        conn.close()
\ No newline at end of file
+        # Les lots déjà validés restent en base même si un lot suivant échoue
+        invalidate_cache('ventes')
+        if reject_file is not None and reject_file is not rejects:
+            reject_file.close()
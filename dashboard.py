@@ -4,10 +4,17 @@ import plotly.express as px
 from datetime import datetime, timedelta
 from db_config import connect_db, init_db
 from crud_operations import *
-from ml_forecasting import forecast_sales
+from aggregations import (get_kpis, get_ventes_par_categorie, get_ventes_par_produit,
+                          get_classement_produits, get_ventes_par_periode, get_evolution_produits)
+from exports import create_sales_excel, create_sales_csv, create_sales_pdf
+from ml_forecasting import get_forecast, get_engine_forecast, is_model_current
+from jobs import submit_job, job_status, job_result
+from model_registry import data_fingerprint
+import dimensions
+import instrumentation
+from instrumentation import instrumented, timed
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 import numpy as np
-from fpdf import FPDF
 import io
 from PIL import Image
 import base64
@@ -15,6 +22,14 @@ from io import BytesIO
 # Initialisation de la base de données
 init_db()
 
+# Intervalle entre deux consultations de l'état d'une tâche de fond (secondes)
+JOB_POLL_INTERVAL = 1.0
+# st.fragment (Streamlit >= 1.37) relance seule la zone d'attente d'une tâche ;
+# à défaut, un bouton relance la page
+_fragment = getattr(st, 'fragment', None)
+# Lignes affichées au plus par les listes de produits et de clients (recherche plein texte)
+LIST_LIMIT = 100
+
 # Variable de session pour suivre le dernier traitement
 if 'last_processed' not in st.session_state:
     st.session_state.last_processed = None
@@ -28,6 +43,30 @@ st.set_page_config(
 )
 
 
+def _job_poll(job_id, message):
+    if job_status(job_id) in ('en_attente', 'en_cours'):
+        st.info(message)
+    else:
+        # Tâche terminée : la page entière est relancée pour afficher le résultat
+        st.rerun()
+
+
+if _fragment is not None:
+    _job_poll = _fragment(run_every=JOB_POLL_INTERVAL)(_job_poll)
+
+
+def wait_job(job_id, message):
+    """Vrai si la tâche de fond est finie ; sinon affiche l'attente sans bloquer le script"""
+    if job_status(job_id) not in ('en_attente', 'en_cours'):
+        return True
+    if _fragment is not None:
+        _job_poll(job_id, message)
+    else:
+        st.info(message)
+        st.button("Actualiser", key=f"job_{job_id}")
+    return False
+
+
 # Thème clair/sombre
 def set_theme():
     if "theme" not in st.session_state:
@@ -54,24 +93,18 @@ def login():
 
 
 # --- Tableau de bord ---
+@instrumented('dashboard.tableau_de_bord')
 def show_dashboard():
     st.header("Tableau de bord avancé des ventes")
 
     try:
-        df_ventes = get_ventes()
+        # Bornes de dates lues sur l'index, sans charger les ventes
+        min_date, max_date = get_ventes_bornes()
 
-        # Conversion et nettoyage des dates
-        df_ventes['date_vente'] = pd.to_datetime(df_ventes['date_vente'], errors='coerce')
-        df_ventes = df_ventes.dropna(subset=['date_vente'])
-
-        if df_ventes.empty:
+        if min_date is None:
             st.warning("Aucune donnée de vente valide disponible")
             return
 
-        # Détermination des dates min/max
-        min_date = df_ventes['date_vente'].min().to_pydatetime()
-        max_date = df_ventes['date_vente'].max().to_pydatetime()
-
         # Filtres
         with st.expander("🔍 Filtres", expanded=True):
             col1, col2, col3, col4 = st.columns(4)
@@ -80,34 +113,28 @@ def show_dashboard():
             with col2:
                 date_fin = st.date_input("Date fin", max_date)
             with col3:
-                categories = st.multiselect("Catégories", df_ventes['categorie'].unique())
+                categories = st.multiselect("Catégories", get_categories())
             with col4:
                 period = st.selectbox("Période d'analyse", ["Journalier", "Mensuel", "Trimestriel", "Annuel"])
 
-        # Application des filtres
-        mask = (
-                (df_ventes['date_vente'].dt.date >= date_debut) &
-                (df_ventes['date_vente'].dt.date <= date_fin)
-        )
-        filtered_df = df_ventes[mask]
-
-        if categories:
-            filtered_df = filtered_df[filtered_df['categorie'].isin(categories)]
+        # Filtres appliqués côté SQL : les graphiques ne reçoivent que des agrégats
+        filters = (date_debut, date_fin, categories)
 
         # KPI
         st.subheader("Indicateurs clés")
+        kpis = get_kpis(*filters)
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            total = filtered_df['montant'].sum()
+            total = kpis['total']
             st.metric("Total ventes", f"{total:,.2f}CFA")
         with col2:
-            count = len(filtered_df)
+            count = kpis['count']
             st.metric("Nombre de ventes", count)
         with col3:
-            avg = filtered_df['montant'].mean() if not filtered_df.empty else 0
+            avg = kpis['moyenne']
             st.metric("Panier moyen", f"{avg:,.2f}CFA")
         with col4:
-            top_product = filtered_df.groupby('produit')['quantite'].sum().idxmax() if not filtered_df.empty else "N/A"
+            top_product = kpis['produit_phare']
             st.metric("Produit phare", top_product)
 
         # Graphiques
@@ -115,8 +142,8 @@ def show_dashboard():
         tab1, tab2, tab3, tab4, tab5 = st.tabs(
             ["Évolution", "Répartition", "Performance Produits", "Détails", "Exporter"])
 
-        with tab1:  # Évolution
-            if not filtered_df.empty:
+        with tab1, timed('dashboard.tableau_de_bord.evolution'):  # Évolution
+            if count:
                 # Déterminer la fréquence en fonction de la période sélectionnée
                 freq_map = {
                     "Journalier": 'D',
@@ -126,10 +153,7 @@ def show_dashboard():
                 }
                 freq = freq_map.get(period, 'M')  # Par défaut mensuel
 
-                period_sales = filtered_df.groupby(pd.Grouper(key='date_vente', freq=freq)).agg({
-                    'montant': 'sum',
-                    'quantite': 'sum'
-                }).reset_index()
+                period_sales = get_ventes_par_periode(freq, *filters)
 
                 fig = px.line(
                     period_sales,
@@ -158,12 +182,13 @@ def show_dashboard():
             else:
                 st.warning("Aucune donnée à afficher pour la période sélectionnée")
 
-        with tab2:  # Répartition
-            if not filtered_df.empty:
+        with tab2, timed('dashboard.tableau_de_bord.repartition'):  # Répartition
+            if count:
+                par_categorie = get_ventes_par_categorie(*filters)
                 col1, col2 = st.columns(2)
                 with col1:
                     fig = px.pie(
-                        filtered_df.groupby('categorie')['montant'].sum().reset_index(),
+                        par_categorie,
                         names='categorie',
                         values='montant',
                         title='Répartition par catégorie',
@@ -172,7 +197,7 @@ def show_dashboard():
                     st.plotly_chart(fig, use_container_width=True)
                 with col2:
                     fig = px.bar(
-                        filtered_df.groupby('categorie')['quantite'].sum().reset_index(),
+                        par_categorie,
                         x='categorie',
                         y='quantite',
                         title='Quantité vendue par catégorie',
@@ -182,11 +207,11 @@ def show_dashboard():
             else:
                 st.warning("Aucune donnée à afficher pour la période sélectionnée")
 
-        with tab3:  # Performance Produits
-            if not filtered_df.empty:
+        with tab3, timed('dashboard.tableau_de_bord.performance_produits'):  # Performance Produits
+            if count:
                 col1, col2 = st.columns(2)
                 with col1:
-                    top_produits = filtered_df.groupby('produit')['quantite'].sum().nlargest(5).reset_index()
+                    top_produits = get_classement_produits(5, False, *filters)
                     fig = px.bar(
                         top_produits,
                         x='produit',
@@ -198,7 +223,7 @@ def show_dashboard():
                     st.plotly_chart(fig, use_container_width=True)
 
                 with col2:
-                    bottom_produits = filtered_df.groupby('produit')['quantite'].sum().nsmallest(5).reset_index()
+                    bottom_produits = get_classement_produits(5, True, *filters)
                     fig = px.bar(
                         bottom_produits,
                         x='produit',
@@ -213,30 +238,40 @@ def show_dashboard():
                 st.subheader("Évolution des produits")
                 selected_products = st.multiselect(
                     "Sélectionnez les produits à comparer",
-                    options=filtered_df['produit'].unique(),
+                    options=get_ventes_par_produit(*filters)['produit'],
                     default=top_produits['produit'].head(3).tolist()
                 )
 
                 if selected_products:
-                    product_evolution = filtered_df[filtered_df['produit'].isin(selected_products)]
-                    product_evolution = product_evolution.groupby(['date_vente', 'produit'])[
-                        'quantite'].sum().unstack().fillna(0)
+                    product_evolution = get_evolution_produits(selected_products, *filters)
 
                     fig = px.line(
-                        product_evolution.reset_index().melt(id_vars='date_vente'),
+                        product_evolution,
                         x='date_vente',
-                        y='value',
+                        y='quantite',
                         color='produit',
                         title='Évolution comparative des produits',
-                        labels={'value': 'Quantité vendue', 'date_vente': 'Date'}
+                        labels={'quantite': 'Quantité vendue', 'date_vente': 'Date'}
                     )
                     st.plotly_chart(fig, use_container_width=True)
             else:
                 st.warning("Aucune donnée à afficher pour la période sélectionnée")
 
-        with tab4:  # Détails
+        with tab4, timed('dashboard.tableau_de_bord.details'):  # Détails
+            # Une page de ventes à la fois (requête par clé, comme la liste des
+            # ventes) : la période par défaut couvre tout l'historique
+            requete = (date_debut, date_fin, tuple(categories))
+            if st.session_state.get("details_requete") != requete:
+                st.session_state.details_requete = requete
+                st.session_state.details_curseurs = [None]
+            curseurs = st.session_state.details_curseurs
+
+            page_ventes, suivant = get_ventes_page(
+                PAGE_SIZE, curseurs[-1], 'date_vente', True,
+                start=date_debut, end=date_fin, categories=categories or None
+            )
             st.dataframe(
-                filtered_df.sort_values('date_vente', ascending=False),
+                page_ventes,
                 column_config={
                     "date_vente": st.column_config.DateColumn("Date"),
                     "produit": "Produit",
@@ -248,160 +283,58 @@ def show_dashboard():
                 use_container_width=True
             )
 
-        with tab5:  # Exportation
-            st.subheader("Exporter les données")
+            col1, col2, col3 = st.columns([1, 3, 1])
+            with col1:
+                if st.button("◀ Précédente", disabled=len(curseurs) == 1, key="details_precedente"):
+                    curseurs.pop()
+                    st.rerun()
+            with col2:
+                pages = max(1, -(-count // PAGE_SIZE))
+                st.write(f"Page {len(curseurs)} / {pages} — {count} vente(s)")
+            with col3:
+                if st.button("Suivante ▶", disabled=suivant is None, key="details_suivante"):
+                    curseurs.append(suivant)
+                    st.rerun()
 
-            # Export Excel
-            excel_buffer = io.BytesIO()
-            with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                filtered_df.to_excel(writer, sheet_name='Ventes', index=False)
-
-                # Ajout d'onglets supplémentaires avec des analyses
-                summary_cat = filtered_df.groupby('categorie').agg({
-                    'montant': ['sum', 'mean', 'count'],
-                    'quantite': 'sum'
-                })
-                summary_cat.to_excel(writer, sheet_name='Par catégorie')
-
-                summary_prod = filtered_df.groupby('produit').agg({
-                    'montant': ['sum', 'mean'],
-                    'quantite': 'sum'
-                })
-                summary_prod.to_excel(writer, sheet_name='Par produit')
-
-            excel_buffer.seek(0)
-
-            st.download_button(
-                label="Télécharger Excel complet",
-                data=excel_buffer,
-                file_name=f"ventes_{date_debut}_{date_fin}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                help="Contient les données brutes et des analyses par catégorie/produit"
-            )
+        with tab5, timed('dashboard.tableau_de_bord.exporter'):  # Exportation
+            st.subheader("Exporter les données")
 
-            # Export PDF
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_font("Arial", size=12)
-
-            # Titre
-            pdf.cell(200, 10, txt=f"Rapport des ventes du {date_debut} au {date_fin}", ln=1, align='C')
-            pdf.ln(10)
-
-            # KPI
-            pdf.set_font("Arial", 'B', size=11)
-            pdf.cell(200, 10, txt="Indicateurs clés:", ln=1)
-            pdf.set_font("Arial", size=10)
-            pdf.cell(200, 10, txt=f"Total des ventes: {total:,.2f}CFA", ln=1)
-            pdf.cell(200, 10, txt=f"Nombre de transactions: {count}", ln=1)
-            pdf.cell(200, 10, txt=f"Panier moyen: {avg:,.2f}CFA", ln=1)
-            pdf.cell(200, 10, txt=f"Produit le plus vendu: {top_product}", ln=1)
-            pdf.ln(10)
-
-            # Tableau des données
-            pdf.set_font("Arial", 'B', size=10)
-            cols = ["Date", "Produit", "Catégorie", "Quantité", "Montant (CFA)"]
-            widths = [30, 50, 40, 25, 25]
-
-            for col, width in zip(cols, widths):
-                pdf.cell(width, 10, col, border=1)
-            pdf.ln()
-
-            pdf.set_font("Arial", size=8)
-            for _, row in filtered_df.iterrows():
-                pdf.cell(widths[0], 10, str(row['date_vente'].date()), border=1)
-                pdf.cell(widths[1], 10, row['produit'], border=1)
-                pdf.cell(widths[2], 10, row['categorie'], border=1)
-                pdf.cell(widths[3], 10, str(row['quantite']), border=1)
-                pdf.cell(widths[4], 10, f"{row['montant']:.2f}", border=1)
-                pdf.ln()
-
-            pdf_buffer = BytesIO()
-            pdf.output(pdf_buffer)  # Écrit directement dans le buffer
-            pdf_bytes = pdf_buffer.getvalue()
-
-            st.download_button(
-                label="Télécharger PDF",
-                data=pdf_bytes,
-                file_name="rapport.pdf",
-                mime="application/pdf"
-            )
+            # Le fichier n'est généré qu'à la demande, puis gardé pour les reruns suivants
+            formats = {
+                "Excel": (create_sales_excel, "xlsx",
+                          "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+                "CSV": (create_sales_csv, "csv", "text/csv"),
+                "PDF": (create_sales_pdf, "pdf", "application/pdf"),
+            }
+            export_format = st.radio("Format", list(formats), horizontal=True)
+            create_export, extension, mime = formats[export_format]
+            export_key = (date_debut, date_fin, tuple(categories), export_format)
+
+            # Génération dans un processus de fond ; le bouton de téléchargement
+            # apparaît quand elle est terminée
+            if st.button("Générer le fichier"):
+                st.session_state.export_job = (export_key, submit_job(create_export, *filters))
+
+            export = st.session_state.get("export_job")
+            if (export is not None and export[0] == export_key
+                    and wait_job(export[1], "Génération de l'export en cours...")):
+                status = job_status(export[1])
+                if status != 'terminé':
+                    st.error(f"Erreur lors de la génération de l'export ({status})")
+                else:
+                    st.download_button(
+                        label=f"Télécharger {export_format}",
+                        data=job_result(export[1]),
+                        file_name=f"ventes_{date_debut}_{date_fin}.{extension}",
+                        mime=mime,
+                        help="Excel : données brutes et analyses par catégorie/produit"
+                    )
 
     except Exception as e:
         st.error(f"Erreur lors du chargement des données: {str(e)}")
 
-def create_sales_pdf(filtered_df, period):
-    """Crée un rapport PDF des analyses de ventes"""
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-
-    # Titre
-    pdf.cell(200, 10, txt=f"Rapport des Ventes ({period})", ln=1, align='C')
-    pdf.ln(10)
-
-    # KPI
-    pdf.set_font("Arial", 'B', size=11)
-    pdf.cell(200, 10, txt="Indicateurs Clés:", ln=1)
-    pdf.set_font("Arial", size=10)
-
-    total = filtered_df['montant'].sum()
-    count = len(filtered_df)
-    avg = filtered_df['montant'].mean() if not filtered_df.empty else 0
-
-    pdf.cell(200, 10, txt=f"Total des ventes: {total:,.2f}CFA", ln=1)
-    pdf.cell(200, 10, txt=f"Nombre de transactions: {count}", ln=1)
-    pdf.cell(200, 10, txt=f"Panier moyen: {avg:,.2f}€", ln=1)
-    pdf.ln(10)
-
-    # Tableau des données
-    pdf.set_font("Arial", 'B', size=9)
-    cols = ["Date", "Produit", "Catégorie", "Quantité", "Montant"]
-    widths = [30, 50, 40, 25, 25]
-
-    for col, width in zip(cols, widths):
-        pdf.cell(width, 10, col, border=1)
-    pdf.ln()
-
-    pdf.set_font("Arial", size=8)
-    for _, row in filtered_df.iterrows():
-        pdf.cell(widths[0], 10, str(row['date_vente'].date()), border=1)
-        pdf.cell(widths[1], 10, row['produit'], border=1)
-        pdf.cell(widths[2], 10, row['categorie'], border=1)
-        pdf.cell(widths[3], 10, str(row['quantite']), border=1)
-        pdf.cell(widths[4], 10, f"{row['montant']:.2f}CFA", border=1)
-        pdf.ln()
-
-    return pdf.output(dest='S').encode('latin1', errors='replace')
-
-
-def create_sales_excel(filtered_df, period):
-    """Crée un fichier Excel des analyses de ventes"""
-    output = io.BytesIO()
-
-    # Création du fichier Excel avec plusieurs onglets
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        # Données brutes
-        filtered_df.to_excel(writer, sheet_name='Ventes détaillées', index=False)
-
-        # Synthèse par catégorie
-        summary_cat = filtered_df.groupby('categorie').agg({
-            'montant': ['sum', 'count'],
-            'quantite': 'sum'
-        })
-        summary_cat.to_excel(writer, sheet_name='Par catégorie')
-
-        # Synthèse par produit
-        summary_prod = filtered_df.groupby('produit').agg({
-            'montant': ['sum', 'mean'],
-            'quantite': 'sum'
-        })
-        summary_prod.to_excel(writer, sheet_name='Par produit')
-
-    output.seek(0)
-    return output
-
 # --- Gestion des ventes ---
+@instrumented('dashboard.ventes')
 def gestion_ventes():
     st.header("Gestion des Ventes")
 
@@ -412,10 +345,42 @@ def gestion_ventes():
         # Onglets pour différentes opérations
         tab1, tab2, tab3 = st.tabs(["Voir les ventes", "Ajouter une vente", "Modifier/Supprimer"])
 
-        with tab1:
-            df_ventes = get_ventes()
+        with tab1, timed('dashboard.ventes.liste'):
+            # Pagination côté serveur : seule la page affichée est lue (requête
+            # par clé, coût constant) et envoyée au navigateur
+            min_date, max_date = get_ventes_bornes()
+            tris = {
+                "Date (récentes d'abord)": ('date_vente', True),
+                "Date (anciennes d'abord)": ('date_vente', False),
+                "Saisie (dernières d'abord)": ('id', True),
+                "Saisie (premières d'abord)": ('id', False),
+            }
+            col1, col2, col3, col4, col5 = st.columns(5)
+            with col1:
+                date_debut = st.date_input("Date début", min_date, key="ventes_debut")
+            with col2:
+                date_fin = st.date_input("Date fin", max_date, key="ventes_fin")
+            with col3:
+                categories = st.multiselect("Catégories", get_categories(), key="ventes_categories")
+            with col4:
+                tri = st.selectbox("Tri", list(tris), key="ventes_tri")
+            with col5:
+                taille = st.selectbox("Lignes par page", [25, 50, 100, 500], index=1, key="ventes_taille")
+
+            filtres = {'start': date_debut, 'end': date_fin, 'categories': categories or None}
+            # Clés de reprise des pages déjà parcourues (None : première page) ;
+            # remises à zéro quand les filtres ou le tri changent
+            requete = (date_debut, date_fin, tuple(categories), tri, taille)
+            if st.session_state.get("ventes_requete") != requete:
+                st.session_state.ventes_requete = requete
+                st.session_state.ventes_curseurs = [None]
+            curseurs = st.session_state.ventes_curseurs
+
+            sort, descending = tris[tri]
+            df_ventes, suivant = get_ventes_page(taille, curseurs[-1], sort, descending, **filtres)
+            total = count_ventes(**filtres)
+
             gb = GridOptionsBuilder.from_dataframe(df_ventes)
-            gb.configure_pagination(paginationAutoPageSize=True)
             gb.configure_side_bar()
             gb.configure_selection('single', use_checkbox=True)
             grid_options = gb.build()
@@ -429,23 +394,31 @@ def gestion_ventes():
                 reload_data=True
             )
 
-        with tab2:
+            col1, col2, col3 = st.columns([1, 3, 1])
+            with col1:
+                if st.button("◀ Précédente", disabled=len(curseurs) == 1, key="ventes_precedente"):
+                    curseurs.pop()
+                    st.rerun()
+            with col2:
+                pages = max(1, -(-total // taille))
+                st.write(f"Page {len(curseurs)} / {pages} — {total} vente(s)")
+            with col3:
+                if st.button("Suivante ▶", disabled=suivant is None, key="ventes_suivante"):
+                    curseurs.append(suivant)
+                    st.rerun()
+
+        with tab2, timed('dashboard.ventes.ajout'):
             form_ajout = st.form(key='form_ajout_vente')
             with form_ajout:
                 col1, col2 = st.columns(2)
                 with col1:
                     date = st.date_input("Date de vente", value=datetime.now())
-                    df_produits = get_produits()
-                    # Conversion des IDs en int natif
-                    produit_id_map = {row['nom']: int(row['id']) for _, row in df_produits.iterrows()}
-                    produit = st.selectbox("Produit", list(produit_id_map.keys()))
-                    produit_id = produit_id_map[produit]
+                    # Options : ids (dans l'ordre des noms), libellés lus dans les dimensions
+                    produits_dim = dimensions.produits()
+                    produit_id = st.selectbox("Produit", produits_dim.ids.tolist(), format_func=produits_dim.nom)
                 with col2:
-                    df_clients = get_clients()
-                    # Conversion des IDs en int natif
-                    client_id_map = {row['nom']: int(row['id']) for _, row in df_clients.iterrows()}
-                    client = st.selectbox("Client", list(client_id_map.keys()))
-                    client_id = client_id_map[client]
+                    clients_dim = dimensions.clients()
+                    client_id = st.selectbox("Client", clients_dim.ids.tolist(), format_func=clients_dim.nom)
                     quantite = st.number_input("Quantité", min_value=1, step=1, value=1)
                     montant = st.number_input("Montant", min_value=0.0, value=0.0)
 
@@ -459,61 +432,51 @@ def gestion_ventes():
                     except Exception as e:
                         st.error(f"Erreur lors de l'ajout: {str(e)}")
 
-        with tab3:
+        with tab3, timed('dashboard.ventes.modification'):
             st.subheader("Modifier ou supprimer une vente")
-            df_ventes = get_ventes()
-            if len(df_ventes) == 0:
+            # Recherche bornée (LIMIT) au lieu de lister toutes les ventes : le
+            # choix se fait sur l'id, la vente est ensuite relue par son id
+            recherche = st.text_input(
+                "Rechercher une vente (n°, date AAAA-MM-JJ, produit ou client)", key="vente_recherche"
+            )
+            resultats = search_ventes(recherche)
+            if len(resultats) == 0:
                 st.warning("Aucune vente à afficher")
             else:
-                # Conversion des IDs en int natif
-                df_ventes['id'] = df_ventes['id'].astype(int)
-                selected = st.selectbox(
+                libelles = dict(zip(
+                    resultats['id'].astype(int),
+                    "n°" + resultats['id'].astype(str) + " - " + resultats['date_vente'].astype(str)
+                    + " - " + resultats['produit'].astype(str) + " - " + resultats['client'].astype(str)
+                    + " - " + resultats['montant'].astype(str) + "CFA"
+                ))
+                selected_id = st.selectbox(
                     "Sélectionner une vente à modifier",
-                    df_ventes.apply(
-                        lambda x: f"{x['date_vente']} - {x['produit']} - {x['client']} - {x['montant']}CFA",
-                        axis=1
-                    )
+                    list(libelles),
+                    format_func=libelles.get
                 )
 
-                selected_id = int(df_ventes.iloc[
-                                      df_ventes.apply(
-                                          lambda
-                                              x: f"{x['date_vente']} - {x['produit']} - {x['client']} - {x['montant']}CFA",
-                                          axis=1
-                                      ).tolist().index(selected)
-                                  ]['id'])
-
                 form_modif = st.form(key='form_modif_vente')
                 with form_modif:
-                    vente_data = df_ventes[df_ventes['id'] == selected_id].iloc[0]
+                    vente_data = get_vente_by_id(selected_id)
+                    date_vente = pd.Timestamp(vente_data['date_vente'])
                     col1, col2 = st.columns(2)
                     with col1:
-                        new_date = st.date_input(
-                            "Date",
-                            value=datetime.strptime(str(vente_data['date_vente']), '%Y-%m-%d')
-                        )
-                        df_produits = get_produits()
-                        # Conversion des IDs en int natif
-                        produit_id_map = {row['nom']: int(row['id']) for _, row in df_produits.iterrows()}
-                        current_produit = df_produits[df_produits['id'] == int(vente_data['produit_id'])]['nom'].values[
-                            0]
-                        new_produit = st.selectbox(
+                        new_date = st.date_input("Date", value=date_vente.date())
+                        produits_dim = dimensions.produits()
+                        new_produit_id = st.selectbox(
                             "Produit",
-                            list(produit_id_map.keys()),
-                            index=list(produit_id_map.keys()).index(current_produit)
+                            produits_dim.ids.tolist(),
+                            index=produits_dim.position(vente_data['produit_id']),
+                            format_func=produits_dim.nom
                         )
-                        new_produit_id = produit_id_map[new_produit]
                     with col2:
-                        df_clients = get_clients()
-                        # Conversion des IDs en int natif
-                        client_id_map = {row['nom']: int(row['id']) for _, row in df_clients.iterrows()}
-                        current_client = df_clients[df_clients['id'] == int(vente_data['client_id'])]['nom'].values[0]
-                        new_client = st.selectbox(
+                        clients_dim = dimensions.clients()
+                        new_client_id = st.selectbox(
                             "Client",
-                            list(client_id_map.keys()),
-                            index=list(client_id_map.keys()).index(current_client)
+                            clients_dim.ids.tolist(),
+                            index=clients_dim.position(vente_data['client_id']),
+                            format_func=clients_dim.nom
                         )
-                        new_client_id = client_id_map[new_client]
                         new_quantite = st.number_input(
                             "Quantité",
                             min_value=1,
@@ -530,8 +493,9 @@ def gestion_ventes():
                     with col1:
                         if form_modif.form_submit_button("Modifier"):
                             try:
-                                update_vente(selected_id, new_date, new_produit_id, new_client_id, new_quantite,
-                                             new_montant)
+                                # La vente garde son heure : seul le jour est modifiable
+                                update_vente(selected_id, datetime.combine(new_date, date_vente.time()),
+                                             new_produit_id, new_client_id, new_quantite, new_montant)
                                 st.success("✅ Vente modifiée avec succès !")
                                 st.rerun()
                             except Exception as e:
@@ -549,6 +513,7 @@ def gestion_ventes():
         st.error(f"Erreur dans la gestion des ventes: {str(e)}")
 
 # --- Gestion des produits ---
+@instrumented('dashboard.produits')
 def gestion_produits():
     st.header("Gestion des Produits")
 
@@ -558,11 +523,15 @@ def gestion_produits():
     try:
         tab1, tab2, tab3 = st.tabs(["Voir les produits", "Ajouter un produit", "Modifier/Supprimer"])
 
-        with tab1:
-            df_produits = get_produits()
+        with tab1, timed('dashboard.produits.liste'):
+            # Recherche bornée (LIMIT) au lieu de charger tous les produits
+            recherche = st.text_input("Rechercher un produit (nom, catégorie)", key="produit_liste_recherche")
+            df_produits = search_produits(recherche, limit=LIST_LIMIT)
             st.dataframe(df_produits, height=400)
+            if len(df_produits) == LIST_LIMIT:
+                st.caption(f"{LIST_LIMIT} premiers résultats : préciser la recherche pour affiner.")
 
-        with tab2:
+        with tab2, timed('dashboard.produits.ajout'):
             with st.form("form_ajout_produit"):
                 nom = st.text_input("Nom du produit")
                 categorie = st.text_input("Catégorie")
@@ -577,15 +546,23 @@ def gestion_produits():
                     except Exception as e:
                         st.error(f"Erreur lors de l'ajout: {str(e)}")
 
-        with tab3:
+        with tab3, timed('dashboard.produits.modification'):
             st.subheader("Modifier ou supprimer un produit")
-            df_produits = get_produits()
+            recherche = st.text_input("Rechercher un produit (nom, catégorie)", key="produit_recherche")
+            df_produits = search_produits(recherche)
             if len(df_produits) == 0:
                 st.warning("Aucun produit à afficher")
             else:
-                selected = st.selectbox("Sélectionner un produit à modifier", df_produits['nom'])
-
-                selected_id = df_produits[df_produits['nom'] == selected]['id'].values[0]
+                # Choix sur l'id : deux produits peuvent porter le même nom
+                libelles = dict(zip(
+                    df_produits['id'].astype(int),
+                    df_produits['nom'].astype(str) + " (" + df_produits['categorie'].astype(str) + ")"
+                ))
+                selected_id = st.selectbox(
+                    "Sélectionner un produit à modifier",
+                    list(libelles),
+                    format_func=libelles.get
+                )
                 produit_data = df_produits[df_produits['id'] == selected_id].iloc[0]
 
                 with st.form("form_modif_produit"):
@@ -620,17 +597,22 @@ def gestion_produits():
 
 
 # --- Gestion des clients ---
+@instrumented('dashboard.clients')
 def gestion_clients():
     st.header("Gestion des Clients")
 
     try:
         tab1, tab2, tab3 = st.tabs(["Voir les clients", "Ajouter un client", "Modifier/Supprimer"])
 
-        with tab1:
-            df_clients = get_clients()
+        with tab1, timed('dashboard.clients.liste'):
+            # Recherche bornée (LIMIT) au lieu de charger tous les clients
+            recherche = st.text_input("Rechercher un client (nom, email, ville)", key="client_liste_recherche")
+            df_clients = search_clients(recherche, limit=LIST_LIMIT)
             st.dataframe(df_clients, height=400)
+            if len(df_clients) == LIST_LIMIT:
+                st.caption(f"{LIST_LIMIT} premiers résultats : préciser la recherche pour affiner.")
 
-        with tab2:
+        with tab2, timed('dashboard.clients.ajout'):
             with st.form("form_ajout_client"):
                 nom = st.text_input("Nom complet")
                 email = st.text_input("Email")
@@ -645,15 +627,24 @@ def gestion_clients():
                     except Exception as e:
                         st.error(f"Erreur lors de l'ajout: {str(e)}")
 
-        with tab3:
+        with tab3, timed('dashboard.clients.modification'):
             st.subheader("Modifier ou supprimer un client")
-            df_clients = get_clients()
+            recherche = st.text_input("Rechercher un client (nom, email, ville)", key="client_recherche")
+            df_clients = search_clients(recherche)
             if len(df_clients) == 0:
                 st.warning("Aucun client à afficher")
             else:
-                selected = st.selectbox("Sélectionner un client à modifier", df_clients['nom'])
-
-                selected_id = df_clients[df_clients['nom'] == selected]['id'].values[0]
+                # Choix sur l'id : deux clients peuvent porter le même nom
+                libelles = dict(zip(
+                    df_clients['id'].astype(int),
+                    df_clients['nom'].astype(str) + " - " + df_clients['email'].astype(str)
+                    + " - " + df_clients['ville'].astype(str)
+                ))
+                selected_id = st.selectbox(
+                    "Sélectionner un client à modifier",
+                    list(libelles),
+                    format_func=libelles.get
+                )
                 client_data = df_clients[df_clients['id'] == selected_id].iloc[0]
 
                 with st.form("form_modif_client"):
@@ -683,16 +674,41 @@ def gestion_clients():
         st.error(f"Erreur dans la gestion des clients: {str(e)}")
 
 # --- Prévisions ---
+@instrumented('dashboard.previsions')
 def show_forecasts():
     st.header("Prévisions des ventes")
-    df_ventes = get_ventes()
-
-    if len(df_ventes) < 30:
+    if data_fingerprint()['count'] < 30:
         st.warning("Pas assez de données historiques pour faire des prévisions (minimum 30 jours)")
         return
 
-    with st.spinner("Calcul des prévisions..."):
-        forecast, mae = forecast_sales(df_ventes)
+    moteurs = {
+        "Forêt aléatoire (modèle enregistré)": 'random_forest',
+        "Holt-Winters": 'holt_winters',
+        "Naïf saisonnier": 'naif_saisonnier',
+    }
+    moteur = moteurs[st.selectbox("Moteur de prévision", list(moteurs))]
+
+    # Moteurs NumPy : calcul immédiat. Forêt aléatoire : modèle à jour lu dans
+    # le registre, sinon entraînement dans un processus de fond, affiché quand
+    # il est terminé.
+    if moteur != 'random_forest':
+        forecast, mae = get_engine_forecast(moteur)
+    elif is_model_current():
+        st.session_state.pop("forecast_job", None)
+        forecast, mae = get_forecast()
+    else:
+        job_id = st.session_state.get("forecast_job")
+        if job_id is None or job_status(job_id) == 'inconnu':
+            job_id = st.session_state.forecast_job = submit_job(get_forecast)
+
+        if not wait_job(job_id, "Entraînement du modèle en cours, les prévisions s'afficheront à la fin..."):
+            return
+
+        del st.session_state["forecast_job"]
+        try:
+            forecast, mae = job_result(job_id)
+        except Exception as e:
+            forecast, mae = None, str(e)
 
     if forecast is not None:
         st.success(f"Prévisions calculées (MAE: {mae:.2f})")
@@ -710,6 +726,64 @@ def show_forecasts():
         st.error("Erreur lors du calcul des prévisions")
 
 
+# --- Performance ---
+def show_performance():
+    st.header("Performance")
+
+    actif = st.toggle("Mesurer les appels (base de données, prévisions, onglets)",
+                      value=instrumentation.is_enabled())
+    if actif:
+        instrumentation.enable()
+    else:
+        instrumentation.disable()
+
+    stats = cache_stats()
+    st.subheader("Cache des requêtes")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Taux de succès", f"{stats['hit_rate']:.0%}")
+    col2.metric("Succès / échecs", f"{stats['hits']} / {stats['misses']}")
+    col3.metric("Entrées", f"{stats['size']} / {stats['maxsize']}")
+    col4.metric("Évictions", stats['evictions'])
+
+    st.subheader("Temps d'appel")
+    mesures = instrumentation.snapshot()
+    if not mesures:
+        st.info("Aucune mesure : activer la mesure puis parcourir le tableau de bord.")
+    else:
+        df = pd.DataFrame(mesures)
+        for col in ('total', 'moyenne', 'p50', 'p95', 'max'):
+            df[col] = df[col] * 1000
+        df['derniere_requete'] = df.pop('requetes').str[-1]
+        st.dataframe(
+            df.rename(columns={'total': 'total (ms)', 'moyenne': 'moyenne (ms)', 'p50': 'p50 (ms)',
+                               'p95': 'p95 (ms)', 'max': 'max (ms)'}),
+            use_container_width=True, hide_index=True
+        )
+
+        nom = st.selectbox("Détail", df['nom'])
+        histogramme = pd.DataFrame(instrumentation.histogram(nom), columns=['borne', 'appels'])
+        histogramme['borne'] = [f"≤ {b * 1000:g} ms" if b != float('inf') else f"> {instrumentation.BUCKETS[-1]:g} s"
+                                for b in histogramme['borne']]
+        fig = px.bar(histogramme, x='borne', y='appels', title=f"Distribution des durées : {nom}")
+        st.plotly_chart(fig, use_container_width=True)
+        for sql in next(m['requetes'] for m in mesures if m['nom'] == nom):
+            st.code(sql, language='sql')
+
+    gauges = {f"cache_{cle}": valeur for cle, valeur in stats.items()}
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="Exporter (format Prometheus)",
+            data=instrumentation.prometheus_text(gauges),
+            file_name=f"performance_{datetime.now().strftime('%Y%m%d_%H%M')}.prom",
+            mime="text/plain"
+        )
+    with col2:
+        if st.button("Réinitialiser les mesures"):
+            instrumentation.reset()
+            st.rerun()
+
+
 def main():
     set_theme()
 
@@ -723,7 +797,8 @@ def main():
     st.title("Dashboard Analyse des Ventes")
 
     # Menu principal
-    menu = ["Tableau de bord", "Gestion des Ventes", "Gestion des Produits", "Gestion des Clients", "Prévisions"]
+    menu = ["Tableau de bord", "Gestion des Ventes", "Gestion des Produits", "Gestion des Clients", "Prévisions",
+            "Performance"]
     choice = st.sidebar.selectbox("Navigation", menu)
 
     if choice == "Tableau de bord":
@@ -736,6 +811,8 @@ def main():
         gestion_clients()
     elif choice == "Prévisions":
         show_forecasts()
+    elif choice == "Performance":
+        show_performance()
 
 
 if __name__ == "__main__":
@@ -1,78 +1,464 @@
 import sqlite3
 from sqlite3 import Error
 import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import instrumentation
 
 DB_PATH = 'ventes.db'
 
+# Nombre maximal de connexions inactives conservées par base
+POOL_SIZE = 16
+# Requêtes préparées gardées en cache par connexion (réutilisées d'un appel à l'autre)
+STATEMENT_CACHE_SIZE = 256
+
+# Profil "performance" (opt-in via VENTES_DB_PROFILE=performance ou
+# enable_performance_profile()) : WAL pour que les lectures ne bloquent plus
+# les écritures, et réglages de cache adaptés à une base de plusieurs Go.
+PERFORMANCE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # en Kio
+    "temp_store": "MEMORY",
+    "busy_timeout": 10000,  # en ms
+}
+DB_PROFILE = os.environ.get("VENTES_DB_PROFILE", "default")
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Sérialise les écritures du processus : les threads attendent leur tour ici
+# plutôt que d'échouer sur "database is locked"
+_write_lock = threading.Lock()
+
+
+def _open_connection(**kwargs):
+    """Ouvre une connexion SQLite et applique les PRAGMA de session"""
+    if os.path.dirname(DB_PATH):
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+
+    conn = sqlite3.connect(DB_PATH, **kwargs)
+    conn.execute("PRAGMA foreign_keys = ON")
+    if DB_PROFILE == "performance":
+        for pragma, value in PERFORMANCE_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+
+def enable_performance_profile():
+    """Active le profil performance pour toutes les nouvelles connexions"""
+    global DB_PROFILE
+    DB_PROFILE = "performance"
+    # Les connexions déjà ouvertes ont été configurées avec l'ancien profil
+    close_connections()
+
 
 def connect_db():
     """Établit une connexion à la base SQLite"""
     try:
-        if os.path.dirname(DB_PATH):
-            os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("PRAGMA foreign_keys = ON")
-        return conn
+        return _open_connection()
     except Error as e:
         print(f"Erreur de connexion SQLite: {e}")
         raise
 
 
+def _get_pool(path):
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = queue.LifoQueue(maxsize=POOL_SIZE)
+        return pool
+
+
+@contextmanager
+def get_connection():
+    """Emprunte une connexion du pool (thread-safe) et la restitue à la sortie.
+
+    Les connexions sont partagées entre threads mais jamais utilisées par deux
+    threads à la fois ; les PRAGMA ne sont appliqués qu'à leur création.
+    """
+    path = DB_PATH
+    pool = _get_pool(path)
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        try:
+            with instrumentation.timed('db_config.open_connection'):
+                conn = _open_connection(check_same_thread=False,
+                                        cached_statements=STATEMENT_CACHE_SIZE)
+        except Error as e:
+            print(f"Erreur de connexion SQLite: {e}")
+            raise
+
+    # Requêtes rattachées aux mesures en cours (instrumentation activée seulement)
+    tracer = instrumentation.query_tracer()
+    if tracer is not None:
+        conn.set_trace_callback(tracer)
+    try:
+        yield conn
+    finally:
+        if tracer is not None:
+            conn.set_trace_callback(None)
+        # Une transaction laissée ouverte ne doit pas fuiter vers le prochain emprunteur
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+@contextmanager
+def write_transaction():
+    """Transaction d'écriture sérialisée : commit en sortie, rollback sur exception.
+
+    Un seul thread du processus écrit à la fois ; BEGIN IMMEDIATE prend le
+    verrou d'écriture SQLite dès le début, ce qui évite les échecs en cours de
+    transaction face aux autres processus (qui attendent alors busy_timeout).
+    """
+    with _write_lock:
+        with get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+
+def close_connections():
+    """Ferme toutes les connexions inactives du pool (et les connexions de surveillance)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        watchers = list(_watchers.values())
+        _watchers.clear()
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+    for watcher in watchers:
+        with watcher['lock']:
+            watcher['conn'].close()
+
+
+# ==================== VERSIONS DES TABLES ====================
+# Signature de chaque table, visible de tous les processus : (dernier id
+# attribué, lu dans sqlite_sequence, compteur de versions_tables incrémenté par
+# les déclencheurs UPDATE/DELETE de la migration 7). Les insertions ne coûtent
+# donc rien de plus ; une insertion avec un id explicite inférieur au dernier
+# attribué n'est pas vue (invalidate_cache de crud_operations dans ce cas).
+# Une connexion dédiée par base ne relit ces signatures que si PRAGMA
+# data_version a changé, c'est-à-dire après un commit d'une autre connexion
+# (du pool ou d'un autre processus).
+
+_watchers = {}
+
+
+def _get_watcher(path):
+    with _pools_lock:
+        watcher = _watchers.get(path)
+        if watcher is None:
+            conn = _open_connection(check_same_thread=False)
+            watcher = _watchers[path] = {'conn': conn, 'lock': threading.Lock(),
+                                         'data_version': None, 'versions': {}}
+        return watcher
+
+
+def _read_rows(conn, sql):
+    try:
+        return conn.execute(sql).fetchall()
+    except Error:
+        # Base vide ou antérieure à la migration 7
+        return []
+
+
+def _read_versions(conn):
+    versions = {name: (seq, 0) for name, seq in _read_rows(conn, "SELECT name, seq FROM sqlite_sequence")}
+    for name, version in _read_rows(conn, "SELECT nom, version FROM versions_tables"):
+        versions[name] = (versions.get(name, (0, 0))[0], version)
+    return versions
+
+
+def table_versions(*tables):
+    """Signatures des tables données ; changent à chaque écriture, quel qu'en soit le processus"""
+    watcher = _get_watcher(DB_PATH)
+    with watcher['lock']:
+        conn = watcher['conn']
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != watcher['data_version']:
+            watcher['versions'] = _read_versions(conn)
+            watcher['data_version'] = data_version
+        versions = watcher['versions']
+    return tuple(versions.get(table, (0, 0)) for table in tables)
+
+
+# ==================== MIGRATIONS ====================
+# Chaque migration reçoit un curseur et s'exécute dans sa propre transaction.
+# Le numéro de la dernière migration appliquée est stocké dans PRAGMA user_version :
+# on n'ajoute des étapes qu'à la fin de la liste, sans jamais modifier les anciennes.
+
+def _migration_001_tables(cursor):
+    """Crée les tables clients, produits et ventes"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS clients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nom TEXT NOT NULL,
+        email TEXT,
+        ville TEXT
+    )""")
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS produits (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nom TEXT NOT NULL,
+        categorie TEXT,
+        prix_unitaire REAL
+    )""")
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ventes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date_vente TEXT NOT NULL,
+        produit_id INTEGER,
+        client_id INTEGER,
+        quantite INTEGER,
+        montant REAL,
+        FOREIGN KEY (produit_id) REFERENCES produits(id),
+        FOREIGN KEY (client_id) REFERENCES clients(id)
+    )""")
+
+
+def _migration_002_index(cursor):
+    """Index des tris et jointures du tableau de bord"""
+    # Couvrant pour la liste des ventes triée par date : aucune lecture de la table
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_ventes_date
+    ON ventes (date_vente, produit_id, client_id, quantite, montant)
+    """)
+    # Clés étrangères : filtres par produit/client et contrôles ON DELETE
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ventes_produit ON ventes (produit_id, date_vente)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ventes_client ON ventes (client_id, date_vente)")
+    # Listes triées par nom
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_produits_nom ON produits (nom)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_clients_nom ON clients (nom)")
+    cursor.execute("ANALYZE")
+
+
+def _migration_003_index_categories(cursor):
+    """Index des catégories de produits pour les filtres"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_produits_categorie ON produits (categorie)")
+
+
+def _migration_004_syntheses(cursor):
+    """Tables de synthèse journalière et mensuelle des ventes"""
+    # Schéma et remplissage figés ici : une migration ne dépend pas de la
+    # version courante de rollups
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ventes_jour (
+        jour TEXT NOT NULL,
+        produit_id INTEGER NOT NULL,
+        categorie TEXT NOT NULL,
+        montant REAL NOT NULL DEFAULT 0,
+        quantite INTEGER NOT NULL DEFAULT 0,
+        nombre INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (jour, produit_id, categorie)
+    ) WITHOUT ROWID""")
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ventes_mois (
+        mois TEXT NOT NULL,
+        categorie TEXT NOT NULL,
+        montant REAL NOT NULL DEFAULT 0,
+        quantite INTEGER NOT NULL DEFAULT 0,
+        nombre INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (mois, categorie)
+    ) WITHOUT ROWID""")
+
+    # Synthèse des ventes existantes (produit absent -> 0, catégorie absente -> '')
+    cursor.execute("DELETE FROM ventes_jour")
+    cursor.execute("DELETE FROM ventes_mois")
+    cursor.execute("""
+    INSERT INTO ventes_jour (jour, produit_id, categorie, montant, quantite, nombre)
+    SELECT
+        substr(v.date_vente, 1, 10),
+        IFNULL(v.produit_id, 0),
+        IFNULL(p.categorie, ''),
+        TOTAL(v.montant),
+        IFNULL(SUM(v.quantite), 0),
+        COUNT(*)
+    FROM ventes v
+    LEFT JOIN produits p ON v.produit_id = p.id
+    GROUP BY 1, 2, 3""")
+    cursor.execute("""
+    INSERT INTO ventes_mois (mois, categorie, montant, quantite, nombre)
+    SELECT
+        substr(v.date_vente, 1, 7),
+        IFNULL(p.categorie, ''),
+        TOTAL(v.montant),
+        IFNULL(SUM(v.quantite), 0),
+        COUNT(*)
+    FROM ventes v
+    LEFT JOIN produits p ON v.produit_id = p.id
+    GROUP BY 1, 2""")
+
+
+def _migration_005_index_date_id(cursor):
+    """Index des dates couvrant aussi l'id (parcours par clé date, id sans tri)"""
+    # L'id suit la date : ORDER BY date_vente, id (pagination par clé) est
+    # servi dans l'ordre de l'index, sans trier les ventes d'une même date
+    cursor.execute("DROP INDEX IF EXISTS idx_ventes_date")
+    cursor.execute("""
+    CREATE INDEX idx_ventes_date
+    ON ventes (date_vente, id, produit_id, client_id, quantite, montant)
+    """)
+    cursor.execute("ANALYZE idx_ventes_date")
+
+
+def _migration_006_recherche_texte(cursor):
+    """Index plein texte (FTS5) des produits et des clients"""
+    # Tables FTS5 à contenu externe : seul l'index est stocké, les textes sont
+    # relus dans produits/clients ; les déclencheurs le tiennent à jour
+    tables = {'produits': ('nom', 'categorie'), 'clients': ('nom', 'email', 'ville')}
+    try:
+        for table, columns in tables.items():
+            cursor.execute(f"""
+            CREATE VIRTUAL TABLE {table}_fts USING fts5(
+                {', '.join(columns)},
+                content='{table}', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )""")
+    except Error as e:
+        if "fts5" not in str(e):
+            raise
+        # SQLite compilé sans FTS5 : les recherches passent par LIKE, jusqu'au
+        # rattrapage par init_db quand FTS5 sera disponible
+        print(f"FTS5 indisponible, recherche plein texte désactivée ({e}).")
+        return
+
+    for table, columns in tables.items():
+        fts = f"{table}_fts"
+        cols = ', '.join(columns)
+        new = ', '.join(f"new.{col}" for col in columns)
+        old = ', '.join(f"old.{col}" for col in columns)
+        # Une instruction par déclencheur : executescript validerait la transaction de la migration
+        cursor.execute(f"""
+        CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new});
+        END""")
+        cursor.execute(f"""
+        CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});
+        END""")
+        cursor.execute(f"""
+        CREATE TRIGGER {fts}_update AFTER UPDATE ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});
+            INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new});
+        END""")
+        cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+        # Classement bm25 : un mot du nom pèse dix fois plus qu'un autre champ
+        weights = ', '.join(['10.0'] + ['1.0'] * (len(columns) - 1))
+        cursor.execute(f"INSERT INTO {fts} ({fts}, rank) VALUES ('rank', 'bm25({weights})')")
+
+
+def _migration_007_versions_tables(cursor):
+    """Compteurs de modifications des tables (invalidation des caches entre processus)"""
+    # Les insertions sont déjà visibles dans sqlite_sequence (AUTOINCREMENT) :
+    # seules les modifications et suppressions incrémentent le compteur
+    cursor.execute("""
+    CREATE TABLE versions_tables (
+        nom TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID""")
+    for table in ('ventes', 'produits', 'clients'):
+        cursor.execute("INSERT INTO versions_tables (nom) VALUES (?)", (table,))
+        for event in ('UPDATE', 'DELETE'):
+            cursor.execute(f"""
+            CREATE TRIGGER {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+                UPDATE versions_tables SET version = version + 1 WHERE nom = '{table}';
+            END""")
+
+
+MIGRATIONS = [
+    _migration_001_tables,
+    _migration_002_index,
+    _migration_003_index_categories,
+    _migration_004_syntheses,
+    _migration_005_index_date_id,
+    _migration_006_recherche_texte,
+    _migration_007_versions_tables,
+]
+
+
+# Bases dont l'index plein texte a été vérifié par ce processus
+_recherche_verifiee = set()
+
+# Migration 6 appliquée sans FTS5 et FTS5 désormais disponible
+_RECHERCHE_MANQUANTE = """
+SELECT sqlite_compileoption_used('ENABLE_FTS5')
+   AND NOT EXISTS (SELECT 1 FROM sqlite_master WHERE name = 'produits_fts')
+"""
+
+
+def _rattrape_recherche_texte(conn):
+    """Crée l'index plein texte si la migration 6 s'est faite sans FTS5 et qu'il est disponible.
+
+    Sans ce rattrapage, la recherche resterait sur LIKE même après une mise
+    à jour de SQLite. Vérifié une fois par processus et par base.
+    """
+    if conn.execute(_RECHERCHE_MANQUANTE).fetchone()[0]:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute(_RECHERCHE_MANQUANTE).fetchone()[0]:
+                _migration_006_recherche_texte(conn.cursor())
+                print(f"Migration 6 complétée ({_migration_006_recherche_texte.__doc__}).")
+            conn.commit()
+        except Error:
+            conn.rollback()
+            raise
+    _recherche_verifiee.add(DB_PATH)
+
+
+def get_schema_version(conn):
+    """Retourne le numéro de la dernière migration appliquée"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
 def init_db():
-    """Initialise la structure de la base avec mise à jour de la table ventes"""
+    """Applique les migrations manquantes (ne fait rien si le schéma est à jour)"""
     conn = connect_db()
     try:
-        cursor = conn.cursor()
-
-        # Table clients
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS clients (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nom TEXT NOT NULL,
-            email TEXT,
-            ville TEXT
-        )""")
-
-        # Table produits
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS produits (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nom TEXT NOT NULL,
-            categorie TEXT,
-            prix_unitaire REAL
-        )""")
-
-        # Vérifie si la table ventes existe déjà
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='ventes'")
-        if cursor.fetchone():
-            # Renomme l’ancienne table
-            cursor.execute("ALTER TABLE ventes RENAME TO ventes_old")
-
-        # Crée la nouvelle table ventes
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS ventes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date_vente TEXT NOT NULL,
-            produit_id INTEGER,
-            client_id INTEGER,
-            quantite INTEGER,
-            montant REAL,
-            FOREIGN KEY (produit_id) REFERENCES produits(id),
-            FOREIGN KEY (client_id) REFERENCES clients(id)
-        )""")
-
-        # Si l’ancienne table existe, on récupère les données
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='ventes_old'")
-        if cursor.fetchone():
-            cursor.execute("""
-            INSERT INTO ventes (id, date_vente, produit_id, client_id, quantite, montant)
-            SELECT id, date_vente, produit_id, client_id, quantite, montant FROM ventes_old
-            """)
-            cursor.execute("DROP TABLE ventes_old")
-            print("Migration des données réussie.")
-
-        conn.commit()
+        # Chemin rapide : une seule lecture de l'en-tête du fichier (plus,
+        # une fois par processus, la vérification de l'index plein texte)
+        version = get_schema_version(conn)
+        if version >= len(MIGRATIONS):
+            if DB_PATH not in _recherche_verifiee:
+                _rattrape_recherche_texte(conn)
+            return
+
+        for numero in range(version + 1, len(MIGRATIONS) + 1):
+            migration = MIGRATIONS[numero - 1]
+            # Verrou en écriture puis relecture de la version, pour qu'un seul
+            # processus applique chaque migration
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if get_schema_version(conn) >= numero:
+                    conn.rollback()
+                    continue
+                migration(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {numero}")
+                conn.commit()
+            except Error:
+                conn.rollback()
+                raise
+            print(f"Migration {numero} appliquée ({migration.__doc__}).")
+
+        _rattrape_recherche_texte(conn)
         print("Base de données initialisée avec succès.")
     except Error as e:
         print(f"Erreur d'initialisation: {e}")
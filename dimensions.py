@@ -0,0 +1,128 @@
+"""Dimensions produits et clients en mémoire, pour les recherches par id.
+
+Chaque table est chargée d'un bloc (une lecture de crud_operations) en
+tableaux NumPy, un par colonne, avec un dictionnaire id -> position : une
+recherche coûte O(1), sans connexion ni DataFrame.
+
+Le chargement n'est refait que si la table a changé, d'après les compteurs
+de génération du cache de crud_operations (écritures du processus,
+invalidate_cache) et les versions de db_config.table_versions (écritures de
+tout processus).
+"""
+import threading
+
+import numpy as np
+
+import db_config
+import crud_operations
+from instrumentation import instrumented
+
+
+class Dimension:
+    """Attributs d'une table indexés par id, dans l'ordre des noms (lecture seule)"""
+
+    def __init__(self, df):
+        self.ids = df['id'].to_numpy(dtype=np.int64)
+        self.columns = {col: _to_numpy(df[col]) for col in df.columns if col != 'id'}
+        for values in (self.ids, *self.columns.values()):
+            values.flags.writeable = False
+        self._positions = dict(zip(self.ids.tolist(), range(len(self.ids))))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, id_):
+        try:
+            return int(id_) in self._positions
+        except (TypeError, ValueError):
+            return False
+
+    def position(self, id_):
+        """Rang de id_ dans l'ordre des noms (KeyError si absent)"""
+        return self._positions[int(id_)]
+
+    def get(self, id_, column):
+        """Valeur de column pour id_, ou None si l'id est absent"""
+        position = self._positions.get(int(id_))
+        return None if position is None else self.columns[column][position]
+
+    def nom(self, id_):
+        return self.get(id_, 'nom')
+
+    def row(self, id_):
+        """{colonne: valeur} de id_ (id compris), ou None si absent"""
+        position = self._positions.get(int(id_))
+        if position is None:
+            return None
+        row = {'id': int(self.ids[position])}
+        row.update((col, values[position]) for col, values in self.columns.items())
+        return row
+
+
+def _to_numpy(series):
+    """Colonne pandas -> tableau NumPy : réels en float64 (NaN), le reste en objets (None)"""
+    if series.dtype.kind == 'f' or str(series.dtype) == 'Float64':
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return series.astype(object).where(series.notna(), None).to_numpy()
+
+
+# table -> ((base, génération, version), Dimension)
+_dimensions = {}
+_lock = threading.Lock()
+
+
+@instrumented('dimensions.load')
+def _load(table):
+    if table == 'produits':
+        return Dimension(crud_operations.get_produits())
+    return Dimension(crud_operations.get_clients())
+
+
+def _get(table):
+    # Génération lue avant le chargement : une écriture concurrente provoque
+    # un nouveau chargement à l'accès suivant
+    key = (db_config.DB_PATH, crud_operations.table_generations(table), db_config.table_versions(table))
+    entry = _dimensions.get(table)
+    if entry is None or entry[0] != key:
+        with _lock:
+            entry = _dimensions.get(table)
+            if entry is None or entry[0] != key:
+                entry = _dimensions[table] = (key, _load(table))
+    return entry[1]
+
+
+def produits():
+    """Dimension produits (nom, categorie, prix_unitaire)"""
+    return _get('produits')
+
+
+def clients():
+    """Dimension clients (nom, email, ville)"""
+    return _get('clients')
+
+
+def _exists(table, id_):
+    if id_ in _get(table):
+        return True
+    # Absent de la dimension : peut-être ajouté par un autre processus
+    with db_config.get_connection() as conn:
+        found = conn.execute(f"SELECT 1 FROM {table} WHERE id = ?", (int(id_),)).fetchone() is not None
+    if found:
+        crud_operations.invalidate_cache(table)
+    return found
+
+
+def produit_exists(produit_id):
+    """Vrai si le produit existe (dimension, puis base en cas d'absence)"""
+    return _exists('produits', produit_id)
+
+
+def client_exists(client_id):
+    """Vrai si le client existe (dimension, puis base en cas d'absence)"""
+    return _exists('clients', client_id)
+
+
+def clear():
+    """Oublie les dimensions chargées (rechargées au prochain accès)"""
+    with _lock:
+        _dimensions.clear()
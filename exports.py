@@ -0,0 +1,196 @@
+"""Exports des ventes filtrées (Excel, CSV, Parquet, PDF).
+
+Les lignes sont lues dans SQLite par lots et écrites au fil de l'eau : la
+mémoire utilisée dépend de la taille d'un lot, pas du nombre de ventes.
+Les onglets de synthèse viennent du module aggregations.
+"""
+import csv
+import io
+import tempfile
+from datetime import datetime
+
+from crud_operations import iter_ventes
+from instrumentation import instrumented
+from aggregations import get_kpis, get_ventes_par_categorie, get_ventes_par_produit
+
+# Colonnes exportées et leur en-tête
+EXPORT_COLUMNS = {
+    'id': "ID",
+    'date_vente': "Date",
+    'produit': "Produit",
+    'categorie': "Catégorie",
+    'client': "Client",
+    'quantite': "Quantité",
+    'montant': "Montant (CFA)",
+}
+
+BATCH_SIZE = 10_000
+
+# Au-delà, les données sont écrites sur disque plutôt qu'en mémoire
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+
+def _lots_ventes(start=None, end=None, categories=None, batch_size=BATCH_SIZE):
+    """Génère les ventes filtrées (tuples dans l'ordre d'EXPORT_COLUMNS) par lots"""
+    return iter_ventes(start=start, end=end, categories=categories, columns=list(EXPORT_COLUMNS),
+                       chunk_size=batch_size, as_frame=False)
+
+
+def _spool():
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+
+
+def _read_all(fileobj):
+    fileobj.seek(0)
+    return fileobj.read()
+
+
+# ==================== EXCEL ====================
+
+@instrumented()
+def write_ventes_excel(fileobj, start=None, end=None, categories=None, batch_size=BATCH_SIZE):
+    """Écrit le classeur (ventes + synthèses) avec openpyxl en mode write-only"""
+    from openpyxl import Workbook
+
+    try:
+        workbook = Workbook(write_only=True)
+
+        sheet = workbook.create_sheet("Ventes")
+        sheet.append(list(EXPORT_COLUMNS.values()))
+        for rows in _lots_ventes(start, end, categories, batch_size):
+            for row in rows:
+                row = list(row)
+                row[1] = datetime.fromisoformat(row[1])
+                sheet.append(row)
+
+        sheet = workbook.create_sheet("Par catégorie")
+        sheet.append(["Catégorie", "Montant total", "Montant moyen", "Nombre de ventes", "Quantité"])
+        for row in get_ventes_par_categorie(start, end, categories).itertuples(index=False):
+            sheet.append([row.categorie, row.montant, row.moyenne, row.nombre, row.quantite])
+
+        sheet = workbook.create_sheet("Par produit")
+        sheet.append(["Produit", "Montant total", "Montant moyen", "Quantité"])
+        for row in get_ventes_par_produit(start, end, categories).itertuples(index=False):
+            sheet.append([row.produit, row.montant, row.moyenne, row.quantite])
+
+        workbook.save(fileobj)
+    except Exception as e:
+        raise ValueError(f"Erreur export Excel: {str(e)}")
+
+
+@instrumented()
+def create_sales_excel(start=None, end=None, categories=None):
+    """Retourne le classeur Excel des ventes filtrées (bytes)"""
+    with _spool() as fileobj:
+        write_ventes_excel(fileobj, start, end, categories)
+        return _read_all(fileobj)
+
+
+# ==================== CSV / PARQUET ====================
+
+@instrumented()
+def write_ventes_csv(fileobj, start=None, end=None, categories=None, batch_size=BATCH_SIZE):
+    """Écrit les ventes filtrées en CSV (UTF-8, séparateur ';') dans un fichier binaire"""
+    try:
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        writer = csv.writer(text, delimiter=';')
+        writer.writerow(EXPORT_COLUMNS.values())
+        for rows in _lots_ventes(start, end, categories, batch_size):
+            writer.writerows(rows)
+        text.flush()
+        # Le fichier reste à l'appelant
+        text.detach()
+    except Exception as e:
+        raise ValueError(f"Erreur export CSV: {str(e)}")
+
+
+@instrumented()
+def create_sales_csv(start=None, end=None, categories=None):
+    """Retourne les ventes filtrées au format CSV (bytes)"""
+    with _spool() as fileobj:
+        write_ventes_csv(fileobj, start, end, categories)
+        return _read_all(fileobj)
+
+
+@instrumented()
+def write_ventes_parquet(path, start=None, end=None, categories=None, batch_size=BATCH_SIZE):
+    """Écrit les ventes filtrées en Parquet, un row group par lot (nécessite pyarrow)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("L'export Parquet nécessite le paquet pyarrow")
+
+    try:
+        schema = pa.schema([
+            ('id', pa.int64()), ('date_vente', pa.string()), ('produit', pa.string()),
+            ('categorie', pa.string()), ('client', pa.string()),
+            ('quantite', pa.int64()), ('montant', pa.float64()),
+        ])
+        with pq.ParquetWriter(path, schema) as writer:
+            for rows in _lots_ventes(start, end, categories, batch_size):
+                columns = list(zip(*rows))
+                writer.write_table(pa.table(
+                    {name: pa.array(values, type=schema.field(name).type)
+                     for name, values in zip(schema.names, columns)},
+                    schema=schema
+                ))
+    except Exception as e:
+        raise ValueError(f"Erreur export Parquet: {str(e)}")
+
+
+# ==================== PDF ====================
+
+@instrumented()
+def create_sales_pdf(start=None, end=None, categories=None, batch_size=BATCH_SIZE):
+    """Crée le rapport PDF (indicateurs + tableau des ventes) et le retourne en bytes"""
+    from fpdf import FPDF
+
+    try:
+        kpis = get_kpis(start, end, categories)
+
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Arial", size=12)
+
+        # Titre
+        periode = f"du {start} au {end}" if start is not None and end is not None else "(toutes dates)"
+        pdf.cell(200, 10, txt=f"Rapport des ventes {periode}", ln=1, align='C')
+        pdf.ln(10)
+
+        # KPI
+        pdf.set_font("Arial", 'B', size=11)
+        pdf.cell(200, 10, txt="Indicateurs clés:", ln=1)
+        pdf.set_font("Arial", size=10)
+        pdf.cell(200, 10, txt=f"Total des ventes: {kpis['total']:,.2f}CFA", ln=1)
+        pdf.cell(200, 10, txt=f"Nombre de transactions: {kpis['count']}", ln=1)
+        pdf.cell(200, 10, txt=f"Panier moyen: {kpis['moyenne']:,.2f}CFA", ln=1)
+        pdf.cell(200, 10, txt=f"Produit le plus vendu: {kpis['produit_phare']}", ln=1)
+        pdf.ln(10)
+
+        # Tableau des données
+        pdf.set_font("Arial", 'B', size=10)
+        cols = ["Date", "Produit", "Catégorie", "Quantité", "Montant (CFA)"]
+        widths = [30, 50, 40, 25, 25]
+
+        for col, width in zip(cols, widths):
+            pdf.cell(width, 10, col, border=1)
+        pdf.ln()
+
+        pdf.set_font("Arial", size=8)
+        for rows in _lots_ventes(start, end, categories, batch_size):
+            for _, date_vente, produit, categorie, _, quantite, montant in rows:
+                pdf.cell(widths[0], 10, date_vente[:10], border=1)
+                pdf.cell(widths[1], 10, str(produit), border=1)
+                pdf.cell(widths[2], 10, str(categorie), border=1)
+                pdf.cell(widths[3], 10, "" if quantite is None else str(quantite), border=1)
+                pdf.cell(widths[4], 10, "" if montant is None else f"{montant:.2f}", border=1)
+                pdf.ln()
+
+        output = pdf.output(dest='S')
+        # fpdf renvoie une str latin-1, fpdf2 un bytearray
+        if isinstance(output, str):
+            return output.encode('latin1', errors='replace')
+        return bytes(output)
+    except Exception as e:
+        raise ValueError(f"Erreur export PDF: {str(e)}")
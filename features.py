@@ -0,0 +1,133 @@
+"""Variables explicatives des modèles de prévision journalière.
+
+Variables calendaires (jour, mois, année, jour de semaine) d'une plage de
+dates, mises en cache par plage, et variables d'historique : valeurs
+décalées (lags) et moyennes glissantes. Tout est calculé sur des tableaux
+NumPy, sans boucle Python par jour.
+
+Les moyennes glissantes s'arrêtent au plus petit décalage : les variables
+d'un jour ne dépendent que de valeurs connues au moins min(lags) jours
+avant. La prévision avance donc par blocs de min(lags) jours, chaque bloc
+servant d'historique au suivant.
+"""
+import functools
+
+import numpy as np
+import pandas as pd
+
+CALENDAR_FEATURES = ['jour', 'mois', 'annee', 'jour_semaine']
+LAGS = (7, 14, 28)
+WINDOWS = (7, 28)
+CALENDAR_CACHE_SIZE = 128
+
+
+@functools.lru_cache(maxsize=CALENDAR_CACHE_SIZE)
+def _calendar(start, periods):
+    dates = pd.date_range(start, periods=periods, freq='D')
+    matrix = np.column_stack([dates.day, dates.month, dates.year, dates.dayofweek]).astype(np.float64)
+    # Partagée entre appelants : lecture seule
+    matrix.flags.writeable = False
+    return dates, matrix
+
+
+def calendar_features(start, periods):
+    """(DatetimeIndex, matrice periods x CALENDAR_FEATURES) des jours à partir de start"""
+    return _calendar(pd.Timestamp(start).normalize(), int(periods))
+
+
+def history_features(y, rows, lags=LAGS, windows=WINDOWS):
+    """Variables d'historique des lignes rows d'une série journalière y.
+
+    Colonnes : y[t - k] pour chaque k de lags, puis la moyenne des w jours
+    finissant à t - min(lags) pour chaque w de windows. NaN quand la valeur
+    est hors de la série.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    rows = np.asarray(rows)
+    n = len(y)
+    # Indice 0 : valeur inconnue
+    padded = np.concatenate([[np.nan], y])
+    columns = []
+    for k in lags:
+        index = rows - k
+        columns.append(padded[np.where((index >= 0) & (index < n), index + 1, 0)])
+
+    if windows:
+        cumul = np.concatenate([[0.0], np.cumsum(y)])
+        end = rows - (min(lags) if lags else 1) + 1
+        for w in windows:
+            begin = end - w
+            valid = (begin >= 0) & (end <= n)
+            sums = cumul[np.clip(end, 0, n)] - cumul[np.clip(begin, 0, n)]
+            columns.append(np.where(valid, sums / w, np.nan))
+
+    if not columns:
+        return np.empty((len(rows), 0))
+    return np.column_stack(columns)
+
+
+class FeaturePipeline:
+    """Construction des matrices d'entraînement et de prévision d'une série journalière"""
+
+    def __init__(self, lags=LAGS, windows=WINDOWS):
+        self.lags = tuple(sorted(lags))
+        self.windows = tuple(sorted(windows)) if self.lags else ()
+
+    @classmethod
+    def for_history(cls, n_days, lags=LAGS, windows=WINDOWS):
+        """Pipeline dont la période d'amorçage laisse au moins la moitié de l'historique"""
+        lags = [k for k in lags if k <= n_days // 2]
+        if lags:
+            windows = [w for w in windows if min(lags) + w - 1 <= n_days // 2]
+        return cls(lags, windows)
+
+    @property
+    def columns(self):
+        return (CALENDAR_FEATURES + [f'lag_{k}' for k in self.lags]
+                + [f'moyenne_{w}' for w in self.windows])
+
+    @property
+    def config(self):
+        return {'lags': self.lags, 'windows': self.windows}
+
+    @property
+    def warmup(self):
+        """Nombre de premiers jours dont les variables d'historique sont incomplètes"""
+        if not self.lags:
+            return 0
+        return max(self.lags[-1], self.lags[0] + (self.windows[-1] if self.windows else 0) - 1)
+
+    def matrix(self, start, y, rows, n_days=None):
+        """Matrice des variables des lignes rows (jours comptés depuis start).
+
+        n_days : longueur de la plage calendaire (mise en cache) dont les
+        lignes sont extraites ; par défaut, jusqu'à la dernière ligne.
+        """
+        rows = np.asarray(rows)
+        if n_days is None:
+            n_days = rows[-1] + 1 if len(rows) else 0
+        _, calendar = calendar_features(start, n_days)
+        return np.hstack([calendar[rows], history_features(y, rows, self.lags, self.windows)])
+
+    def training_data(self, start, y):
+        """(X, y) des jours dont toutes les variables sont connues"""
+        y = np.asarray(y, dtype=np.float64)
+        rows = np.arange(self.warmup, len(y))
+        return self.matrix(start, y, rows, len(y)), y[rows]
+
+    def forecast(self, predict, start, y, periods):
+        """Prévision des periods jours suivant la série y (commencée à start).
+
+        predict reçoit une matrice de variables et retourne les prévisions,
+        par blocs de min(lags) jours. Retourne (dates, prévisions).
+        """
+        y = np.asarray(y, dtype=np.float64)
+        n = len(y)
+        step = self.lags[0] if self.lags else periods
+        extended = y
+        while len(extended) < n + periods:
+            rows = np.arange(len(extended), min(len(extended) + step, n + periods))
+            X = self.matrix(start, extended, rows, n + periods)
+            extended = np.concatenate([extended, predict(X)])
+        dates, _ = calendar_features(pd.Timestamp(start) + pd.Timedelta(days=n), periods)
+        return dates, extended[n:]
@@ -0,0 +1,163 @@
+"""Moteurs de prévision d'une série journalière, interchangeables.
+
+Chaque moteur s'entraîne sur (premier jour, montants journaliers) puis
+prévoit les jours suivants :
+
+    engine = get_engine('holt_winters').fit(start, y)
+    predictions = engine.forecast(30)
+
+naif_saisonnier et holt_winters n'utilisent que NumPy (adaptés aux séries
+courtes, entraînement quasi instantané) ; random_forest utilise
+scikit-learn, importé seulement à l'entraînement.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import FeaturePipeline
+
+SEASON = 7
+
+
+class ForecastEngine:
+    """Interface commune : fit(start, y) retourne le moteur, forecast(periods) un tableau"""
+
+    name = None
+
+    def fit(self, start, y):
+        self.start = pd.Timestamp(start)
+        self.y = np.asarray(y, dtype=np.float64)
+        self._fit()
+        return self
+
+    def _fit(self):
+        pass
+
+    def forecast(self, periods):
+        raise NotImplementedError
+
+
+class SeasonalNaiveEngine(ForecastEngine):
+    """Chaque jour de la semaine prévu par sa moyenne sur les derniers cycles"""
+
+    name = 'naif_saisonnier'
+
+    def __init__(self, season=SEASON, cycles=4):
+        self.season = season
+        self.cycles = cycles
+
+    def _fit(self):
+        n = len(self.y)
+        if n == 0:
+            raise ValueError("Série vide")
+        cycles = max(1, min(self.cycles, n // self.season))
+        if n < self.season:
+            self.profile = np.full(self.season, self.y.mean())
+        else:
+            recent = self.y[n - cycles * self.season:].reshape(cycles, self.season)
+            self.profile = recent.mean(axis=0)
+
+    def forecast(self, periods):
+        # profile[i] correspond au jour n - season + i ; le jour n + h y reprend la position h % season
+        return self.profile[np.arange(periods) % self.season]
+
+
+class HoltWintersEngine(ForecastEngine):
+    """Lissage exponentiel triple additif, tendance amortie (paramètres fixés)"""
+
+    name = 'holt_winters'
+
+    def __init__(self, alpha=0.3, beta=0.05, gamma=0.1, phi=0.98, season=SEASON):
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.phi = phi
+        self.season = season
+
+    def _fit(self):
+        y, m = self.y, self.season
+        if len(y) < 2 * m:
+            # Historique trop court pour estimer une saisonnalité
+            self.level, self.trend, self.seasonal = (y.mean() if len(y) else 0.0), 0.0, np.zeros(m)
+            return
+
+        level = y[:m].mean()
+        trend = (y[m:2 * m].mean() - level) / m
+        seasonal = y[:m] - level
+        alpha, beta, gamma, phi = self.alpha, self.beta, self.gamma, self.phi
+        for t, value in enumerate(y.tolist()):
+            s = seasonal[t % m]
+            new_level = alpha * (value - s) + (1 - alpha) * (level + phi * trend)
+            trend = beta * (new_level - level) + (1 - beta) * phi * trend
+            seasonal[t % m] = gamma * (value - new_level) + (1 - gamma) * s
+            level = new_level
+        self.level, self.trend, self.seasonal = level, trend, seasonal
+
+    def forecast(self, periods):
+        h = np.arange(1, periods + 1)
+        # Somme des phi^i pour i = 1..h
+        damping = np.cumsum(self.phi ** h)
+        positions = (len(self.y) + h - 1) % self.season
+        return np.maximum(self.level + damping * self.trend + self.seasonal[positions], 0.0)
+
+
+class RandomForestEngine(ForecastEngine):
+    """Forêt aléatoire sur les variables calendaires et décalées (module features)"""
+
+    name = 'random_forest'
+
+    def __init__(self, n_estimators=100, pipeline=None, random_state=42):
+        self.n_estimators = n_estimators
+        self.pipeline = pipeline
+        self.random_state = random_state
+
+    def _fit(self):
+        from sklearn.ensemble import RandomForestRegressor
+
+        self._pipeline = self.pipeline or FeaturePipeline.for_history(len(self.y))
+        X, y = self._pipeline.training_data(self.start, self.y)
+        self.model = RandomForestRegressor(
+            n_estimators=self.n_estimators, random_state=self.random_state, n_jobs=1
+        )
+        self.model.fit(X, y)
+
+    def forecast(self, periods):
+        return self._pipeline.forecast(self.model.predict, self.start, self.y, periods)[1]
+
+
+ENGINES = {
+    engine.name: engine
+    for engine in (SeasonalNaiveEngine, HoltWintersEngine, RandomForestEngine)
+}
+
+
+def get_engine(name, **params):
+    """Nouveau moteur du nom donné (clé d'ENGINES), avec ses paramètres"""
+    try:
+        return ENGINES[name](**params)
+    except KeyError:
+        raise ValueError(f"Moteur de prévision inconnu: {name}")
+
+
+def compare_engines(start, y, horizon=28, engines=None):
+    """MAE et temps d'entraînement de chaque moteur, sur les horizon derniers jours mis de côté.
+
+    engines : {libellé: (nom du moteur, paramètres)} ; par défaut chaque
+    moteur avec ses paramètres par défaut.
+    """
+    engines = engines or {name: (name, {}) for name in ENGINES}
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) <= horizon:
+        raise ValueError("Historique trop court pour l'horizon demandé")
+    train, test = y[:-horizon], y[-horizon:]
+
+    rows = []
+    for label, (name, params) in engines.items():
+        engine = get_engine(name, **params)
+        fit_start = time.perf_counter()
+        engine.fit(start, train)
+        fit_time = time.perf_counter() - fit_start
+        mae = float(np.abs(engine.forecast(horizon) - test).mean())
+        rows.append({'moteur': label, 'mae': mae, 'temps_fit': fit_time})
+    return pd.DataFrame(rows, columns=['moteur', 'mae', 'temps_fit'])
@@ -0,0 +1,34 @@
+"""Import en masse de ventes depuis un fichier CSV ou Parquet.
+
+Colonnes attendues : date_vente, produit_id, client_id, quantite, montant.
+Les lignes refusées (produit ou client inconnu, valeur invalide) sont
+écrites dans le fichier de rejets avec leur numéro de ligne et le motif.
+
+Usage : python import_ventes.py ventes.csv [--rejets rejets.csv] [--taille-lot 50000]
+"""
+import argparse
+import sys
+
+from db_config import init_db
+from crud_operations import BULK_CHUNK_SIZE, bulk_insert_ventes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import en masse de ventes (CSV ou Parquet)")
+    parser.add_argument("fichier", help="fichier .csv ou .parquet")
+    parser.add_argument("--rejets", default=None, help="fichier des lignes refusées (défaut : <fichier>.rejets.csv)")
+    parser.add_argument("--taille-lot", type=int, default=BULK_CHUNK_SIZE, help="lignes par transaction")
+    parser.add_argument("--sep", default=None, help="séparateur CSV (défaut : détecté, ';' ou ',')")
+    args = parser.parse_args()
+
+    init_db()
+    rejets = args.rejets or f"{args.fichier}.rejets.csv"
+    try:
+        stats = bulk_insert_ventes(args.fichier, rejets, args.taille_lot, args.sep)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+    debit = stats['inserees'] / stats['duree'] if stats['duree'] else 0
+    print(f"{stats['inserees']} vente(s) importée(s) en {stats['duree']:.2f} s ({debit:,.0f} lignes/s).")
+    if stats['rejetees']:
+        print(f"{stats['rejetees']} ligne(s) refusée(s), voir {rejets}.")
@@ -0,0 +1,278 @@
+"""Mesure des temps d'appel : accès à la base, prévisions, onglets du tableau de bord.
+
+Pour chaque nom mesuré : histogramme des durées, nombre d'erreurs, lignes
+retournées et dernières requêtes SQL exécutées pendant l'appel (capturées par
+la fonction de trace SQLite des connexions du pool).
+
+    @instrumented()                 # nom par défaut : module.fonction
+    def get_ventes(...): ...
+
+    with timed('dashboard.evolution') as mesure:
+        ...
+        mesure.rows = len(df)
+
+Désactivée par défaut (VENTES_INSTRUMENTATION=1 ou enable() pour l'activer) :
+un appel décoré ne coûte alors qu'un test de booléen, et aucune trace SQL
+n'est installée.
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+# Bornes supérieures (secondes) des classes de l'histogramme des durées ; une
+# dernière classe (+Inf) reçoit les appels plus longs
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Requêtes distinctes gardées par nom mesuré, et longueur maximale de leur texte
+QUERIES_KEPT = 5
+QUERY_MAX_LENGTH = 2000
+
+# Préfixe des métriques de l'export Prometheus
+PROMETHEUS_PREFIX = "ventes"
+
+_enabled = os.environ.get("VENTES_INSTRUMENTATION", "") not in ("", "0")
+_metrics = {}
+_lock = threading.Lock()
+# Pile, par thread, des requêtes capturées par chaque mesure en cours
+_local = threading.local()
+
+
+class _Metric:
+    """Compteurs cumulés d'un nom mesuré"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.rows = 0
+        self.calls_with_rows = 0
+        self.queries = deque(maxlen=QUERIES_KEPT)
+
+    def observe(self, duration, rows, error, queries):
+        self.count += 1
+        self.errors += error
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.buckets[bisect.bisect_left(BUCKETS, duration)] += 1
+        if rows is not None:
+            self.rows += rows
+            self.calls_with_rows += 1
+        for sql in queries:
+            if sql in self.queries:
+                self.queries.remove(sql)
+            self.queries.append(sql)
+
+    def quantile(self, q):
+        """Borne supérieure de la classe contenant le quantile q (max pour la dernière)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumul = 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            cumul += n
+            if cumul >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+def enable():
+    """Active la mesure pour tout le processus"""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """Désactive la mesure ; les compteurs déjà collectés sont conservés"""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Remet tous les compteurs à zéro"""
+    with _lock:
+        _metrics.clear()
+
+
+def _frames():
+    try:
+        return _local.frames
+    except AttributeError:
+        _local.frames = []
+        return _local.frames
+
+
+def _trace(sql):
+    # Rattachée à toutes les mesures en cours du thread : un onglet voit les
+    # requêtes de ses appels à crud_operations
+    sql = sql.strip()[:QUERY_MAX_LENGTH]
+    for queries in _frames():
+        if not queries or queries[-1] != sql:
+            queries.append(sql)
+
+
+def query_tracer():
+    """Fonction de trace à installer sur une connexion empruntée, ou None hors mesure"""
+    if _enabled and getattr(_local, 'frames', None):
+        return _trace
+    return None
+
+
+def _record(name, duration, rows, error, queries):
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = _Metric(name)
+        metric.observe(duration, rows, error, queries)
+
+
+class timed:
+    """Gestionnaire de contexte mesurant le bloc sous le nom donné.
+
+    L'attribut rows peut être renseigné dans le bloc (lignes retournées).
+    """
+
+    __slots__ = ('name', 'rows', '_start', '_queries')
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+        self._start = None
+
+    def __enter__(self):
+        if _enabled:
+            self._queries = deque(maxlen=QUERIES_KEPT)
+            _frames().append(self._queries)
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._start is None:
+            return False
+        duration = time.perf_counter() - self._start
+        frames = _frames()
+        if frames and frames[-1] is self._queries:
+            frames.pop()
+        # Les interruptions de contrôle (BaseException : rechargement de page...) ne sont pas des erreurs
+        error = exc_type is not None and issubclass(exc_type, Exception)
+        _record(self.name, duration, self.rows, error, self._queries)
+        return False
+
+
+def _count_rows(result):
+    """Lignes d'un résultat (DataFrame, tableau, liste...) ; None si non mesurable"""
+    if isinstance(result, tuple) and result and hasattr(result[0], 'shape'):
+        # (tableau, mesure) : prévisions accompagnées de leur MAE
+        result = result[0]
+    if isinstance(result, (str, bytes, tuple, dict)):
+        return None
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+def one_row(result):
+    """Compteur de lignes des lectures d'un seul enregistrement (None si absent)"""
+    return 0 if result is None else 1
+
+
+def instrumented(name=None, rows=_count_rows):
+    """Décorateur : mesure chaque appel (durée, lignes du résultat, requêtes SQL).
+
+    rows : fonction donnant le nombre de lignes d'un résultat.
+    """
+    def decorator(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with timed(label) as mesure:
+                result = fn(*args, **kwargs)
+                mesure.rows = rows(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """Une ligne par nom mesuré (durées en secondes), du plus coûteux au moins coûteux"""
+    with _lock:
+        rows = [{
+            'nom': m.name,
+            'appels': m.count,
+            'erreurs': m.errors,
+            'total': m.total,
+            'moyenne': m.total / m.count,
+            'p50': m.quantile(0.5),
+            'p95': m.quantile(0.95),
+            'max': m.max,
+            'lignes': m.rows,
+            'lignes_moyenne': m.rows / m.calls_with_rows if m.calls_with_rows else None,
+            'requetes': list(m.queries),
+        } for m in _metrics.values()]
+    return sorted(rows, key=lambda row: row['total'], reverse=True)
+
+
+def histogram(name):
+    """[(borne supérieure, appels de la classe)] d'un nom mesuré ; la dernière borne est inf"""
+    with _lock:
+        metric = _metrics.get(name)
+        counts = list(metric.buckets) if metric else [0] * (len(BUCKETS) + 1)
+    return list(zip(BUCKETS + (float('inf'),), counts))
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(gauges=None):
+    """Export au format texte Prometheus ; gauges : {nom: valeur} ajoutées telles quelles"""
+    duration = f"{PROMETHEUS_PREFIX}_call_duration_seconds"
+    lines = [
+        f"# HELP {duration} Durée des appels mesurés",
+        f"# TYPE {duration} histogram",
+    ]
+    counters = []
+    with _lock:
+        metrics = sorted(_metrics.values(), key=lambda m: m.name)
+        for m in metrics:
+            name = _label(m.name)
+            cumul = 0
+            for bound, n in zip(BUCKETS, m.buckets):
+                cumul += n
+                lines.append(f'{duration}_bucket{{nom="{name}",le="{bound}"}} {cumul}')
+            lines.append(f'{duration}_bucket{{nom="{name}",le="+Inf"}} {m.count}')
+            lines.append(f'{duration}_sum{{nom="{name}"}} {m.total:.9f}')
+            lines.append(f'{duration}_count{{nom="{name}"}} {m.count}')
+            counters.append((name, m.errors, m.rows))
+
+    for metric, help_text, index in (("call_errors_total", "Appels terminés par une exception", 1),
+                                     ("call_rows_total", "Lignes retournées par les appels", 2)):
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_{metric} {help_text}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{metric} counter")
+        lines += [f'{PROMETHEUS_PREFIX}_{metric}{{nom="{c[0]}"}} {c[index]}' for c in counters]
+
+    for gauge, value in (gauges or {}).items():
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{gauge} gauge")
+        lines.append(f"{PROMETHEUS_PREFIX}_{gauge} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, gauges=None):
+    """Écrit l'export dans path (remplacement atomique, pour un collecteur de fichiers texte)"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text(gauges))
+    os.replace(tmp, path)
@@ -0,0 +1,139 @@
+"""Exécution des traitements lourds (prévisions, exports) hors du thread de l'interface.
+
+Les tâches partent dans un pool de processus ; submit_job retourne un
+identifiant que l'interface interroge ensuite avec job_status/job_result.
+Deux demandes identiques (même fonction, mêmes arguments, même base) en
+cours au même moment partagent le même calcul ; une demande dont un argument
+n'est pas hachable (DataFrame, tableau NumPy...) n'est jamais partagée.
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import db_config
+import model_registry
+from crud_operations import _freeze
+
+MAX_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+# Durée de conservation des résultats terminés (en secondes)
+RESULT_TTL = 600
+
+
+def _run_in_worker(db_path, models_dir, fn, args, kwargs):
+    """Point d'entrée dans le processus de travail : même base et même registre que l'appelant"""
+    db_config.DB_PATH = db_path
+    model_registry.MODELS_DIR = models_dir
+    return fn(*args, **kwargs)
+
+
+class JobRunner:
+    """Pool de processus avec déduplication des demandes en cours"""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or MAX_WORKERS
+        self._executor = None
+        self._jobs = {}      # id -> (clé, future, instant de soumission, pool)
+        self._active = {}    # clé -> id des tâches non terminées
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn : pas de fork d'un processus Streamlit multi-thread
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        """Soumet fn(*args, **kwargs) (fonction de module, arguments picklables) ; retourne l'id"""
+        key = (fn.__module__, fn.__qualname__, db_config.DB_PATH, _freeze(args), _freeze(kwargs))
+        try:
+            hash(key)
+        except TypeError:
+            # Argument non hachable : pas de déduplication (repr() peut être
+            # abrégé et confondre deux demandes différentes)
+            key = None
+        with self._lock:
+            self._prune()
+            job_id = self._active.get(key) if key is not None else None
+            if job_id is not None and not self._jobs[job_id][1].done():
+                return job_id
+
+            task = (_run_in_worker, db_config.DB_PATH, model_registry.MODELS_DIR, fn, args, kwargs)
+            try:
+                future = self._get_executor().submit(*task)
+            except BrokenProcessPool:
+                # Processus de travail tué (mémoire...) : le pool est inutilisable, on le remplace
+                self._reset_executor()
+                future = self._get_executor().submit(*task)
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = (key, future, time.monotonic(), self._executor)
+            if key is not None:
+                self._active[key] = job_id
+            return job_id
+
+    def _reset_executor(self, broken=None):
+        """Abandonne le pool courant (ou broken s'il est encore courant) ; appelé sous self._lock"""
+        if self._executor is not None and (broken is None or self._executor is broken):
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def status(self, job_id):
+        """'en_attente', 'en_cours', 'terminé', 'annulé', 'erreur' ou 'inconnu'"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return 'inconnu'
+        future = job[1]
+        # cancelled() d'abord : exception() relève CancelledError sur une tâche annulée
+        if future.cancelled():
+            return 'annulé'
+        if future.running():
+            return 'en_cours'
+        if not future.done():
+            return 'en_attente'
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            with self._lock:
+                self._reset_executor(job[3])
+        return 'erreur' if error is not None else 'terminé'
+
+    def result(self, job_id, timeout=None):
+        """Résultat de la tâche (attend au plus timeout secondes ; relève son exception)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Tâche inconnue: {job_id}")
+        return job[1].result(timeout=timeout)
+
+    def _prune(self):
+        limit = time.monotonic() - RESULT_TTL
+        for job_id, (key, future, submitted, _) in list(self._jobs.items()):
+            if future.done() and submitted < limit:
+                del self._jobs[job_id]
+                if self._active.get(key) == job_id:
+                    del self._active[key]
+
+    def shutdown(self):
+        with self._lock:
+            self._reset_executor()
+
+
+_runner = JobRunner()
+
+
+def submit_job(fn, *args, **kwargs):
+    return _runner.submit(fn, *args, **kwargs)
+
+
+def job_status(job_id):
+    return _runner.status(job_id)
+
+
+def job_result(job_id, timeout=None):
+    return _runner.result(job_id, timeout)
@@ -1,41 +1,303 @@
+import copy
+import numpy as np
 import pandas as pd
 from datetime import timedelta
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error
+from db_config import get_connection
+from instrumentation import instrumented
+from features import FeaturePipeline, calendar_features
+from forecast_engines import compare_engines, get_engine
+from model_registry import data_fingerprint, get_registry
 
 
+def _daily_series(ventes):
+    """(premier jour, montants journaliers) d'un tableau date_vente/montant.
+
+    ventes peut aussi être un itérable de tels tableaux (lots
+    d'iter_ventes) : chaque lot est réduit à ses totaux journaliers, la
+    mémoire dépend alors du nombre de jours et non du nombre de ventes.
+    """
+    lots = [ventes] if isinstance(ventes, pd.DataFrame) else ventes
+    daily = None
+    for lot in lots:
+        jours = lot.groupby(pd.to_datetime(lot['date_vente']).dt.normalize())['montant'].sum()
+        daily = jours if daily is None else daily.add(jours, fill_value=0)
+    if daily is None or daily.empty:
+        raise ValueError("Aucune vente")
+    daily = daily.sort_index().asfreq('D', fill_value=0)
+    return daily.index[0], daily.to_numpy(dtype=np.float64)
+
+
+@instrumented()
 def forecast_sales(df_ventes, periods=6):
+    """Prévisions du montant journalier par forêt aléatoire entraînée à la volée.
+
+    df_ventes : tableau date_vente/montant, ou lots d'iter_ventes
+    (columns=['date_vente', 'montant']). Retourne (prévisions, MAE).
+    """
+    # scikit-learn n'est chargé qu'à l'entraînement (démarrage du tableau de bord plus rapide)
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_absolute_error
+
     try:
         # Préparation des données
-        df = df_ventes.copy()
-        df['date_vente'] = pd.to_datetime(df['date_vente'])
-        df = df.set_index('date_vente').resample('D').sum(numeric_only=True).reset_index()
-        df['jour'] = df['date_vente'].dt.day
-        df['mois'] = df['date_vente'].dt.month
-        df['annee'] = df['date_vente'].dt.year
-        df['jour_semaine'] = df['date_vente'].dt.dayofweek
+        start, y = _daily_series(df_ventes)
+        pipeline = FeaturePipeline.for_history(len(y))
+        X, y_fit = pipeline.training_data(start, y)
 
         # Entraînement du modèle
-        X = df[['jour', 'mois', 'annee', 'jour_semaine']]
-        y = df['montant']
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        X_train, X_test, y_train, y_test = train_test_split(X, y_fit, test_size=0.2, random_state=42)
         model = RandomForestRegressor(n_estimators=100, random_state=42)
         model.fit(X_train, y_train)
 
         # Prédiction
-        last_date = df['date_vente'].max()
-        future_dates = [last_date + timedelta(days=i) for i in range(1, periods + 1)]
-        future_df = pd.DataFrame({
-            'date_vente': future_dates,
-            'jour': [d.day for d in future_dates],
-            'mois': [d.month for d in future_dates],
-            'annee': [d.year for d in future_dates],
-            'jour_semaine': [d.weekday() for d in future_dates]
-        })
-        future_df['prediction'] = model.predict(future_df[['jour', 'mois', 'annee', 'jour_semaine']])
+        dates, predictions = pipeline.forecast(model.predict, start, y, periods)
+        future_df = pd.DataFrame({'date_vente': dates, 'prediction': predictions})
 
         mae = mean_absolute_error(y_test, model.predict(X_test))
-        return future_df[['date_vente', 'prediction']], mae
+        return future_df, mae
     except Exception as e:
-        return None, str(e)
\ No newline at end of file
+        return None, str(e)
+
+# ==================== MODÈLE PERSISTÉ ====================
+
+MODEL_NAME = 'ventes_total'
+# Arbres ajoutés à chaque arrivée de nouvelles ventes (warm start)
+WARM_START_TREES = 20
+# Au-delà, le modèle est réentraîné de zéro
+MAX_TREES = 300
+
+
+@instrumented()
+def daily_sales():
+    """Montant journalier des ventes (jours sans vente à 0), lu dans la synthèse ventes_jour"""
+    with get_connection() as conn:
+        df = pd.read_sql(
+            "SELECT jour AS date_vente, SUM(montant) AS montant FROM ventes_jour GROUP BY jour",
+            conn, parse_dates=['date_vente']
+        )
+    if df.empty:
+        return df
+    df = df.set_index('date_vente').asfreq('D', fill_value=0).reset_index()
+    return df
+
+
+def _fit_new_model(X, y):
+    """Entraînement complet ; MAE sur un échantillon de test"""
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import mean_absolute_error
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    model = RandomForestRegressor(n_estimators=100, random_state=42, warm_start=True)
+    model.fit(X_train, y_train)
+    return model, mean_absolute_error(y_test, model.predict(X_test))
+
+
+def _warm_start(model, X, y, n_nouveaux):
+    """Ajoute des arbres entraînés sur l'historique complet.
+
+    La MAE est mesurée, avant l'ajout, sur les n_nouveaux derniers jours
+    que le modèle n'avait jamais vus.
+    """
+    from sklearn.metrics import mean_absolute_error
+
+    mae = None
+    if n_nouveaux > 0:
+        mae = mean_absolute_error(y[-n_nouveaux:], model.predict(X[-n_nouveaux:]))
+    model.n_estimators += WARM_START_TREES
+    model.fit(X, y)
+    return model, mae
+
+
+def _retrain(registry, entry, fingerprint):
+    """Réentraîne le modèle pour l'empreinte donnée et l'enregistre"""
+    df = daily_sales()
+    if df.empty:
+        raise ValueError("Aucune vente pour entraîner le modèle")
+    start, y = df['date_vente'].iloc[0], df['montant'].to_numpy(dtype=np.float64)
+    pipeline = FeaturePipeline.for_history(len(y))
+    X, y_fit = pipeline.training_data(start, y)
+
+    previous = entry['fingerprint'] if entry is not None else None
+    # Warm start seulement si des ventes ont été ajoutées après le dernier entraînement,
+    # avec les mêmes variables
+    append_only = (
+        previous is not None
+        and previous['last_id'] is not None
+        and fingerprint['last_id'] is not None
+        and fingerprint['last_id'] > previous['last_id']
+        and fingerprint['count'] > previous['count']
+        and entry['meta'].get('features') == pipeline.config
+        and entry['model'].n_estimators + WARM_START_TREES <= MAX_TREES
+    )
+    last_day = df['date_vente'].iloc[-1]
+    if append_only:
+        n_nouveaux = int((df['date_vente'] > pd.Timestamp(previous['last_date']).normalize()).sum())
+        # Copie : d'autres threads peuvent encore prédire avec le modèle en mémoire
+        model, mae = _warm_start(copy.deepcopy(entry['model']), X, y_fit, min(n_nouveaux, len(y_fit)))
+        mae = entry['meta']['mae'] if mae is None else mae
+        mode = 'warm_start'
+    else:
+        model, mae = _fit_new_model(X, y_fit)
+        mode = 'complet'
+
+    meta = {'mae': mae, 'last_day': last_day, 'mode': mode, 'features': pipeline.config}
+    return registry.save(MODEL_NAME, model, fingerprint, meta)
+
+
+def _is_current(entry, fingerprint):
+    # Les modèles enregistrés sans leurs variables (versions antérieures) sont réentraînés
+    return entry is not None and entry['fingerprint'] == fingerprint and 'features' in entry['meta']
+
+
+def is_model_current(registry=None):
+    """Vrai si le modèle enregistré correspond aux ventes actuelles (prévision immédiate)"""
+    registry = registry or get_registry()
+    return _is_current(registry.load(MODEL_NAME), data_fingerprint())
+
+
+@instrumented()
+def get_forecast(periods=6, registry=None):
+    """Prévisions du montant journalier à partir du modèle persisté.
+
+    Le modèle n'est réentraîné que si l'empreinte des ventes a changé :
+    par ajout d'arbres si seules de nouvelles ventes sont arrivées, de zéro
+    sinon. Retourne (prévisions, MAE) comme forecast_sales.
+    """
+    try:
+        registry = registry or get_registry()
+        fingerprint = data_fingerprint()
+        entry = registry.load(MODEL_NAME)
+
+        if not _is_current(entry, fingerprint):
+            with registry.lock(MODEL_NAME):
+                # Un autre thread a pu faire le travail pendant l'attente
+                entry = registry.load(MODEL_NAME)
+                if not _is_current(entry, fingerprint):
+                    entry = _retrain(registry, entry, fingerprint)
+
+        # L'historique récent alimente les variables décalées
+        df = daily_sales()
+        pipeline = FeaturePipeline(**entry['meta']['features'])
+        dates, predictions = pipeline.forecast(
+            entry['model'].predict, df['date_vente'].iloc[0], df['montant'].to_numpy(), periods
+        )
+        return pd.DataFrame({'date_vente': dates, 'prediction': predictions}), entry['meta']['mae']
+    except Exception as e:
+        return None, str(e)
+
+
+@instrumented()
+def get_engine_forecast(engine='holt_winters', periods=6, holdout=28, **params):
+    """Prévisions du montant journalier avec un moteur de forecast_engines, entraîné à la volée.
+
+    La MAE est celle du moteur entraîné sans les holdout derniers jours et
+    évalué sur ceux-ci (NaN si l'historique est trop court). Retourne
+    (prévisions, MAE) comme get_forecast.
+    """
+    try:
+        df = daily_sales()
+        if df.empty:
+            raise ValueError("Aucune vente pour entraîner le modèle")
+        start, y = df['date_vente'].iloc[0], df['montant'].to_numpy(dtype=np.float64)
+
+        mae = float('nan')
+        if len(y) > 2 * holdout:
+            mae = float(compare_engines(start, y, holdout, {engine: (engine, params)})['mae'].iloc[0])
+        predictions = get_engine(engine, **params).fit(start, y).forecast(periods)
+        dates, _ = calendar_features(start + timedelta(days=len(y)), periods)
+        return pd.DataFrame({'date_vente': dates, 'prediction': predictions}), mae
+    except Exception as e:
+        return None, str(e)
+
+
+# ==================== PRÉVISIONS PAR SÉRIE ====================
+
+# Clé de série de chaque niveau dans ventes_jour et libellé associé
+NIVEAUX = {
+    'produit': ("j.produit_id", "IFNULL(p.nom, 'Produit ' || j.produit_id)"),
+    'categorie': ("j.categorie", "NULLIF(j.categorie, '')"),
+}
+BATCH_N_ESTIMATORS = 50
+
+
+@instrumented()
+def daily_sales_by(niveau='produit'):
+    """Montant journalier par série (une colonne par produit ou catégorie, jours sans vente à 0).
+
+    Retourne (tableau large indexé par date, {clé de série: libellé}).
+    """
+    cle, libelle = NIVEAUX[niveau]
+    with get_connection() as conn:
+        df = pd.read_sql(f"""
+        SELECT j.jour AS date_vente, {cle} AS serie, {libelle} AS libelle, SUM(j.montant) AS montant
+        FROM ventes_jour j
+        LEFT JOIN produits p ON j.produit_id = p.id
+        GROUP BY j.jour, {cle}
+        """, conn, parse_dates=['date_vente'])
+        produits = conn.execute("SELECT id, nom FROM produits").fetchall() if niveau == 'produit' else []
+    if df.empty:
+        return pd.DataFrame(), {}
+
+    libelles = dict(zip(df['serie'], df['libelle']))
+    wide = df.pivot(index='date_vente', columns='serie', values='montant')
+    if produits:
+        # Les produits encore jamais vendus ont aussi leur série (à 0)
+        libelles.update(produits)
+        wide = wide.reindex(columns=wide.columns.union(pd.Index([id_ for id_, _ in produits])))
+    wide = wide.asfreq('D').fillna(0.0)
+    return wide, libelles
+
+
+def _fit_predict_series(engine, engine_params, start, Y, periods):
+    """Entraîne un moteur par colonne de Y et retourne les prévisions (horizon x séries)"""
+    predictions = np.empty((periods, Y.shape[1]))
+    for j in range(Y.shape[1]):
+        predictions[:, j] = get_engine(engine, **engine_params).fit(start, Y[:, j]).forecast(periods)
+    return predictions
+
+
+@instrumented()
+def forecast_batch(niveau='produit', periods=6, n_jobs=-1, engine='random_forest',
+                   series_per_task=8, **engine_params):
+    """Prévisions journalières de chaque produit (ou catégorie), modèles entraînés en parallèle.
+
+    engine : nom d'un moteur de forecast_engines, engine_params ses
+    paramètres. Toutes les séries partagent la même plage de dates, donc
+    les mêmes variables calendaires (en cache) ; elles sont réparties par
+    paquets sur n_jobs processus. Retourne un tableau long : niveau, serie,
+    libelle, date_vente, prediction.
+    """
+    from joblib import Parallel, delayed
+
+    if engine == 'random_forest':
+        engine_params.setdefault('n_estimators', BATCH_N_ESTIMATORS)
+    wide, libelles = daily_sales_by(niveau)
+    columns = ['niveau', 'serie', 'libelle', 'date_vente', 'prediction']
+    if wide.empty:
+        return pd.DataFrame(columns=columns)
+
+    start = wide.index[0]
+    Y = wide.to_numpy(dtype=np.float64)
+    if engine == 'random_forest':
+        engine_params.setdefault('pipeline', FeaturePipeline.for_history(len(Y)))
+    future_dates, _ = calendar_features(start + timedelta(days=len(Y)), periods)
+
+    paquets = [slice(i, i + series_per_task) for i in range(0, Y.shape[1], series_per_task)]
+    resultats = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_predict_series)(engine, engine_params, start, Y[:, paquet], periods)
+        for paquet in paquets
+    )
+    predictions = np.hstack(resultats)
+
+    # Format long sans boucle : horizon répété pour chaque série
+    n_series = Y.shape[1]
+    series = np.tile(wide.columns.to_numpy(), periods)
+    return pd.DataFrame({
+        'niveau': niveau,
+        'serie': series,
+        'libelle': [libelles.get(serie) for serie in series],
+        'date_vente': np.repeat(future_dates.to_numpy(), n_series),
+        'prediction': predictions.reshape(-1),
+    }, columns=columns)
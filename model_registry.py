@@ -0,0 +1,100 @@
+"""Registre des modèles de prévision entraînés, persistés sur disque.
+
+Chaque modèle est rangé sous un nom avec l'empreinte des données qui ont
+servi à l'entraîner ; tant que l'empreinte des ventes ne change pas, le
+modèle est relu tel quel (depuis la mémoire du processus si possible).
+"""
+import os
+import pickle
+import tempfile
+import threading
+
+from db_config import get_connection
+
+MODELS_DIR = 'models'
+
+
+def data_fingerprint():
+    """Empreinte des ventes : nombre, total, dernière date et dernier id.
+
+    Nombre et total viennent de la synthèse mensuelle, dates et id des
+    index : le calcul ne parcourt pas la table ventes.
+    """
+    with get_connection() as conn:
+        try:
+            count, total = conn.execute(
+                "SELECT IFNULL(SUM(nombre), 0), ROUND(TOTAL(montant), 2) FROM ventes_mois"
+            ).fetchone()
+            last_date = conn.execute("SELECT MAX(date_vente) FROM ventes").fetchone()[0]
+            last_id = conn.execute("SELECT MAX(id) FROM ventes").fetchone()[0]
+            return {'count': count, 'total': total, 'last_date': last_date, 'last_id': last_id}
+        except Exception as e:
+            raise ValueError(f"Erreur calcul de l'empreinte des ventes: {str(e)}")
+
+
+class ModelRegistry:
+    """Stockage des modèles sous forme de fichiers pickle dans un répertoire"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or MODELS_DIR
+        self._memory = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.pkl")
+
+    def lock(self, name):
+        """Verrou par modèle, pour qu'un seul thread le réentraîne à la fois"""
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def load(self, name):
+        """Retourne l'entrée {'model', 'fingerprint', 'meta'} du modèle, ou None"""
+        path = self._path(name)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        cached = self._memory.get(name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with open(path, 'rb') as f:
+            entry = pickle.load(f)
+        self._memory[name] = (mtime, entry)
+        return entry
+
+    def save(self, name, model, fingerprint, meta=None):
+        """Enregistre le modèle (écriture atomique : fichier temporaire puis renommage)"""
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {'model': model, 'fingerprint': fingerprint, 'meta': meta or {}}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._memory[name] = (os.stat(self._path(name)).st_mtime_ns, entry)
+        return entry
+
+    def delete(self, name):
+        self._memory.pop(name, None)
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+
+_default_registry = None
+
+
+def get_registry():
+    """Registre partagé du processus (répertoire MODELS_DIR)"""
+    global _default_registry
+    if _default_registry is None or _default_registry.directory != MODELS_DIR:
+        _default_registry = ModelRegistry(MODELS_DIR)
+    return _default_registry
@@ -0,0 +1,202 @@
+"""Tables de synthèse des ventes, tenues à jour à chaque écriture.
+
+ventes_jour : (jour, produit_id, categorie) -> montant, quantite, nombre
+ventes_mois : (mois, categorie) -> montant, quantite, nombre
+
+Les fonctions d'écriture de crud_operations appliquent des deltas dans la
+même transaction que la vente (retrait de l'ancienne valeur, ajout de la
+nouvelle). Une vente sans produit est comptée sous produit_id 0 et une
+catégorie inconnue sous ''.
+
+Usage : python rollups.py --rebuild | --verify
+"""
+import argparse
+import sys
+
+import pandas as pd
+
+from db_config import get_connection, write_transaction
+
+# Agrégats (signés) des ventes v sélectionnées par une condition, par clé de synthèse
+_DELTA_JOUR = """
+INSERT INTO ventes_jour (jour, produit_id, categorie, montant, quantite, nombre)
+SELECT
+    substr(v.date_vente, 1, 10),
+    IFNULL(v.produit_id, 0),
+    IFNULL(p.categorie, ''),
+    ? * TOTAL(v.montant),
+    ? * IFNULL(SUM(v.quantite), 0),
+    ? * COUNT(*)
+FROM ventes v
+LEFT JOIN produits p ON v.produit_id = p.id
+WHERE {condition}
+GROUP BY 1, 2, 3
+ON CONFLICT (jour, produit_id, categorie) DO UPDATE SET
+    montant = montant + excluded.montant,
+    quantite = quantite + excluded.quantite,
+    nombre = nombre + excluded.nombre
+"""
+
+_DELTA_MOIS = """
+INSERT INTO ventes_mois (mois, categorie, montant, quantite, nombre)
+SELECT
+    substr(v.date_vente, 1, 7),
+    IFNULL(p.categorie, ''),
+    ? * TOTAL(v.montant),
+    ? * IFNULL(SUM(v.quantite), 0),
+    ? * COUNT(*)
+FROM ventes v
+LEFT JOIN produits p ON v.produit_id = p.id
+WHERE {condition}
+GROUP BY 1, 2
+ON CONFLICT (mois, categorie) DO UPDATE SET
+    montant = montant + excluded.montant,
+    quantite = quantite + excluded.quantite,
+    nombre = nombre + excluded.nombre
+"""
+
+
+def apply_delta(conn, condition, params=(), signe=1):
+    """Ajoute (signe=1) ou retire (signe=-1) des synthèses les ventes v vérifiant condition.
+
+    À appeler dans la transaction d'écriture : après un INSERT pour ajouter,
+    avant un DELETE pour retirer (les lignes doivent encore exister).
+    """
+    params = [signe] * 3 + list(params)
+    conn.execute(_DELTA_JOUR.format(condition=condition), params)
+    conn.execute(_DELTA_MOIS.format(condition=condition), params)
+    if signe < 0:
+        # Les clés devenues vides disparaissent ; seules celles touchées sont examinées
+        conn.execute(f"""
+        DELETE FROM ventes_jour WHERE nombre = 0 AND jour IN (
+            SELECT substr(v.date_vente, 1, 10) FROM ventes v WHERE {condition})
+        """, list(params[3:]))
+        conn.execute(f"""
+        DELETE FROM ventes_mois WHERE nombre = 0 AND mois IN (
+            SELECT substr(v.date_vente, 1, 7) FROM ventes v WHERE {condition})
+        """, list(params[3:]))
+
+
+def add_aggregates(conn, jour_rows, mois_rows):
+    """Ajoute aux synthèses des agrégats déjà calculés (chargements en masse).
+
+    jour_rows : (jour, produit_id, categorie, montant, quantite, nombre)
+    mois_rows : (mois, categorie, montant, quantite, nombre)
+    """
+    conn.executemany("""
+    INSERT INTO ventes_jour (jour, produit_id, categorie, montant, quantite, nombre)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (jour, produit_id, categorie) DO UPDATE SET
+        montant = montant + excluded.montant,
+        quantite = quantite + excluded.quantite,
+        nombre = nombre + excluded.nombre
+    """, jour_rows)
+    conn.executemany("""
+    INSERT INTO ventes_mois (mois, categorie, montant, quantite, nombre)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (mois, categorie) DO UPDATE SET
+        montant = montant + excluded.montant,
+        quantite = quantite + excluded.quantite,
+        nombre = nombre + excluded.nombre
+    """, mois_rows)
+
+
+def aggregates(ventes):
+    """Lignes de synthèse de ventes déjà en mémoire, pour add_aggregates.
+
+    ventes : DataFrame date_vente (texte), produit_id, categorie, montant,
+    quantite. Mêmes règles que apply_delta (produit absent -> 0, catégorie
+    absente -> ''). Retourne (jour_rows, mois_rows).
+    """
+    df = pd.DataFrame({
+        'jour': ventes['date_vente'].str[:10],
+        'produit_id': ventes['produit_id'].fillna(0).astype('int64'),
+        'categorie': ventes['categorie'].fillna('').astype(str),
+        'montant': ventes['montant'].astype('float64').fillna(0.0),
+        'quantite': ventes['quantite'].fillna(0).astype('int64'),
+    })
+    par_jour = df.groupby(['jour', 'produit_id', 'categorie'], sort=False).agg(
+        montant=('montant', 'sum'), quantite=('quantite', 'sum'), nombre=('montant', 'size')
+    ).reset_index()
+    par_jour['mois'] = par_jour['jour'].str[:7]
+    par_mois = par_jour.groupby(['mois', 'categorie'], sort=False)[['montant', 'quantite', 'nombre']].sum()
+    lignes_jour = par_jour[['jour', 'produit_id', 'categorie', 'montant', 'quantite', 'nombre']]
+    return (list(lignes_jour.itertuples(index=False, name=None)),
+            list(par_mois.reset_index().itertuples(index=False, name=None)))
+
+
+def rebuild(conn):
+    """Recalcule entièrement les synthèses à partir de ventes"""
+    conn.execute("DELETE FROM ventes_jour")
+    conn.execute("DELETE FROM ventes_mois")
+    apply_delta(conn, "1")
+
+
+def rebuild_rollups():
+    """Recalcule les synthèses dans une transaction d'écriture"""
+    try:
+        with write_transaction() as conn:
+            rebuild(conn)
+            # Les résultats en cache lus dans les synthèses sont périmés, dans tous les processus
+            conn.execute("UPDATE versions_tables SET version = version + 1 WHERE nom = 'ventes'")
+    except Exception as e:
+        raise ValueError(f"Erreur reconstruction des synthèses: {str(e)}")
+
+
+def verify_rollups(tolerance=0.01):
+    """Compare les synthèses à un recalcul complet ; retourne la liste des écarts"""
+    checks = {
+        'ventes_jour': ("jour, produit_id, categorie",
+                        "substr(v.date_vente, 1, 10), IFNULL(v.produit_id, 0), IFNULL(p.categorie, '')"),
+        'ventes_mois': ("mois, categorie",
+                        "substr(v.date_vente, 1, 7), IFNULL(p.categorie, '')"),
+    }
+    ecarts = []
+    with get_connection() as conn:
+        try:
+            for table, (cles, expressions) in checks.items():
+                n_cles = len(cles.split(','))
+                rows = conn.execute(f"""
+                WITH attendu AS (
+                    SELECT {expressions}, TOTAL(v.montant) AS montant,
+                           IFNULL(SUM(v.quantite), 0) AS quantite, COUNT(*) AS nombre
+                    FROM ventes v LEFT JOIN produits p ON v.produit_id = p.id
+                    GROUP BY {', '.join(str(i) for i in range(1, n_cles + 1))}
+                ),
+                comparaison AS (
+                    SELECT {cles}, montant, quantite, nombre, 0 AS source FROM {table}
+                    UNION ALL
+                    SELECT *, 1 FROM attendu
+                )
+                SELECT {cles},
+                       SUM(CASE source WHEN 0 THEN montant ELSE -montant END),
+                       SUM(CASE source WHEN 0 THEN quantite ELSE -quantite END),
+                       SUM(CASE source WHEN 0 THEN nombre ELSE -nombre END)
+                FROM comparaison
+                GROUP BY {cles}
+                HAVING ABS(SUM(CASE source WHEN 0 THEN montant ELSE -montant END)) > ?
+                    OR SUM(CASE source WHEN 0 THEN quantite ELSE -quantite END) != 0
+                    OR SUM(CASE source WHEN 0 THEN nombre ELSE -nombre END) != 0
+                """, (tolerance,)).fetchall()
+                ecarts += [(table,) + tuple(row) for row in rows]
+            return ecarts
+        except Exception as e:
+            raise ValueError(f"Erreur vérification des synthèses: {str(e)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance des tables de synthèse des ventes")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--rebuild", action="store_true", help="recalcule les synthèses")
+    group.add_argument("--verify", action="store_true", help="compare les synthèses aux ventes")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        rebuild_rollups()
+        print("Synthèses recalculées.")
+    else:
+        ecarts = verify_rollups()
+        for ecart in ecarts[:20]:
+            print(f"Écart {ecart}")
+        print(f"{len(ecarts)} écart(s) trouvé(s).")
+        sys.exit(1 if ecarts else 0)
@@ -1,67 +1,307 @@
-from db_config import connect_db
+"""Génération de données de démonstration et de test de charge.
 
-def seed_data():
+Produits, clients et ventes aléatoires mais réalistes, générés en NumPy :
+saisonnalité (jour de semaine, mois, tendance), poids inégaux des
+catégories et popularité des produits en loi de Zipf. Une même graine
+produit les mêmes données.
+
+Les ventes sont insérées triées par date, plusieurs lignes par instruction
+INSERT. Sur une table ventes vide, les index secondaires sont supprimés
+pendant le chargement puis recréés (un tri global plutôt que des millions
+d'insertions dans les index), et la connexion passe en mode chargement de
+fichier neuf : sans journal ni synchronisation, verrou exclusif. Un
+chargement interrompu laisse alors une base à supprimer et à régénérer.
+Les synthèses sont alimentées avec les agrégats calculés en NumPy.
+
+Usage : python seed.py [--produits 50] [--clients 500] [--ventes 50000] [--seed 42]
+"""
+import argparse
+import functools
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from db_config import connect_db, init_db
+import rollups
+
+# Catégorie -> (part des ventes, prix minimal, prix maximal, noms de produits)
+CATEGORIES = {
+    'Papeterie': (0.35, 0.5, 10.0, ["Stylo", "Carnet", "Ramette de papier", "Enveloppes", "Surligneur",
+                                    "Cahier", "Classeur", "Post-it"]),
+    'Bureau': (0.25, 2.0, 60.0, ["Agrafeuse", "Tapis de souris", "Tableau blanc", "Lampe de bureau",
+                                 "Corbeille", "Porte-documents"]),
+    'Informatique': (0.22, 5.0, 150.0, ["Clé USB", "Disque externe", "Câble HDMI", "Clavier", "Hub USB",
+                                        "Webcam"]),
+    'Électronique': (0.18, 10.0, 300.0, ["Calculatrice", "Souris sans fil", "Casque audio", "Chargeur",
+                                         "Enceinte", "Batterie externe"]),
+}
+PRENOMS = ["Alice", "Bob", "Claire", "David", "Emma", "Francois", "Gabrielle", "Hugo", "Isabelle",
+           "Julien", "Karim", "Lea", "Mathieu", "Nadia", "Olivier", "Pauline", "Quentin", "Sarah"]
+NOMS = ["Dupont", "Martin", "Morel", "Leroy", "Dubois", "Petit", "Chevalier", "Bernard", "Fontaine",
+        "Lefevre", "Diallo", "Garcia", "Roux", "Faure", "Mercier", "Blanc", "Guerin", "Muller"]
+# Ville -> poids
+VILLES = {"Paris": 8, "Lyon": 4, "Marseille": 4, "Toulouse": 3, "Nice": 2, "Nantes": 2,
+          "Strasbourg": 2, "Montpellier": 2, "Bordeaux": 2, "Lille": 2}
+
+DEBUT = '2022-01-01'
+JOURS = 3 * 365
+# Lundi..dimanche
+POIDS_JOUR_SEMAINE = np.array([1.0, 0.95, 1.0, 1.05, 1.25, 1.4, 0.45])
+# Janvier..décembre : creux d'été, rentrée et fêtes
+POIDS_MOIS = np.array([0.85, 0.85, 0.95, 1.0, 1.0, 0.95, 0.8, 0.7, 1.35, 1.05, 1.1, 1.5])
+CROISSANCE_ANNUELLE = 0.12
+HEURE_OUVERTURE, HEURE_FERMETURE = 8, 20
+LOT_INSERTION = 500_000
+# Ventes par instruction INSERT : 5 paramètres chacune, sous la limite de
+# 999 paramètres des anciennes versions de SQLite
+LIGNES_PAR_INSERT = 199
+# Réglages du chargement d'une base neuve (aucun produit, client ni vente avant
+# l'appel), restaurés ensuite : sans journal, un échec ne peut pas être annulé,
+# ce qui n'est acceptable que s'il n'y a rien à perdre. threads : tris de
+# CREATE INDEX répartis sur plusieurs cœurs
+PRAGMAS_CHARGEMENT = {
+    "journal_mode": "OFF",
+    "locking_mode": "EXCLUSIVE",
+    "threads": min(4, os.cpu_count() or 1),
+}
+
+
+def generate_produits(n, rng):
+    """n produits (nom, categorie, prix_unitaire) ; catégories réparties selon leur part des ventes"""
+    noms_categories = np.array(list(CATEGORIES), dtype=object)
+    parts = np.array([v[0] for v in CATEGORIES.values()])
+    categories = rng.choice(len(noms_categories), size=n, p=parts / parts.sum())
+    bornes = np.log(np.array([v[1:3] for v in CATEGORIES.values()]))[categories]
+    # Prix log-uniforme : beaucoup d'articles bon marché, quelques articles chers
+    prix = np.round(np.exp(rng.uniform(bornes[:, 0], bornes[:, 1])), 2)
+    # Nom tiré parmi ceux de la catégorie : rang uniforme dans sa liste
+    noms = [np.array(v[3], dtype=object) for v in CATEGORIES.values()]
+    tailles = np.array([len(v) for v in noms])[categories]
+    rangs = (rng.random(n) * tailles).astype(np.int64)
+    nom = np.empty(n, dtype=object)
+    for cat, liste in enumerate(noms):
+        selection = categories == cat
+        nom[selection] = liste[rangs[selection]]
+    nom = pd.Series(nom) + " " + pd.Series(np.arange(1, n + 1)).astype(str)
+    return list(zip(nom.tolist(), noms_categories[categories].tolist(), prix.tolist()))
+
+
+def generate_clients(n, rng):
+    """n clients (nom, email, ville)"""
+    prenoms = pd.Series(np.array(PRENOMS, dtype=object)[rng.integers(len(PRENOMS), size=n)])
+    noms = pd.Series(np.array(NOMS, dtype=object)[rng.integers(len(NOMS), size=n)])
+    poids = np.array(list(VILLES.values()), dtype=float)
+    villes = rng.choice(list(VILLES), size=n, p=poids / poids.sum())
+    rang = pd.Series(np.arange(1, n + 1)).astype(str)
+    emails = prenoms.str.lower() + "." + noms.str.lower() + rang + "@example.com"
+    return list(zip((prenoms + " " + noms).tolist(), emails.tolist(), villes.tolist()))
+
+
+def _poids_jours(debut, jours):
+    """Probabilité de vente de chaque jour : jour de semaine x mois x tendance"""
+    dates = pd.date_range(debut, periods=jours, freq='D')
+    poids = POIDS_JOUR_SEMAINE[dates.dayofweek] * POIDS_MOIS[dates.month - 1]
+    poids = poids * (1 + CROISSANCE_ANNUELLE) ** (np.arange(jours) / 365.25)
+    return poids / poids.sum()
+
+
+def generate_ventes(n, produits, client_ids, rng, debut=DEBUT, jours=JOURS):
+    """n ventes triées par date, sous forme de tableaux NumPy.
+
+    produits : DataFrame id, categorie, prix_unitaire du catalogue.
+    Retourne un dict : secondes (depuis debut), produit_id, client_id,
+    quantite, montant.
+    """
+    # Nombre de ventes de chaque jour (tirage multinomial) : jours déjà dans l'ordre
+    jour = np.repeat(np.arange(jours), rng.multinomial(n, _poids_jours(debut, jours)))
+    secondes = np.sort(jour * 86400 + rng.integers(HEURE_OUVERTURE * 3600, HEURE_FERMETURE * 3600, size=n))
+
+    # Popularité : part de la catégorie répartie en loi de Zipf entre ses produits
+    parts = produits['categorie'].map({c: v[0] for c, v in CATEGORIES.items()}).fillna(0.1).to_numpy()
+    rang = produits.groupby('categorie', dropna=False).cumcount().to_numpy() + 1
+    zipf = 1.0 / rang ** 1.1
+    zipf_total = pd.Series(zipf).groupby(produits['categorie'].fillna('').to_numpy()).transform('sum').to_numpy()
+    popularite = parts * zipf / zipf_total
+    produit = rng.choice(len(produits), size=n, p=popularite / popularite.sum())
+
+    # Quelques clients fidèles concentrent une bonne partie des achats
+    fidelite = rng.pareto(1.5, size=len(client_ids)) + 1
+    client = rng.choice(np.asarray(client_ids), size=n, p=fidelite / fidelite.sum())
+
+    prix = produits['prix_unitaire'].fillna(1.0).to_numpy()[produit]
+    # Articles bon marché achetés en plus grande quantité
+    quantite = 1 + rng.poisson(np.clip(8.0 / prix, 0.1, 5.0))
+    remise = np.where(rng.random(n) < 0.1, rng.uniform(0.05, 0.2, n), 0.0)
+    montant = np.round(quantite * prix * (1 - remise), 2)
+
+    return {
+        'secondes': secondes,
+        'produit_id': produits['id'].to_numpy()[produit],
+        'client_id': client,
+        'quantite': quantite,
+        'montant': montant,
+    }
+
+
+@functools.lru_cache(maxsize=1)
+def _textes_heures():
+    """'HH:MM:SS' de chaque seconde de la journée"""
+    heures = np.arange(86400)
+    return np.array([f"{h:02d}:{m:02d}:{s:02d}" for h, m, s in
+                     zip(heures // 3600, heures // 60 % 60, heures % 60)], dtype=object)
+
+
+def _dates_texte(debut, secondes):
+    """'AAAA-MM-JJ HH:MM:SS' de chaque instant : jours et heures formatés une fois chacun"""
+    jours = secondes // 86400
+    premier = int(jours[0]) if len(jours) else 0
+    textes_jours = pd.date_range(pd.Timestamp(debut) + pd.Timedelta(days=premier),
+                                 periods=int(jours[-1]) - premier + 1 if len(jours) else 0,
+                                 freq='D').strftime('%Y-%m-%d ').to_numpy(dtype=object)
+    return (textes_jours[jours - premier] + _textes_heures()[secondes % 86400]).tolist()
+
+
+def _insert_ventes(cursor, colonnes):
+    """Insère les lignes (listes parallèles) par instructions de LIGNES_PAR_INSERT ventes"""
+    debut_sql = "INSERT INTO ventes (date_vente, produit_id, client_id, quantite, montant) VALUES "
+    n = len(colonnes[0])
+    # Paramètres à plat, ligne après ligne
+    valeurs = np.empty((n, len(colonnes)), dtype=object)
+    for j, colonne in enumerate(colonnes):
+        valeurs[:, j] = colonne
+    valeurs = valeurs.ravel().tolist()
+    largeur = len(colonnes) * LIGNES_PAR_INSERT
+    complets = n // LIGNES_PAR_INSERT * largeur
+    ligne = "(" + ", ".join("?" * len(colonnes)) + ")"
+    if complets:
+        cursor.executemany(debut_sql + ", ".join([ligne] * LIGNES_PAR_INSERT),
+                           (valeurs[i:i + largeur] for i in range(0, complets, largeur)))
+    if complets < len(valeurs):
+        reste = (len(valeurs) - complets) // len(colonnes)
+        cursor.execute(debut_sql + ", ".join([ligne] * reste), valeurs[complets:])
+
+
+def _synthese(debut, ventes, produits):
+    """Lignes (jour, produit_id, categorie, montant, quantite, nombre) et
+    (mois, categorie, montant, quantite, nombre) des ventes générées"""
+    jours = pd.date_range(debut, periods=int(ventes['secondes'][-1] // 86400) + 1, freq='D')
+    categories = produits.set_index('id')['categorie'].fillna('')
+    df = pd.DataFrame({
+        'jour': ventes['secondes'] // 86400,
+        'produit_id': ventes['produit_id'],
+        'montant': ventes['montant'],
+        'quantite': ventes['quantite'],
+    })
+    par_jour = df.groupby(['jour', 'produit_id'], sort=False).agg(
+        montant=('montant', 'sum'), quantite=('quantite', 'sum'), nombre=('montant', 'size')
+    ).reset_index()
+    par_jour['categorie'] = categories.reindex(par_jour['produit_id']).to_numpy()
+    dates = jours[par_jour['jour'].to_numpy()]
+    par_jour['mois'] = dates.strftime('%Y-%m')
+    par_jour['jour'] = dates.strftime('%Y-%m-%d')
+    par_mois = par_jour.groupby(['mois', 'categorie'], sort=False)[['montant', 'quantite', 'nombre']].sum()
+
+    lignes_jour = par_jour[['jour', 'produit_id', 'categorie', 'montant', 'quantite', 'nombre']]
+    return (list(lignes_jour.itertuples(index=False, name=None)),
+            list(par_mois.reset_index().itertuples(index=False, name=None)))
+
+
+def seed_data(n_produits=50, n_clients=500, n_ventes=50_000, seed=42, debut=DEBUT, jours=JOURS):
+    """Complète la base jusqu'à n_produits produits et n_clients clients, puis ajoute n_ventes ventes.
+
+    Les produits et clients existants sont réutilisés. Sur une base neuve
+    seulement, les ventes sont chargées sans journal (PRAGMAS_CHARGEMENT).
+    Retourne le nombre de ventes insérées et la durée.
+    """
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
     conn = connect_db()
-    cursor = conn.cursor()
-
-    # Insérer des produits
-    produits = [
-        ("Stylo bleu", "Papeterie", 1.50),
-        ("Carnet A5", "Papeterie", 3.00),
-        ("Calculatrice", "Électronique", 15.00),
-        ("Clé USB 16GB", "Informatique", 8.00),
-        ("Ramette de papier", "Papeterie", 5.50),
-        ("Souris sans fil", "Électronique", 12.00),
-        ("Agrafeuse", "Bureau", 4.00),
-        ("Enveloppes x50", "Papeterie", 2.50),
-        ("Tapis de souris", "Bureau", 6.00),
-        ("Tableau blanc", "Bureau", 25.00),
-    ]
-    cursor.executemany("INSERT INTO produits (nom, categorie, prix_unitaire) VALUES (?, ?, ?)", produits)
-
-    # Insérer des clients
-    clients = [
-        ("Alice Dupont", "alice@example.com", "Paris"),
-        ("Bob Martin", "bob@example.com", "Lyon"),
-        ("Claire Morel", "claire@example.com", "Marseille"),
-        ("David Leroy", "david@example.com", "Toulouse"),
-        ("Emma Dubois", "emma@example.com", "Nice"),
-        ("François Petit", "francois@example.com", "Nantes"),
-        ("Gabrielle Chevalier", "gabrielle@example.com", "Strasbourg"),
-        ("Hugo Bernard", "hugo@example.com", "Montpellier"),
-        ("Isabelle Fontaine", "isabelle@example.com", "Bordeaux"),
-        ("Julien Lefevre", "julien@example.com", "Lille"),
-    ]
-    cursor.executemany("INSERT INTO clients (nom, email, ville) VALUES (?, ?, ?)", clients)
-
-    # Insérer des ventes avec des dates variées
-    ventes = [
-        ("2025-02-03", 1, 1, 5, 7.50),
-        ("2025-02-05", 2, 2, 2, 6.00),
-        ("2025-02-10", 3, 3, 1, 15.00),
-        ("2025-02-15", 4, 4, 3, 24.00),
-        ("2025-02-20", 5, 5, 1, 5.50),
-        ("2025-02-25", 6, 6, 1, 12.00),
-        ("2025-03-01", 7, 7, 2, 8.00),
-        ("2025-03-05", 8, 8, 1, 2.50),
-        ("2025-03-09", 9, 9, 1, 6.00),
-        ("2025-03-12", 10, 10, 1, 25.00),
-        ("2025-03-15", 3, 1, 1, 15.00),
-        ("2025-03-20", 2, 4, 3, 9.00),
-        ("2025-03-22", 5, 6, 2, 11.00),
-        ("2025-03-27", 6, 7, 1, 12.00),
-        ("2025-04-01", 1, 2, 10, 15.00),
-        ("2025-04-04", 4, 5, 1, 8.00),
-        ("2025-04-07", 7, 6, 1, 4.00),
-        ("2025-04-08", 8, 3, 2, 5.00),
-        ("2025-04-08", 9, 8, 1, 6.00),
-        ("2025-04-08", 10, 9, 1, 25.00),
-    ]
-    cursor.executemany("INSERT INTO ventes (date_vente, produit_id, client_id, quantite, montant) VALUES (?, ?, ?, ?, ?)", ventes)
-
-    conn.commit()
-    conn.close()
-    print("✅ Données insérées avec succès avec des dates variées !")
+    precedents = {}
+    try:
+        # Chargement reproductible à partir de la graine : la durabilité de
+        # chaque transaction n'est pas nécessaire
+        conn.execute("PRAGMA synchronous = OFF")
+        # Identifiants tirés du catalogue lu juste avant : contrôle des clés étrangères inutile
+        conn.execute("PRAGMA foreign_keys = OFF")
+        cursor = conn.cursor()
+        neuve = cursor.execute("""
+        SELECT NOT EXISTS (SELECT 1 FROM produits) AND NOT EXISTS (SELECT 1 FROM clients)
+           AND NOT EXISTS (SELECT 1 FROM ventes)
+        """).fetchone()[0]
+
+        n_existants = cursor.execute("SELECT COUNT(*) FROM produits").fetchone()[0]
+        if n_existants < n_produits:
+            cursor.executemany("INSERT INTO produits (nom, categorie, prix_unitaire) VALUES (?, ?, ?)",
+                               generate_produits(n_produits - n_existants, rng))
+        n_existants = cursor.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+        if n_existants < n_clients:
+            cursor.executemany("INSERT INTO clients (nom, email, ville) VALUES (?, ?, ?)",
+                               generate_clients(n_clients - n_existants, rng))
+        conn.commit()
+
+        if n_ventes <= 0:
+            return {'ventes': 0, 'duree': time.perf_counter() - started}
+
+        produits = pd.read_sql("SELECT id, categorie, prix_unitaire FROM produits ORDER BY id", conn)
+        client_ids = [row[0] for row in cursor.execute("SELECT id FROM clients ORDER BY id")]
+        ventes = generate_ventes(n_ventes, produits, client_ids, rng, debut, jours)
+
+        # Table vide : index secondaires recréés après le chargement ; base
+        # neuve : en plus, mode chargement de fichier neuf
+        vide = cursor.execute("SELECT NOT EXISTS (SELECT 1 FROM ventes)").fetchone()[0]
+        if neuve:
+            for pragma, valeur in PRAGMAS_CHARGEMENT.items():
+                precedents[pragma] = cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+                cursor.execute(f"PRAGMA {pragma} = {valeur}")
+
+        # Une seule transaction : en cas d'échec (hors mode chargement), les index supprimés reviennent
+        conn.execute("BEGIN")
+        index = []
+        if vide:
+            index = cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'ventes' AND sql IS NOT NULL"
+            ).fetchall()
+            for name, _ in index:
+                cursor.execute(f"DROP INDEX {name}")
+
+        for i in range(0, n_ventes, LOT_INSERTION):
+            lot = slice(i, i + LOT_INSERTION)
+            _insert_ventes(cursor, [
+                _dates_texte(debut, ventes['secondes'][lot]), ventes['produit_id'][lot].tolist(),
+                ventes['client_id'][lot].tolist(), ventes['quantite'][lot].tolist(),
+                ventes['montant'][lot].tolist()
+            ])
+        for _, sql in index:
+            cursor.execute(sql)
+        if index:
+            # Statistiques sur un échantillon de chaque index : suffisant pour le planificateur
+            cursor.execute("PRAGMA analysis_limit = 1000")
+            cursor.execute("ANALYZE")
+
+        rollups.add_aggregates(conn, *_synthese(debut, ventes, produits))
+        conn.commit()
+        return {'ventes': n_ventes, 'duree': time.perf_counter() - started}
+    finally:
+        # Réglages d'origine rétablis même après un échec (base remise en WAL)
+        if conn.in_transaction:
+            conn.rollback()
+        for pragma, valeur in precedents.items():
+            conn.execute(f"PRAGMA {pragma} = {valeur}")
+        conn.close()
+
 
 if __name__ == "__main__":
-    seed_data()
+    parser = argparse.ArgumentParser(description="Génère des données de démonstration")
+    parser.add_argument("--produits", type=int, default=50, help="nombre de produits (au total)")
+    parser.add_argument("--clients", type=int, default=500, help="nombre de clients (au total)")
+    parser.add_argument("--ventes", type=int, default=50_000, help="ventes à ajouter")
+    parser.add_argument("--seed", type=int, default=42, help="graine (mêmes données pour une même graine)")
+    parser.add_argument("--debut", default=DEBUT, help="premier jour des ventes (AAAA-MM-JJ)")
+    parser.add_argument("--jours", type=int, default=JOURS, help="nombre de jours couverts")
+    args = parser.parse_args()
+
+    init_db()
+    stats = seed_data(args.produits, args.clients, args.ventes, args.seed, args.debut, args.jours)
+    print(f"✅ {stats['ventes']} ventes générées en {stats['duree']:.1f} s")